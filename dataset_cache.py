@@ -0,0 +1,131 @@
+"""Columnar, memory-mapped cache of the CSV tables.
+
+Each table is parsed once into a directory of ``.npy`` columns (float64 for reals,
+the narrowest integer type for integers, categorical codes for strings) plus a
+``meta.json`` with the column order and categories. The directory name contains a
+hash of the column renames and one of the source file, so editing the CSV invalidates
+it, while loads of the same table with different renames keep separate caches.
+Later loads memory-map the columns read-only: numeric columns are not copied, and
+every process that loads the same table shares the same page-cache pages.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from collections.abc import Mapping
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+log = logging.getLogger(__name__)
+
+CACHE_DIR = Path(__file__).parent / ".dataset_cache"
+# Bump when the on-disk layout changes.
+FORMAT_VERSION = 1
+
+_INT_TYPES = (np.int8, np.int16, np.int32, np.int64)
+
+
+def _rename_key(rename: Mapping[str, str]) -> str:
+    return hashlib.sha256(json.dumps(sorted(rename.items())).encode()).hexdigest()[:8]
+
+
+def _source_key(path: Path) -> str:
+    h = hashlib.sha256()
+    h.update(f"v{FORMAT_VERSION}".encode())
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()[:16]
+
+
+def _narrowest_int(values: np.ndarray) -> np.dtype:
+    lo, hi = (int(values.min()), int(values.max())) if len(values) else (0, 0)
+    for dtype in _INT_TYPES:
+        info = np.iinfo(dtype)
+        if info.min <= lo and hi <= info.max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def _encode_column(series: pd.Series) -> tuple[np.ndarray, dict]:
+    """Typed array for one column and its metadata."""
+    if pd.api.types.is_bool_dtype(series):
+        return series.to_numpy(dtype=np.int8), {"kind": "bool"}
+    if pd.api.types.is_integer_dtype(series):
+        values = series.to_numpy()
+        return values.astype(_narrowest_int(values)), {"kind": "int"}
+    if pd.api.types.is_float_dtype(series):
+        return series.to_numpy(dtype=np.float64), {"kind": "float"}
+    codes, categories = pd.factorize(series, sort=True)
+    categories = [str(c) for c in categories]
+    # pd.factorize marks missing values with -1.
+    return codes.astype(_narrowest_int(codes)), {"kind": "category", "categories": categories}
+
+
+def _write_table(df: pd.DataFrame, target: Path) -> None:
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(prefix=target.name + ".", dir=target.parent))
+    columns = []
+    for i, name in enumerate(df.columns):
+        values, meta = _encode_column(df[name])
+        np.save(tmp / f"{i}.npy", values)
+        columns.append({"name": str(name), **meta})
+    meta = {"format": FORMAT_VERSION, "rows": len(df), "columns": columns}
+    (tmp / "meta.json").write_text(json.dumps(meta))
+    # try-catch approved: another process may convert the same table concurrently, and
+    # its copy is identical
+    try:
+        os.rename(tmp, target)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def _read_table(directory: Path) -> pd.DataFrame:
+    meta = json.loads((directory / "meta.json").read_text())
+    data = {}
+    for i, column in enumerate(meta["columns"]):
+        # A plain ndarray view of the map, so results of arithmetic are not memmaps.
+        values = np.asarray(np.load(directory / f"{i}.npy", mmap_mode="r"))
+        if column["kind"] == "category":
+            data[column["name"]] = pd.Categorical.from_codes(values, column["categories"])
+        elif column["kind"] == "bool":
+            data[column["name"]] = values.astype(bool)
+        else:
+            data[column["name"]] = values
+    return pd.DataFrame(data, copy=False)
+
+
+def _remove_stale(cache_dir: Path, prefix: str, keep: Path) -> None:
+    """Remove older conversions of the table with the same renames; others stay."""
+    for old in cache_dir.glob(f"{prefix}-*"):
+        if old != keep and old.is_dir() and "." not in old.name[len(prefix) + 1 :]:
+            shutil.rmtree(old, ignore_errors=True)
+
+
+def load_table(
+    path: str | Path,
+    rename: Mapping[str, str] | None = None,
+    cache_dir: str | Path | None = None,
+) -> pd.DataFrame:
+    """Load a CSV table through the columnar cache, converting it on first use.
+
+    String columns come back as categoricals and numeric columns as read-only
+    memory-mapped arrays.
+    """
+    path = Path(path)
+    rename = dict(rename or {})
+    cache_dir = Path(cache_dir) if cache_dir is not None else CACHE_DIR
+    prefix = f"{path.stem}-{_rename_key(rename)}"
+    target = cache_dir / f"{prefix}-{_source_key(path)}"
+    if not (target / "meta.json").exists():
+        log.info("Converting %s to a columnar cache in %s", path, target)
+        df = pd.read_csv(path)
+        df.rename(columns=rename, inplace=True)
+        _write_table(df, target)
+        _remove_stale(cache_dir, prefix, target)
+    return _read_table(target)
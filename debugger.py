@@ -4,7 +4,7 @@ import logging
 import re
 
 from llm_client import LLMClient
-from prompts import DEBUG_PROMPT_TEMPLATE, DEBUG_SYSTEM_PROMPT
+from prompts import DEBUG_FAILING_ROWS_TEMPLATE, DEBUG_PROMPT_TEMPLATE, DEBUG_SYSTEM_PROMPT
 
 log = logging.getLogger(__name__)
 
@@ -39,13 +39,33 @@ def _extract_function_raw(response: str) -> str:
     return "\n".join(func_lines)
 
 
+def _format_failing_rows(rows: list[dict]) -> str:
+    if not rows:
+        return ""
+    lines = []
+    for row in rows:
+        inputs = ", ".join(
+            f"{k}={v:.4g}" if isinstance(v, float) else f"{k}={v}"
+            for k, v in row.items()
+            if k not in ("compound", "error")
+        )
+        lines.append(f"- {row['compound']}: {inputs} -> {row['error']}")
+    return DEBUG_FAILING_ROWS_TEMPLATE.format(rows="\n".join(lines))
+
+
 def debug_function(
     client: LLMClient,
     code: str,
     error: str,
+    failing_rows: list[dict] | None = None,
 ) -> str:
-    """Try to fix a crashing function by sending the error back to the LLM."""
-    prompt = DEBUG_PROMPT_TEMPLATE.format(code=code, error=error)
+    """Try to fix a crashing function by sending the error back to the LLM.
+
+    ``failing_rows`` (from ``EvalResult.failing_rows``) are listed in the prompt.
+    """
+    prompt = DEBUG_PROMPT_TEMPLATE.format(
+        code=code, error=error, failing_rows=_format_failing_rows(failing_rows or [])
+    )
     messages = [
         {"role": "system", "content": DEBUG_SYSTEM_PROMPT},
         {"role": "user", "content": prompt},
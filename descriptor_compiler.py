@@ -0,0 +1,428 @@
+"""Translate scalar ``descriptor`` functions into straight-line NumPy code.
+
+LLM-written descriptors are usually scalar Python: ``math.log``, ``if`` branches and
+``max()`` calls all fail on arrays. The compiler rewrites a supported subset into one
+array function: module functions map to their NumPy ufuncs, ``if``/``else`` and
+conditional expressions become ``np.where`` over both branches, ``max``/``min``
+become ``np.maximum``/``np.minimum`` and local variables become temporaries. Anything
+outside the subset (loops, subscripts, helper functions, unknown calls, ...) raises
+``CompileError`` so the caller can fall back to running the original code.
+
+The translation assumes the inputs are float64 arrays and is only checked for
+equivalence by the caller.
+"""
+
+import ast
+import math
+
+import numpy as np
+
+# Upper bound on emitted statements; branches duplicate the code that follows them.
+MAX_STATEMENTS = 400
+
+_UFUNCS = {
+    "sqrt": "sqrt",
+    "cbrt": "cbrt",
+    "exp": "exp",
+    "exp2": "exp2",
+    "expm1": "expm1",
+    "log10": "log10",
+    "log2": "log2",
+    "log1p": "log1p",
+    "sin": "sin",
+    "cos": "cos",
+    "tan": "tan",
+    "asin": "arcsin",
+    "acos": "arccos",
+    "atan": "arctan",
+    "arcsin": "arcsin",
+    "arccos": "arccos",
+    "arctan": "arctan",
+    "sinh": "sinh",
+    "cosh": "cosh",
+    "tanh": "tanh",
+    "asinh": "arcsinh",
+    "acosh": "arccosh",
+    "atanh": "arctanh",
+    "arcsinh": "arcsinh",
+    "arccosh": "arccosh",
+    "arctanh": "arctanh",
+    "fabs": "abs",
+    "abs": "abs",
+    "absolute": "abs",
+    "floor": "floor",
+    "ceil": "ceil",
+    "trunc": "trunc",
+    "square": "square",
+    "sign": "sign",
+    "degrees": "degrees",
+    "radians": "radians",
+    "atan2": "arctan2",
+    "arctan2": "arctan2",
+    "hypot": "hypot",
+    "copysign": "copysign",
+    "pow": "power",
+    "power": "power",
+    "maximum": "maximum",
+    "minimum": "minimum",
+    "fmax": "fmax",
+    "fmin": "fmin",
+    "where": "where",
+    "clip": "clip",
+}
+
+_CONSTANTS = {"pi": math.pi, "e": math.e, "tau": math.tau}
+
+# Functions only available under one of the two modules.
+_MATH_ONLY = {"asin", "acos", "atan", "atan2", "asinh", "acosh", "atanh", "pow"}
+_NUMPY_ONLY = {
+    "arcsin",
+    "arccos",
+    "arctan",
+    "arctan2",
+    "arcsinh",
+    "arccosh",
+    "arctanh",
+    "abs",
+    "absolute",
+    "square",
+    "sign",
+    "power",
+    "maximum",
+    "minimum",
+    "fmax",
+    "fmin",
+    "where",
+    "clip",
+}
+
+_MODULES = {"math": "math", "numpy": "numpy"}
+
+
+class CompileError(Exception):
+    """The descriptor uses a construct the compiler does not translate."""
+
+
+def _np(name: str) -> ast.Attribute:
+    return ast.Attribute(value=ast.Name(id="np", ctx=ast.Load()), attr=name, ctx=ast.Load())
+
+
+def _call(func: ast.expr, *args: ast.expr) -> ast.Call:
+    return ast.Call(func=func, args=list(args), keywords=[])
+
+
+def _is_boolean(node: ast.expr) -> bool:
+    return isinstance(node, ast.Compare | ast.BoolOp) or (
+        isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not)
+    )
+
+
+def _returns(node: ast.stmt) -> bool:
+    return any(isinstance(n, ast.Return) for n in ast.walk(node))
+
+
+class _Translator:
+    def __init__(self, params: list[str], modules: dict[str, str], imported: dict[str, str]):
+        self.params = params
+        self.modules = modules
+        self.imported = imported
+        self.statements: list[ast.stmt] = []
+
+    # --- statements -----------------------------------------------------------------
+
+    def emit(self, value: ast.expr) -> ast.Name:
+        if isinstance(value, ast.Name | ast.Constant):
+            return value
+        if len(self.statements) >= MAX_STATEMENTS:
+            raise CompileError("descriptor is too large to compile")
+        name = f"_t{len(self.statements)}"
+        self.statements.append(
+            ast.Assign(targets=[ast.Name(id=name, ctx=ast.Store())], value=value)
+        )
+        return ast.Name(id=name, ctx=ast.Load())
+
+    def block(self, stmts: list[ast.stmt], env: dict[str, ast.expr]) -> ast.expr:
+        """Translate statements up to a ``return`` and give the returned expression."""
+        for i, stmt in enumerate(stmts):
+            if isinstance(stmt, ast.Return):
+                if stmt.value is None:
+                    raise CompileError("descriptor returns None")
+                return self.emit(self.expr(stmt.value, env))
+            if isinstance(stmt, ast.If) and _returns(stmt):
+                rest = stmts[i + 1 :]
+                test = self.emit(self.truth(stmt.test, env))
+                body = self.block(stmt.body + rest, dict(env))
+                orelse = self.block(stmt.orelse + rest, dict(env))
+                return self.emit(_call(_np("where"), test, body, orelse))
+            if isinstance(stmt, ast.If):
+                self.merge_branches(stmt, env)
+                continue
+            self.statement(stmt, env)
+        raise CompileError("descriptor can finish without returning a value")
+
+    def merge_branches(self, stmt: ast.If, env: dict[str, ast.expr]) -> None:
+        """Translate an ``if`` without returns by selecting each assigned variable."""
+        test = self.emit(self.truth(stmt.test, env))
+        branches = []
+        for stmts in (stmt.body, stmt.orelse):
+            branch_env = dict(env)
+            for inner in stmts:
+                if isinstance(inner, ast.If):
+                    self.merge_branches(inner, branch_env)
+                else:
+                    self.statement(inner, branch_env)
+            branches.append(branch_env)
+        body, orelse = branches
+        for name in set(body) | set(orelse):
+            if name not in body or name not in orelse:
+                # Assigned on one side only: unusable afterwards.
+                env.pop(name, None)
+            elif body[name] is not orelse[name]:
+                env[name] = self.emit(_call(_np("where"), test, body[name], orelse[name]))
+
+    def statement(self, stmt: ast.stmt, env: dict[str, ast.expr]) -> None:
+        if isinstance(stmt, ast.Assign) and len(stmt.targets) == 1:
+            self.assign(stmt.targets[0], stmt.value, env)
+        elif isinstance(stmt, ast.AnnAssign) and stmt.value is not None:
+            self.assign(stmt.target, stmt.value, env)
+        elif isinstance(stmt, ast.AugAssign) and isinstance(stmt.target, ast.Name):
+            current = ast.Name(id=stmt.target.id, ctx=ast.Load())
+            self.assign(stmt.target, ast.BinOp(left=current, op=stmt.op, right=stmt.value), env)
+        elif isinstance(stmt, ast.Import | ast.ImportFrom):
+            _register_import(stmt, self.modules, self.imported)
+        elif isinstance(stmt, ast.Pass) or (
+            isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Constant)
+        ):
+            pass
+        else:
+            raise CompileError(f"unsupported statement: {type(stmt).__name__}")
+
+    def assign(self, target: ast.expr, value: ast.expr, env: dict[str, ast.expr]) -> None:
+        if isinstance(target, ast.Name):
+            env[target.id] = self.emit(self.expr(value, env))
+        elif (
+            isinstance(target, ast.Tuple)
+            and isinstance(value, ast.Tuple)
+            and len(target.elts) == len(value.elts)
+            and all(isinstance(t, ast.Name) for t in target.elts)
+        ):
+            values = [self.emit(self.expr(v, env)) for v in value.elts]
+            for t, v in zip(target.elts, values, strict=True):
+                env[t.id] = v
+        else:
+            raise CompileError("unsupported assignment target")
+
+    # --- expressions ----------------------------------------------------------------
+
+    def truth(self, node: ast.expr, env: dict[str, ast.expr]) -> ast.expr:
+        """Translate ``node`` as an element-wise Python truth value."""
+        translated = self.expr(node, env)
+        if _is_boolean(node):
+            return translated
+        return ast.Compare(left=translated, ops=[ast.NotEq()], comparators=[ast.Constant(0)])
+
+    def expr(self, node: ast.expr, env: dict[str, ast.expr]) -> ast.expr:
+        if isinstance(node, ast.Constant):
+            if isinstance(node.value, bool) or not isinstance(node.value, int | float):
+                raise CompileError(f"unsupported constant {node.value!r}")
+            return ast.Constant(node.value)
+        if isinstance(node, ast.Name):
+            if node.id in env:
+                return env[node.id]
+            if node.id in self.imported and self.imported[node.id].startswith("const:"):
+                return ast.Constant(_CONSTANTS[self.imported[node.id][6:]])
+            raise CompileError(f"unknown name {node.id!r}")
+        if isinstance(node, ast.Attribute):
+            module = self._module(node.value)
+            if module is not None and node.attr in _CONSTANTS:
+                return ast.Constant(_CONSTANTS[node.attr])
+            raise CompileError("unsupported attribute access")
+        if isinstance(node, ast.BinOp):
+            if isinstance(node.op, ast.MatMult | ast.BitAnd | ast.BitOr | ast.BitXor):
+                raise CompileError("unsupported operator")
+            if isinstance(node.op, ast.LShift | ast.RShift):
+                raise CompileError("unsupported operator")
+            return ast.BinOp(
+                left=self.expr(node.left, env), op=node.op, right=self.expr(node.right, env)
+            )
+        if isinstance(node, ast.UnaryOp):
+            if isinstance(node.op, ast.Not):
+                return _call(_np("logical_not"), self.truth(node.operand, env))
+            if isinstance(node.op, ast.USub | ast.UAdd):
+                return ast.UnaryOp(op=node.op, operand=self.expr(node.operand, env))
+            raise CompileError("unsupported unary operator")
+        if isinstance(node, ast.Compare):
+            return self._compare(node, env)
+        if isinstance(node, ast.BoolOp):
+            return self._boolop(node, env)
+        if isinstance(node, ast.IfExp):
+            return _call(
+                _np("where"),
+                self.truth(node.test, env),
+                self.expr(node.body, env),
+                self.expr(node.orelse, env),
+            )
+        if isinstance(node, ast.Call):
+            return self._call(node, env)
+        raise CompileError(f"unsupported expression: {type(node).__name__}")
+
+    def _compare(self, node: ast.Compare, env: dict[str, ast.expr]) -> ast.expr:
+        if any(isinstance(op, ast.Is | ast.IsNot | ast.In | ast.NotIn) for op in node.ops):
+            raise CompileError("unsupported comparison")
+        left = self.emit(self.expr(node.left, env))
+        parts = []
+        for op, comparator in zip(node.ops, node.comparators, strict=True):
+            right = self.emit(self.expr(comparator, env))
+            parts.append(ast.Compare(left=left, ops=[op], comparators=[right]))
+            left = right
+        result = parts[0]
+        for part in parts[1:]:
+            result = _call(_np("logical_and"), result, part)
+        return result
+
+    def _boolop(self, node: ast.BoolOp, env: dict[str, ast.expr]) -> ast.expr:
+        # ``a and b`` is b where a is truthy, else a; ``a or b`` the other way round.
+        values = [self.emit(self.expr(v, env)) for v in node.values]
+        result = values[-1]
+        for value, original in zip(values[-2::-1], node.values[-2::-1], strict=True):
+            test = self.emit(self.truth(original, env)) if not _is_boolean(original) else value
+            if isinstance(node.op, ast.And):
+                result = _call(_np("where"), test, result, value)
+            else:
+                result = _call(_np("where"), test, value, result)
+        return result
+
+    def _module(self, node: ast.expr) -> str | None:
+        if isinstance(node, ast.Name) and node.id in self.modules:
+            return self.modules[node.id]
+        return None
+
+    def _call(self, node: ast.Call, env: dict[str, ast.expr]) -> ast.expr:
+        if node.keywords:
+            raise CompileError("keyword arguments are not supported")
+        if any(isinstance(a, ast.Starred) for a in node.args):
+            raise CompileError("starred arguments are not supported")
+        args = [self.expr(a, env) for a in node.args]
+
+        if isinstance(node.func, ast.Name) and node.func.id in env:
+            raise CompileError(f"call to local variable {node.func.id!r}")
+        if isinstance(node.func, ast.Name) and node.func.id not in self.imported:
+            return self._builtin(node.func.id, node, args, env)
+        if isinstance(node.func, ast.Attribute):
+            module, name = self._module(node.func.value), node.func.attr
+        elif isinstance(node.func, ast.Name):
+            module, name = self.imported[node.func.id].split(":", 1)
+        else:
+            module = None
+        if module is None:
+            raise CompileError("unsupported call")
+
+        if name == "log":
+            if len(args) == 2 and module == "math":
+                return ast.BinOp(
+                    left=_call(_np("log"), args[0]), op=ast.Div(), right=_call(_np("log"), args[1])
+                )
+            if len(args) == 1:
+                return _call(_np("log"), args[0])
+            raise CompileError("unsupported log call")
+        allowed = _UFUNCS.get(name)
+        wrong_module = (module == "math" and name in _NUMPY_ONLY) or (
+            module == "numpy" and name in _MATH_ONLY
+        )
+        if allowed is None or wrong_module:
+            raise CompileError(f"unsupported function {module}.{name}")
+        if name == "where":
+            if len(args) != 3:
+                raise CompileError("np.where needs three arguments")
+            args[0] = self.truth(node.args[0], env)
+        return _call(_np(allowed), *args)
+
+    def _builtin(
+        self, name: str, node: ast.Call, args: list[ast.expr], env: dict[str, ast.expr]
+    ) -> ast.expr:
+        if name in ("max", "min") and len(args) >= 2:
+            func = _np("maximum" if name == "max" else "minimum")
+            result = args[0]
+            for arg in args[1:]:
+                result = _call(func, result, arg)
+            return result
+        if name == "abs" and len(args) == 1:
+            return _call(_np("abs"), args[0])
+        if name == "float" and len(args) == 1:
+            return _call(_np("asarray"), args[0], ast.Constant("float64"))
+        if name == "int" and len(args) == 1:
+            return _call(_np("trunc"), args[0])
+        if name == "round" and len(args) == 1:
+            return _call(_np("round"), args[0])
+        if name == "pow" and len(args) == 2:
+            return ast.BinOp(left=args[0], op=ast.Pow(), right=args[1])
+        if name == "bool" and len(args) == 1:
+            return self.truth(node.args[0], env)
+        raise CompileError(f"unsupported call to {name}()")
+
+
+def _register_import(stmt, modules: dict[str, str], imported: dict[str, str]) -> None:
+    if isinstance(stmt, ast.Import):
+        for alias in stmt.names:
+            if alias.name not in _MODULES:
+                raise CompileError(f"unsupported import {alias.name}")
+            modules[alias.asname or alias.name] = _MODULES[alias.name]
+        return
+    if stmt.module not in _MODULES or stmt.level:
+        raise CompileError(f"unsupported import from {stmt.module}")
+    for alias in stmt.names:
+        kind = "const" if alias.name in _CONSTANTS else _MODULES[stmt.module]
+        imported[alias.asname or alias.name] = f"{kind}:{alias.name}"
+
+
+def translate(func_code: str) -> str:
+    """Return the source of the array version of ``descriptor`` in ``func_code``.
+
+    Raises CompileError when the code is outside the supported subset and
+    SyntaxError when it does not parse.
+    """
+    tree = ast.parse(func_code)
+    modules = {"np": "numpy", "math": "math"}
+    imported: dict[str, str] = {}
+    fn = None
+    for stmt in tree.body:
+        if isinstance(stmt, ast.FunctionDef) and stmt.name == "descriptor":
+            fn = stmt
+        elif isinstance(stmt, ast.Import | ast.ImportFrom):
+            _register_import(stmt, modules, imported)
+        elif not (isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Constant)):
+            raise CompileError(f"unsupported module-level statement: {type(stmt).__name__}")
+    if fn is None:
+        raise CompileError("no 'descriptor' function defined")
+    args = fn.args
+    if (
+        args.posonlyargs
+        or args.vararg
+        or args.kwonlyargs
+        or args.kwarg
+        or args.defaults
+        or fn.decorator_list
+    ):
+        raise CompileError("descriptor must take plain positional parameters")
+
+    params = [a.arg for a in args.args]
+    translator = _Translator(params, modules, imported)
+    env: dict[str, ast.expr] = {p: ast.Name(id=p, ctx=ast.Load()) for p in params}
+    result = translator.block(fn.body, env)
+
+    # Constant or scalar results are broadcast to one value per row.
+    shape = _call(_np("shape"), ast.Name(id=params[0], ctx=ast.Load())) if params else None
+    if shape is None:
+        raise CompileError("descriptor takes no parameters")
+    out = _call(_np("broadcast_to"), _call(_np("asarray"), result, ast.Constant("float64")), shape)
+    lines = [ast.unparse(ast.fix_missing_locations(stmt)) for stmt in translator.statements]
+    lines.append(f"return {ast.unparse(out)}")
+    body = "\n".join(f"    {line}" for line in lines)
+    return f"def descriptor({', '.join(params)}):\n{body}\n"
+
+
+def compile_descriptor(func_code: str):
+    """Compile ``descriptor`` to a function of whole float64 column arrays."""
+    namespace = {"np": np}
+    exec(translate(func_code), namespace)  # noqa: S102
+    return namespace["descriptor"]
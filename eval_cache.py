@@ -0,0 +1,230 @@
+"""Persistent content-addressed cache of descriptor evaluations.
+
+Entries are keyed by a hash of the normalized ``descriptor`` AST (comments, whitespace,
+docstrings and local variable names do not matter), the dataset fingerprint and the
+evaluation settings, so re-proposed or resumed formulas skip exec, classification
+and plotting. The cache lives in a SQLite file with an LRU size cap.
+"""
+
+import ast
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+# Bump when the evaluator changes in a way that alters stored results.
+SCHEMA_VERSION = 3
+
+# Seconds to wait for another process's write lock.
+LOCK_TIMEOUT = 60
+
+
+def _bindings(node: ast.AST) -> list[str]:
+    """Return the names ``node`` binds in its scope."""
+    if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+        return [node.id]
+    if isinstance(node, ast.arg):
+        return [node.arg]
+    if isinstance(node, ast.FunctionDef | ast.AsyncFunctionDef | ast.ClassDef):
+        return [node.name]
+    if isinstance(node, ast.ExceptHandler) and node.name:
+        return [node.name]
+    return []
+
+
+class _LocalRenamer(ast.NodeTransformer):
+    """Rename the names bound in a function body to positional placeholders.
+
+    Every name bound anywhere in ``body`` (assignment targets, nested def and lambda
+    parameters, nested def names) gets its own placeholder, and all of its uses go
+    through the same map, so two bodies normalize alike only if one is a consistent
+    renaming of the other. Placeholders are not identifiers, so they cannot clash
+    with names in the code.
+    """
+
+    def __init__(self, params: set[str], body: list[ast.stmt]):
+        self.names: dict[str, str] = {}
+        for stmt in body:
+            for node in ast.walk(stmt):
+                for name in _bindings(node):
+                    if name not in params and name not in self.names:
+                        self.names[name] = f"<v{len(self.names)}>"
+
+    def visit_Name(self, node: ast.Name) -> ast.Name:
+        node.id = self.names.get(node.id, node.id)
+        return node
+
+    def visit_arg(self, node: ast.arg) -> ast.arg:
+        node.arg = self.names.get(node.arg, node.arg)
+        return self.generic_visit(node)
+
+    def visit_FunctionDef(self, node: ast.FunctionDef) -> ast.FunctionDef:
+        node.name = self.names.get(node.name, node.name)
+        return self.generic_visit(node)
+
+    visit_AsyncFunctionDef = visit_ClassDef = visit_FunctionDef
+
+    def visit_ExceptHandler(self, node: ast.ExceptHandler) -> ast.ExceptHandler:
+        if node.name:
+            node.name = self.names.get(node.name, node.name)
+        return self.generic_visit(node)
+
+    def visit_Global(self, node: ast.Global) -> ast.Global:
+        node.names = [self.names.get(name, name) for name in node.names]
+        return node
+
+    visit_Nonlocal = visit_Global
+
+
+def _strip_docstrings(tree: ast.AST) -> None:
+    for node in ast.walk(tree):
+        body = getattr(node, "body", None)
+        if (
+            isinstance(body, list)
+            and body
+            and isinstance(body[0], ast.Expr)
+            and isinstance(body[0].value, ast.Constant)
+            and isinstance(body[0].value.value, str)
+        ):
+            node.body = body[1:] or [ast.Pass()]
+
+
+def normalize_code(func_code: str) -> str:
+    """Return a canonical dump of the module AST with ``descriptor`` normalized.
+
+    Raises SyntaxError for unparsable code and ValueError when there is no
+    ``descriptor`` function.
+    """
+    tree = ast.parse(func_code)
+    _strip_docstrings(tree)
+    functions = [
+        node
+        for node in tree.body
+        if isinstance(node, ast.FunctionDef) and node.name == "descriptor"
+    ]
+    if not functions:
+        raise ValueError("No 'descriptor' function defined")
+    fn = functions[-1]
+    params = {a.arg for a in fn.args.posonlyargs + fn.args.args + fn.args.kwonlyargs}
+    renamer = _LocalRenamer(params, fn.body)
+    for stmt in fn.body:
+        renamer.visit(stmt)
+    return ast.dump(tree, annotate_fields=False, include_attributes=False)
+
+
+def dataset_fingerprint(columns: dict[str, np.ndarray]) -> str:
+    h = hashlib.sha256()
+    for name in sorted(columns):
+        arr = np.ascontiguousarray(columns[name])
+        h.update(name.encode())
+        h.update(arr.dtype.str.encode())
+        h.update(arr.tobytes())
+    return h.hexdigest()
+
+
+class EvalCache:
+    """SQLite-backed LRU cache of evaluation records.
+
+    Several processes (e.g. islands) may share one file: it is opened in WAL mode and
+    waits up to ``LOCK_TIMEOUT`` seconds for a lock; a write that still finds the
+    database locked is skipped. Each instance keeps its own use clock and entry count,
+    so with several writers the LRU order and the size cap are only approximate.
+    """
+
+    def __init__(self, path: Path, max_entries: int = 10000):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=LOCK_TIMEOUT, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY, record TEXT NOT NULL, vals BLOB NOT NULL,"
+            " last_used INTEGER NOT NULL)"
+        )
+        self._conn.commit()
+        self._clock = self._conn.execute("SELECT MAX(last_used) FROM entries").fetchone()[0] or 0
+        self._count = len(self)
+
+    @staticmethod
+    def key(func_code: str, data_fingerprint: str, max_depth: int, train_split_label: int) -> str:
+        payload = json.dumps(
+            [
+                SCHEMA_VERSION,
+                normalize_code(func_code),
+                data_fingerprint,
+                max_depth,
+                train_split_label,
+            ]
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _tick(self) -> int:
+        self._clock += 1
+        return self._clock
+
+    def get(self, key: str) -> tuple[dict, np.ndarray] | None:
+        """Return ``(record, values)`` for a cached evaluation, or None on a miss."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT record, vals FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute(
+                "UPDATE entries SET last_used = ? WHERE key = ?", (self._tick(), key)
+            )
+            self._conn.commit()
+        record, vals = row
+        return json.loads(record), np.frombuffer(vals, dtype=np.float64).copy()
+
+    def put(self, key: str, record: dict, values: np.ndarray) -> None:
+        blob = np.ascontiguousarray(values, dtype=np.float64).tobytes()
+        with self._lock:
+            # try-catch approved: the cache is optional, a write that stays locked is dropped
+            try:
+                self._insert(key, json.dumps(record), blob)
+            except sqlite3.OperationalError as e:
+                self._conn.rollback()
+                log.warning("Evaluation cache write skipped: %s", e)
+
+    def _insert(self, key: str, record: str, blob: bytes) -> None:
+        fields = (record, blob, self._tick(), key)
+        inserted = self._conn.execute(
+            "INSERT OR IGNORE INTO entries (record, vals, last_used, key) VALUES (?, ?, ?, ?)",
+            fields,
+        ).rowcount
+        if inserted:
+            self._count += 1
+        else:
+            self._conn.execute(
+                "UPDATE entries SET record = ?, vals = ?, last_used = ? WHERE key = ?", fields
+            )
+        excess = self._count - self.max_entries
+        if excess > 0:
+            self._count -= self._conn.execute(
+                "DELETE FROM entries WHERE key IN"
+                " (SELECT key FROM entries ORDER BY last_used LIMIT ?)",
+                (excess,),
+            ).rowcount
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self)}
+
+    def close(self) -> None:
+        self._conn.close()
@@ -1,24 +1,69 @@
 """Evaluate candidate descriptor formulas on the ABX3 dataset."""
 
+import hashlib
+import inspect
 import logging
-import threading
+import math
+import os
+from collections.abc import Mapping
 from dataclasses import dataclass, field
 from pathlib import Path
 
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-from sklearn.tree import DecisionTreeClassifier
+
+from dataset_cache import load_table
+from descriptor_compiler import CompileError, compile_descriptor
+from eval_cache import EvalCache, dataset_fingerprint
+from features import FeatureBank
+from group_metrics import (
+    ANION_ORDER,
+    Grouping,
+    GroupMetrics,
+    dataset_groupings,
+    factorize,
+)
+from plotting import PlotRenderer, copy_plot, render_plot
+from prescreen import prescreen
+from refine import find_constants, pattern_search, substitute
+from regression import family_masks, regression_scores
+from sandbox import DescriptorSandbox
+from splits import SplitRule, fit_split, fit_splits
+from splits2d import DEFAULT_ANGLES, fit_pair_lines, fit_pair_trees
+from value_store import ValueStore
 
 log = logging.getLogger(__name__)
 
 TIMEOUT_SECONDS = 10
+REFINE_SECONDS = 20
+INPUT_COLUMNS = ("rA", "rB", "rX", "nA", "nB", "nX")
+DOUBLE_PEROVSKITE_RENAME = {
+    "rA (Ang)": "rA",
+    "rB1 (Ang)": "rB1",
+    "rB2 (Ang)": "rB2",
+    "rX (Ang)": "rX",
+}
+DECOMPOSITION_RENAME = {"dHdec (meV/atom)": "dHd", **DOUBLE_PEROVSKITE_RENAME}
+# Probe rows per extreme of each radius and of rA/rB.
+PROBE_EXTREMES = 3
+MAX_REPORTED_ROWS = 5
 
 
 class EvalTimeout(Exception):
     pass
 
 
+class DescriptorError(ValueError):
+    """The descriptor failed on some compounds; ``rows`` describes them."""
+
+    def __init__(self, message: str, rows: list[dict] | tuple = ()):
+        super().__init__(message)
+        self.rows = list(rows)
+
+    def __reduce__(self):
+        return type(self), (self.args[0], self.rows)
+
+
 def _timeout_handler(signum, frame):
     raise EvalTimeout("Function execution timed out")
 
@@ -30,102 +75,269 @@ class EvalResult:
     test_accuracy: float = 0.0
     false_positive_rate: float = 0.0
     per_anion_accuracy: dict = field(default_factory=dict)
+    group_metrics: dict = field(default_factory=dict)
+    generalization: dict = field(default_factory=dict)
+    regression: dict = field(default_factory=dict)
     thresholds: list = field(default_factory=list)
     plot_path: str = ""
     metrics_summary: str = ""
     error: str = ""
-    descriptor_values: list = field(default_factory=list)
+    values_row: int = -1
+    failing_rows: list = field(default_factory=list)
+    exec_path: str = ""
+    rank_fingerprint: str = ""
+    equivalent_to: str = ""
+    cost_class: str = ""
+    value_store: ValueStore | None = field(default=None, repr=False, compare=False)
+
+    @property
+    def descriptor_values(self) -> np.ndarray:
+        """Read-only view of this candidate's row in ``value_store``."""
+        if self.value_store is None or self.values_row < 0:
+            return np.empty(0)
+        return self.value_store.row(self.values_row)
 
 
 def load_dataset(data_path: str) -> pd.DataFrame:
-    df = pd.read_csv(data_path)
-    df.rename(
-        columns={"rA (Ang)": "rA", "rB (Ang)": "rB", "rX (Ang)": "rX"},
-        inplace=True,
+    return load_table(data_path, rename={"rA (Ang)": "rA", "rB (Ang)": "rB", "rX (Ang)": "rX"})
+
+
+def load_double_perovskites(data_path: str) -> pd.DataFrame:
+    """Load the ICSD A2BB'X6 compounds with the ``descriptor`` inputs of an ABX3.
+
+    The B-site radius and charge are the means of B and B'. Compounds without an
+    ICSD label are dropped; the label is in ``icsd_label``.
+    """
+    df = load_table(data_path, rename=DOUBLE_PEROVSKITE_RENAME)
+    df = df.dropna(subset=["icsd_label"]).reset_index(drop=True)
+    return pd.DataFrame(
+        {**_b_site_inputs(df), "X": df["X"], "icsd_label": df["icsd_label"].astype(np.int8)}
     )
-    return df
 
 
-def _exec_descriptor(func_code: str, df: pd.DataFrame) -> np.ndarray:
-    namespace = {"np": np, "math": __import__("math")}
+def load_decomposition_enthalpies(data_path: str) -> pd.DataFrame:
+    """Load TableS2: ``descriptor`` inputs, ``compound``, ``X`` and dHdec as ``dHd``.
+
+    B-site radius and charge are averaged over B and B' as in
+    ``load_double_perovskites``; single perovskites have no B'.
+    """
+    df = load_table(data_path, rename=DECOMPOSITION_RENAME)
+    return pd.DataFrame(
+        {**_b_site_inputs(df), "compound": df["compound"], "X": df["X"], "dHd": df["dHd"]}
+    )
+
+
+def _b_site_inputs(df: pd.DataFrame) -> dict[str, pd.Series]:
+    return {
+        "rA": df["rA"],
+        "rB": df[["rB1", "rB2"]].mean(axis=1),
+        "rX": df["rX"],
+        "nA": df["nA"],
+        "nB": df[["nB1", "nB2"]].mean(axis=1),
+        "nX": df["nX"],
+    }
+
+
+def _load_descriptor(func_code: str):
+    namespace = {"np": np, "math": math}
     exec(func_code, namespace)  # noqa: S102
-    descriptor_fn = namespace["descriptor"]
+    return namespace["descriptor"]
 
-    result = {"values": None, "error": None}
 
-    def _run():
-        try:
-            values = []
-            for _, row in df.iterrows():
-                val = descriptor_fn(
-                    rA=row["rA"], rB=row["rB"], rX=row["rX"],
-                    nA=row["nA"], nB=row["nB"], nX=row["nX"],
-                )
-                if val is None or (isinstance(val, float) and (np.isnan(val) or np.isinf(val))):
-                    raise ValueError(f"descriptor returned {val} for {row['ABX3']}")
-                values.append(float(val))
-            result["values"] = np.array(values)
-        except Exception as e:
-            result["error"] = e
-
-    thread = threading.Thread(target=_run, daemon=True)
-    thread.start()
-    thread.join(TIMEOUT_SECONDS)
-
-    if thread.is_alive():
-        raise EvalTimeout(f"descriptor timed out after {TIMEOUT_SECONDS}s")
-    if result["error"] is not None:
-        raise result["error"]
-    return result["values"]
+def _failing_row(columns: dict[str, list], names: np.ndarray, i: int, problem: str) -> dict:
+    return {
+        "compound": str(names[i]),
+        **{c: values[i] for c, values in columns.items()},
+        "error": problem,
+    }
+
+
+def _call_row(descriptor_fn, columns: dict[str, list], i: int) -> tuple[float, str]:
+    """Value of the descriptor on row ``i``, or nan and a description of the problem."""
+    # try-catch approved: failures are collected per row so they can be reported together
+    try:
+        val = descriptor_fn(**{c: values[i] for c, values in columns.items()})
+    except Exception as e:
+        return math.nan, f"{type(e).__name__}: {e}"
+    if val is None:
+        return math.nan, "returned None"
+    # try-catch approved: non-numeric return values are reported like any other failure
+    try:
+        value = float(val)
+    except (TypeError, ValueError, OverflowError) as e:
+        return math.nan, f"{type(e).__name__}: {e}"
+    if not math.isfinite(value):
+        return math.nan, f"returned {val}"
+    return value, ""
+
+
+def _run_probe(
+    descriptor_fn, columns: dict[str, list], names: np.ndarray, probe: np.ndarray
+) -> np.ndarray:
+    """Run the descriptor row-wise on the probe compounds and fail fast on any problem.
+
+    Raises DescriptorError listing the failing probe rows; otherwise returns the probe
+    values, which also serve as the reference for the array paths.
+    """
+    values = np.empty(len(probe))
+    failures = []
+    for k, i in enumerate(probe):
+        values[k], problem = _call_row(descriptor_fn, columns, i)
+        if problem:
+            failures.append(_failing_row(columns, names, i, problem))
+    if failures:
+        first = failures[0]
+        raise DescriptorError(
+            f"descriptor failed on {len(failures)} of {len(probe)} probe compounds, "
+            f"first {first['compound']}: {first['error']}",
+            failures[:MAX_REPORTED_ROWS],
+        )
+    return values
+
+
+def _run_rowwise(descriptor_fn, columns: dict[str, list], names: np.ndarray) -> np.ndarray:
+    """Call the descriptor once per compound on plain Python scalars.
+
+    Rows after the named compounds (appended evaluation sets) may fail and become NaN.
+    """
+    values = np.empty(len(columns["rA"]))
+    for i in range(len(values)):
+        values[i], problem = _call_row(descriptor_fn, columns, i)
+        if problem and i < len(names):
+            row = _failing_row(columns, names, i, problem)
+            raise DescriptorError(f"descriptor failed for {names[i]}: {problem}", [row])
+    return values
+
+
+def _run_arrays(
+    array_fn,
+    arrays: dict[str, np.ndarray],
+    probe: np.ndarray,
+    expected: np.ndarray,
+    n: int | None = None,
+) -> np.ndarray | None:
+    """Call ``array_fn`` once on whole column arrays.
+
+    Returns None when the result cannot be trusted: the call raised, returned the wrong
+    shape or non-finite values, or disagrees with the row-wise ``expected`` values on
+    the probe rows. Only the first ``n`` rows are checked; non-finite values in the
+    rows after them (appended evaluation sets) become NaN.
+    """
+    total = len(arrays["rA"])
+    n = total if n is None else n
+    # try-catch approved: array inputs are only a fast path, any failure falls back to rows
+    try:
+        with np.errstate(all="ignore"):
+            values = np.array(array_fn(**arrays), dtype=np.float64)
+    except Exception:
+        return None
+    if values.shape != (total,) or not np.isfinite(values[:n]).all():
+        return None
+    if not np.allclose(values[probe], expected, rtol=1e-9, atol=1e-12):
+        return None
+    values[~np.isfinite(values)] = np.nan
+    return values
+
+
+def _run_compiled(
+    func_code: str,
+    arrays: dict[str, np.ndarray],
+    probe: np.ndarray,
+    expected: np.ndarray,
+    n: int | None = None,
+) -> np.ndarray | None:
+    """Translate a scalar-only descriptor to NumPy and run it on whole column arrays."""
+    # try-catch approved: code outside the compiler's subset goes to the interpreter
+    try:
+        compiled_fn = compile_descriptor(func_code)
+    except (CompileError, SyntaxError):
+        return None
+    return _run_arrays(compiled_fn, arrays, probe, expected, n)
+
+
+def probe_rows(arrays: dict[str, np.ndarray], anions: np.ndarray) -> np.ndarray:
+    """Indices of an adversarial probe set of compounds.
+
+    Covers the smallest and largest rA/rB, rA/rB closest to 1 (where log(rA/rB) is
+    near 0), the extremes of every radius, and one compound of every (nA, nB, anion)
+    combination.
+    """
+    k = PROBE_EXTREMES
+    ratio = arrays["rA"] / arrays["rB"]
+    order = np.argsort(ratio, kind="stable")
+    picks = [order[:k], order[-k:], np.argsort(np.abs(np.log(ratio)), kind="stable")[:k]]
+    for c in ("rA", "rB", "rX"):
+        radius_order = np.argsort(arrays[c], kind="stable")
+        picks += [radius_order[:1], radius_order[-1:]]
+    combos = np.stack([arrays["nA"], arrays["nB"], np.unique(anions, return_inverse=True)[1]])
+    _, first = np.unique(combos, axis=1, return_index=True)
+    picks.append(first)
+    return np.unique(np.concatenate(picks))
+
+
+def rank_fingerprint(values: np.ndarray, fold_reversed: bool = False) -> str:
+    """Hash of the descriptor's rank order, identical for any strictly increasing transform.
+
+    A 1-D decision tree only sees the order of the values, so descriptors with the same
+    fingerprint split the training compounds identically. Decreasing transforms (e.g.
+    ``1/t``) get a different fingerprint, so the sign of rank-based metrics is kept;
+    ``fold_reversed`` maps both orders to one fingerprint where only the training
+    accuracy matters. Only the training result is exact for a twin: thresholds sit at
+    midpoints between training values, which a nonlinear transform moves, so a test
+    compound between two training values may fall on the other side.
+    """
+    _, ranks = np.unique(values, return_inverse=True)
+    ranks = ranks.astype(np.int32)
+    canonical = ranks.tobytes()
+    if fold_reversed:
+        canonical = min(canonical, (ranks.max(initial=0) - ranks).tobytes())
+    return hashlib.blake2b(canonical, digest_size=16).hexdigest()
+
 
 def _classify(
     values: np.ndarray, labels: np.ndarray, train_mask: np.ndarray, max_depth: int
-) -> tuple[list[float], float, np.ndarray, DecisionTreeClassifier]:
-    X_train = values[train_mask].reshape(-1, 1)
-    y_train = labels[train_mask]
+) -> tuple[list[float], float, np.ndarray, SplitRule]:
+    rule = fit_split(values[train_mask], labels[train_mask], max_depth)
+    preds_encoded = rule.predict(values)
+    accuracy = float((preds_encoded == labels).mean())
+    return rule.thresholds.tolist(), accuracy, preds_encoded, rule
 
-    clf = DecisionTreeClassifier(max_depth=max_depth)
-    clf.fit(X_train, y_train)
 
-    preds_encoded = clf.predict(values.reshape(-1, 1))
-    accuracy = float((preds_encoded == labels).mean())
+def _metrics_engine(columns: dict[str, np.ndarray]) -> GroupMetrics:
+    groupings = dataset_groupings(columns["X"], columns["nA"], columns["nB"], columns["is_train"])
+    return GroupMetrics(columns["exp_label"], groupings)
 
-    tree = clf.tree_
-    thresholds = sorted(
-        tree.threshold[i] for i in range(tree.node_count) if tree.threshold[i] != -2.0
-    )
 
-    return thresholds, accuracy, preds_encoded, clf
+def _rate(numerator, denominator) -> float:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return float(np.float64(numerator) / denominator)
 
 
-def _compute_metrics(
-    preds: np.ndarray,
-    labels: np.ndarray,
-    train_mask: np.ndarray,
-    df: pd.DataFrame,
-) -> dict:
-    test_mask = ~train_mask
+def _compute_metrics(engine: GroupMetrics, preds: np.ndarray, train_split_label: int) -> dict:
+    return _metrics_from_counts(engine, engine.counts(preds), train_split_label)
 
-    tp = ((labels == 1) & (preds == 1)).sum()
-    fp = ((labels == -1) & (preds == 1)).sum()
-    tn = ((labels == -1) & (preds == -1)).sum()
-    fn = ((labels == 1) & (preds == -1)).sum()
 
-    per_anion = {}
-    for x in ["O", "F", "Cl", "Br", "I"]:
-        mask = df["X"].values == x
-        if mask.any():
-            per_anion[x] = float((preds[mask] == labels[mask]).mean())
+def _metrics_from_counts(
+    engine: GroupMetrics, counts: dict[str, np.ndarray], train_split_label: int
+) -> dict:
+    tn, fp, fn, tp = counts["all"][0].tolist()
+    is_train = np.array([k == str(train_split_label) for k in engine.groupings["split"].keys])
+    train = counts["split"][is_train].sum(axis=0)
+    test = counts["split"][~is_train].sum(axis=0)
 
+    group_metrics = {
+        name: engine.summarize(name, counts[name]) for name in ("anion", "nA", "nB", "nA_nB")
+    }
     return {
-        "train_accuracy": float((preds[train_mask] == labels[train_mask]).mean()),
-        "test_accuracy": float((preds[test_mask] == labels[test_mask]).mean()),
-        "tp": int(tp),
-        "fp": int(fp),
-        "tn": int(tn),
-        "fn": int(fn),
-        "false_positive_rate": float(fp / (fp + tn)),
-        "per_anion_accuracy": per_anion,
+        "train_accuracy": _rate(train[0] + train[3], train.sum()),
+        "test_accuracy": _rate(test[0] + test[3], test.sum()),
+        "tp": tp,
+        "fp": fp,
+        "tn": tn,
+        "fn": fn,
+        "false_positive_rate": _rate(fp, fp + tn),
+        "per_anion_accuracy": {k: g["accuracy"] for k, g in group_metrics["anion"].items()},
+        "group_metrics": group_metrics,
     }
 
 
@@ -142,59 +354,519 @@ def _format_metrics_summary(accuracy: float, metrics: dict, thresholds: list[flo
     ]
     for anion, acc in metrics["per_anion_accuracy"].items():
         lines.append(f"  {anion}: {acc:.1%}")
+    if gen := metrics.get("generalization"):
+        lines.append(
+            f"A2BB'X6 generalization ({gen['n']} ICSD compounds, same thresholds): "
+            f"accuracy {gen['accuracy']:.1%}, false positive rate {gen['false_positive_rate']:.1%}"
+        )
+    if reg := metrics.get("regression"):
+        r2 = ", ".join(f"{family} {v:.2f}" for family, v in reg["r2"].items() if math.isfinite(v))
+        lines.append(
+            f"DFT decomposition enthalpy ({reg['n']} compounds): sign agreement "
+            f"{reg['sign_agreement']:.1%}, R² {r2 or 'n/a'}"
+        )
     return "\n".join(lines)
 
 
-def _generate_plot(
+# Optional evaluation sets run in the same pass as the dataset: (generalization, regression).
+Extras = tuple[pd.DataFrame | None, pd.DataFrame | None]
+NO_EXTRAS: Extras = (None, None)
+_EXTRA_PREFIXES = ("gen", "reg")
+
+
+def _same_data(a: tuple, b: tuple) -> bool:
+    return all(x is y for x, y in zip(a, b, strict=True))
+
+
+def _dataset_columns(df: pd.DataFrame, extras: Extras = NO_EXTRAS) -> dict[str, np.ndarray]:
+    columns = {c: df[c].to_numpy() for c in INPUT_COLUMNS}
+    columns["ABX3"] = df["ABX3"].to_numpy(dtype=str)
+    columns["X"] = df["X"].to_numpy(dtype=str)
+    columns["exp_label"] = df["exp_label"].to_numpy()
+    columns["is_train"] = df["is_train"].to_numpy()
+    for prefix, extra in zip(_EXTRA_PREFIXES, extras, strict=True):
+        if extra is not None:
+            for c in INPUT_COLUMNS:
+                columns[f"{prefix}_{c}"] = extra[c].to_numpy()
+            columns[f"{prefix}_X"] = extra["X"].to_numpy(dtype=str)
+    generalization, regression = extras
+    if generalization is not None:
+        columns["gen_label"] = generalization["icsd_label"].to_numpy()
+    if regression is not None:
+        columns["reg_dHd"] = regression["dHd"].to_numpy(dtype=np.float64)
+        columns["reg_compound"] = regression["compound"].to_numpy(dtype=str)
+    return columns
+
+
+def _extras_setup(columns: dict[str, np.ndarray]) -> dict:
+    """Where each appended set sits in the combined values, and what scores it."""
+    offset = len(columns["ABX3"])
+    extras = {}
+    if "gen_X" in columns:
+        rows = slice(offset, offset + len(columns["gen_X"]))
+        extras["generalization"] = (rows, _generalization_engine(columns))
+        offset = rows.stop
+    if "reg_X" in columns:
+        rows = slice(offset, offset + len(columns["reg_X"]))
+        masks = family_masks(columns["reg_X"], columns["reg_compound"])
+        extras["regression"] = (rows, (columns["reg_dHd"], masks))
+    return extras
+
+
+def _extra_metrics(rule: SplitRule, values: np.ndarray, extras: dict) -> dict:
+    """Metrics of the appended sets, using the thresholds learned on the dataset."""
+    metrics = {}
+    if "generalization" in extras:
+        rows, engine = extras["generalization"]
+        metrics["generalization"] = _generalization_metrics(rule, values[rows], engine)
+    if "regression" in extras:
+        rows, (dhd, masks) = extras["regression"]
+        reg_values = values[rows]
+        preds = rule.predict(np.where(np.isfinite(reg_values), reg_values, 0.0))
+        metrics["regression"] = regression_scores(reg_values, preds, dhd, masks)[0]
+    return metrics
+
+
+def _generalization_engine(columns: dict[str, np.ndarray]) -> GroupMetrics:
+    anions = columns["gen_X"]
+    groupings = {
+        "all": Grouping(np.zeros(len(anions), dtype=np.int64), ("all",)),
+        "anion": factorize(anions, ANION_ORDER),
+    }
+    return GroupMetrics(columns["gen_label"], groupings)
+
+
+def _generalization_metrics(rule: SplitRule, values: np.ndarray, engine: GroupMetrics) -> dict:
+    """Score the ABX3 rule on the generalization set.
+
+    A compound the descriptor is undefined on (NaN) counts as misclassified.
+    """
+    valid = np.isfinite(values)
+    truth = np.where(engine.labels == 1, 1, -1)
+    preds = np.where(valid, rule.predict(np.where(valid, values, 0.0)), -truth)
+    counts = engine.counts(preds)
+    tn, fp, fn, tp = counts["all"][0].tolist()
+    anion = engine.summarize("anion", counts["anion"])
+    return {
+        "accuracy": _rate(tp + tn, len(values)),
+        "tp": tp,
+        "fp": fp,
+        "tn": tn,
+        "fn": fn,
+        "false_positive_rate": _rate(fp, fp + tn),
+        "n": len(values),
+        "invalid": int((~valid).sum()),
+        "per_anion_accuracy": {k: g["accuracy"] for k, g in anion.items()},
+    }
+
+
+def _descriptor_inputs(descriptor_fn, bank: FeatureBank) -> tuple[str, ...]:
+    """The input columns plus any feature-bank arrays the descriptor names as parameters."""
+    # try-catch approved: builtins and C callables may have no inspectable signature
+    try:
+        params = inspect.signature(descriptor_fn).parameters
+    except (TypeError, ValueError):
+        return INPUT_COLUMNS
+    return INPUT_COLUMNS + tuple(p for p in params if p not in INPUT_COLUMNS and p in bank)
+
+
+def _sandbox_setup(columns: dict[str, np.ndarray]) -> dict:
+    """Build the per-worker inputs once from the shared dataset columns.
+
+    Optional evaluation sets are appended after the dataset rows, so each descriptor
+    call covers all of them.
+    """
+    n = len(columns["ABX3"])
+    prefixes = [p for p in _EXTRA_PREFIXES if f"{p}_X" in columns]
+    bank = FeatureBank(
+        {
+            c: np.concatenate([columns[c], *(columns[f"{p}_{c}"] for p in prefixes)])
+            for c in INPUT_COLUMNS
+        }
+    )
+    return {
+        "bank": bank,
+        "n": n,
+        "columns": {c: bank[c].tolist() for c in INPUT_COLUMNS},
+        "names": columns["ABX3"],
+        "probe": probe_rows({c: bank[c][:n] for c in INPUT_COLUMNS}, columns["X"]),
+        "metrics": _metrics_engine(columns),
+        "extras": _extras_setup(columns),
+        "labels": columns["exp_label"],
+        "is_train": columns["is_train"],
+    }
+
+
+def _sandbox_exec(inputs: dict, func_code: str, rowwise: bool = True) -> tuple[np.ndarray, str]:
+    descriptor_fn = _load_descriptor(func_code)
+    bank = inputs["bank"]
+    names = _descriptor_inputs(descriptor_fn, bank)
+    arrays = {c: bank[c] for c in names}
+    # Python scalars for the row-wise calls, converted once per worker and feature.
+    for c in names:
+        if c not in inputs["columns"]:
+            inputs["columns"][c] = bank[c].tolist()
+    columns = {c: inputs["columns"][c] for c in names}
+    probe = inputs["probe"]
+    expected = _run_probe(descriptor_fn, columns, inputs["names"], probe)
+    values = _run_arrays(descriptor_fn, arrays, probe, expected, inputs["n"])
+    if values is not None:
+        return values, "vectorized"
+    values = _run_compiled(func_code, arrays, probe, expected, inputs["n"])
+    if values is not None:
+        return values, "compiled"
+    if not rowwise:
+        raise DescriptorError("descriptor does not run on arrays")
+    return _run_rowwise(descriptor_fn, columns, inputs["names"]), "rowwise"
+
+
+def _score_values(
     values: np.ndarray,
     labels: np.ndarray,
-    thresholds: list[float],
-    clf: DecisionTreeClassifier,
-    plot_path: Path,
-) -> None:
-    perov_vals = values[labels == 1]
-    nonperov_vals = values[labels == -1]
-
-    margin = max(1.0, (values.max() - values.min()) * 0.05)
-    vmin = min(np.percentile(values, 1), min(thresholds, default=0) - margin)
-    vmax = max(np.percentile(values, 99), max(thresholds, default=0) + margin)
-    bins = np.linspace(vmin, vmax, 40)
-
-    fig, ax = plt.subplots(figsize=(7, 4))
-
-    xs = np.linspace(vmin, vmax, 500)
-    preds = clf.predict(xs.reshape(-1, 1))
-    prev_x = vmin
-    prev_pred = preds[0]
-    for x, pred in zip(xs[1:], preds[1:], strict=True):
-        if pred != prev_pred or x == xs[-1]:
-            color = "#c8e6c9" if prev_pred == 1 else "#ffcdd2"
-            ax.axvspan(prev_x, x, color=color, zorder=0, alpha=0.5)
-            prev_x = x
-            prev_pred = pred
-    color = "#c8e6c9" if prev_pred == 1 else "#ffcdd2"
-    ax.axvspan(prev_x, vmax, color=color, zorder=0, alpha=0.5)
-
-    ax.hist(
-        perov_vals, bins=bins, alpha=0.7, color="#1976d2", label="Perovskite", edgecolor="white"
+    split: np.ndarray,
+    engine: GroupMetrics,
+    max_depth: int,
+    train_split_label: int,
+) -> dict:
+    train_mask = split == train_split_label
+    thresholds, accuracy, preds, rule = _classify(values, labels, train_mask, max_depth)
+    metrics = _compute_metrics(engine, preds, train_split_label)
+    return {"thresholds": thresholds, "accuracy": accuracy, "metrics": metrics, "rule": rule}
+
+
+def score_matrix(
+    values: np.ndarray,
+    df: pd.DataFrame,
+    decision_tree_max_depth: int = 2,
+    train_split_label: int = 1,
+) -> list[dict]:
+    """Classify and score many descriptors at once, one per row of ``values``.
+
+    Meant for re-scoring stored values (see ``ValueStore.matrix``) under new settings
+    without running the descriptors again. Returns ``thresholds``, ``accuracy`` and
+    ``metrics`` per row, as a single evaluation would.
+    """
+    values = np.atleast_2d(values)
+    labels = df["exp_label"].to_numpy()
+    train_mask = df["is_train"].to_numpy() == train_split_label
+    rules, _ = fit_splits(values[:, train_mask], labels[train_mask], decision_tree_max_depth)
+    preds = np.stack([rule.predict(row) for rule, row in zip(rules, values, strict=True)])
+    engine = metrics_engine(df)
+    counts = engine.counts(preds)
+    return [
+        {
+            "thresholds": rule.thresholds.tolist(),
+            "accuracy": float((row == labels).mean()),
+            "metrics": _metrics_from_counts(
+                engine, {name: c[i] for name, c in counts.items()}, train_split_label
+            ),
+        }
+        for i, (rule, row) in enumerate(zip(rules, preds, strict=True))
+    ]
+
+
+def score_pairs(
+    values: np.ndarray,
+    df: pd.DataFrame,
+    pairs=None,
+    train_split_label: int = 1,
+    n_angles: int = DEFAULT_ANGLES,
+) -> list[dict]:
+    """Score pairs of descriptors as 2-D descriptors, one pair of rows of ``values`` each.
+
+    ``pairs`` lists (i, j) row indices and defaults to every unordered pair, e.g. of the
+    stored values of the top-k nodes. Each pair gets the most accurate depth-2
+    axis-aligned tree and linear separator on the training split (see ``splits2d``).
+    Returns ``pair`` plus ``tree`` and ``linear``, each with ``accuracy``, ``metrics``
+    and ``rule``.
+    """
+    values = np.atleast_2d(values)
+    if pairs is None:
+        pairs = np.stack(np.triu_indices(len(values), 1), axis=1)
+    pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+    if not len(pairs):
+        return []
+    labels = df["exp_label"].to_numpy()
+    train_mask = df["is_train"].to_numpy() == train_split_label
+    first, second = values[pairs[:, 0]], values[pairs[:, 1]]
+    train = (first[:, train_mask], second[:, train_mask], labels[train_mask])
+    fitted = {"tree": fit_pair_trees(*train), "linear": fit_pair_lines(*train, n_angles=n_angles)}
+    engine = metrics_engine(df)
+
+    scored = {}
+    for kind, (rules, _) in fitted.items():
+        preds = np.stack([r.predict(a, b) for r, a, b in zip(rules, first, second, strict=True)])
+        counts = engine.counts(preds)
+        scored[kind] = [
+            {
+                "accuracy": float((row == labels).mean()),
+                "metrics": _metrics_from_counts(
+                    engine, {name: c[i] for name, c in counts.items()}, train_split_label
+                ),
+                "rule": rule,
+            }
+            for i, (rule, row) in enumerate(zip(rules, preds, strict=True))
+        ]
+    return [
+        {"pair": (i, j), "tree": tree, "linear": linear}
+        for (i, j), tree, linear in zip(
+            pairs.tolist(), scored["tree"], scored["linear"], strict=True
+        )
+    ]
+
+
+def _sandbox_score(inputs: dict, func_code: str, max_depth: int, train_split_label: int) -> dict:
+    values, exec_path = _sandbox_exec(inputs, func_code)
+    values, combined = values[: inputs["n"]], values
+    scored = _score_values(
+        values,
+        inputs["labels"],
+        inputs["is_train"],
+        inputs["metrics"],
+        max_depth,
+        train_split_label,
     )
-    ax.hist(
-        nonperov_vals,
-        bins=bins,
-        alpha=0.7,
-        color="#e65100",
-        label="Nonperovskite",
-        edgecolor="white",
+    scored["metrics"].update(_extra_metrics(scored["rule"], combined, inputs["extras"]))
+    return {
+        "values": values,
+        "exec_path": exec_path,
+        "rank_fingerprint": rank_fingerprint(values),
+        **scored,
+    }
+
+
+def _sandbox_refine(
+    inputs: dict,
+    func_code: str,
+    max_depth: int,
+    train_split_label: int,
+    max_trials: int,
+    max_seconds: float,
+) -> dict | None:
+    constants = find_constants(func_code)
+    if not constants:
+        return None
+    train = inputs["is_train"] == train_split_label
+    labels = inputs["labels"][train]
+
+    def train_accuracy(values: list[float]) -> float | None:
+        code = substitute(func_code, constants, values)
+        # try-catch approved: constants that break the descriptor just score as unusable
+        try:
+            descriptor_values, _ = _sandbox_exec(inputs, code, rowwise=False)
+        except Exception:
+            return None
+        train_values = descriptor_values[: inputs["n"]][train]
+        return float(fit_splits(train_values[None], labels, max_depth)[1][0])
+
+    search = pattern_search(
+        train_accuracy,
+        [c.value for c in constants],
+        max_trials=max_trials,
+        max_seconds=max_seconds,
     )
-    for t in thresholds:
-        ax.axvline(t, color="k", linestyle="--", linewidth=1)
-    ax.set_xlabel("Descriptor value", fontsize=12)
-    ax.set_ylabel("Counts", fontsize=12)
-    ax.legend(fontsize=8, loc="upper right")
+    if search.score is None or search.score <= search.start_score:
+        return None
+    return {
+        "code": substitute(func_code, constants, search.values),
+        "train_accuracy": search.score,
+        "start_train_accuracy": search.start_score,
+        "constants": list(zip([c.value for c in constants], search.values, strict=True)),
+        "trials": search.trials,
+    }
 
-    fig.tight_layout()
-    fig.savefig(plot_path, dpi=150, bbox_inches="tight")
-    plt.close(fig)
+
+def _sandbox_task(inputs: dict, request: tuple):
+    kind, *args = request
+    if kind == "exec":
+        return _sandbox_exec(inputs, *args)
+    if kind == "refine":
+        return _sandbox_refine(inputs, *args)
+    return _sandbox_score(inputs, *args)
+
+
+_sandbox: DescriptorSandbox | None = None
+_sandbox_data: tuple | None = None
+
+
+def _get_sandbox(
+    df: pd.DataFrame, workers: int = 1, extras: Extras = NO_EXTRAS
+) -> DescriptorSandbox:
+    """Return the worker pool bound to ``df``, rebuilding it if the dataset changed."""
+    global _sandbox, _sandbox_data
+    if _sandbox is None or not _same_data(_sandbox_data, (df, *extras)):
+        if _sandbox is not None:
+            _sandbox.close()
+        _sandbox = DescriptorSandbox(
+            _dataset_columns(df, extras),
+            _sandbox_task,
+            setup=_sandbox_setup,
+            workers=workers,
+        )
+        _sandbox_data = (df, *extras)
+    _sandbox.grow(workers)
+    return _sandbox
+
+
+_bank: tuple[pd.DataFrame, FeatureBank] | None = None
+
+
+def feature_bank(df: pd.DataFrame) -> FeatureBank:
+    """The shared feature bank of ``df``'s input columns, built once per dataset."""
+    global _bank
+    if _bank is None or _bank[0] is not df:
+        _bank = (df, FeatureBank({c: df[c].to_numpy() for c in INPUT_COLUMNS}))
+    return _bank[1]
+
+
+_engine: tuple[pd.DataFrame, GroupMetrics] | None = None
+
+
+def metrics_engine(df: pd.DataFrame) -> GroupMetrics:
+    """The group-wise metrics of ``df``, with its grouping columns factorized once."""
+    global _engine
+    if _engine is None or _engine[0] is not df:
+        _engine = (df, _metrics_engine(_dataset_columns(df)))
+    return _engine[1]
+
+
+_fingerprint: tuple[tuple, str] | None = None
+
+
+def _dataset_fingerprint(df: pd.DataFrame, extras: Extras = NO_EXTRAS) -> str:
+    global _fingerprint
+    if _fingerprint is None or not _same_data(_fingerprint[0], (df, *extras)):
+        _fingerprint = ((df, *extras), dataset_fingerprint(_dataset_columns(df, extras)))
+    return _fingerprint[1]
+
+
+_extras: tuple[tuple, dict] | None = None
+
+
+def _extras_of(df: pd.DataFrame, extras: Extras) -> dict:
+    """``_extras_setup`` for in-process scoring, built once per combination of sets."""
+    global _extras
+    if _extras is None or not _same_data(_extras[0], (df, *extras)):
+        _extras = ((df, *extras), _extras_setup(_dataset_columns(df, extras)))
+    return _extras[1]
+
+
+def _exec_descriptor(
+    func_code: str, df: pd.DataFrame, extras: Extras = NO_EXTRAS
+) -> tuple[np.ndarray, str]:
+    """Evaluate the descriptor on every compound, array-first with a row-wise fallback.
+
+    Runs in a sandbox worker process that is killed after ``TIMEOUT_SECONDS``.
+    Returns the values and the execution path taken ("vectorized", "compiled" or "rowwise").
+    Values on the ``extras`` sets follow the dataset's, NaN where undefined.
+    """
+    sandbox = _get_sandbox(df, extras=extras)
+    # try-catch approved: the sandbox timeout is re-raised as the evaluator's EvalTimeout
+    try:
+        return sandbox.run(("exec", func_code), timeout=TIMEOUT_SECONDS)
+    except TimeoutError as e:
+        raise EvalTimeout(f"descriptor timed out after {TIMEOUT_SECONDS}s") from e
+
+
+def _build_result(
+    scored: dict,
+    labels: np.ndarray,
+    plot_dir: Path,
+    node_id: str,
+    renderer: PlotRenderer | None = None,
+) -> EvalResult:
+    values = scored["values"]
+    thresholds = scored["thresholds"]
+    accuracy = scored["accuracy"]
+    metrics = scored["metrics"]
+
+    plot_path = plot_dir / f"{node_id}.png"
+    if renderer is None:
+        render_plot(values, labels, thresholds, scored["rule"], plot_path)
+    else:
+        renderer.submit(plot_path, values, labels, thresholds, scored["rule"])
+
+    return EvalResult(
+        accuracy=accuracy,
+        train_accuracy=metrics["train_accuracy"],
+        test_accuracy=metrics["test_accuracy"],
+        false_positive_rate=metrics["false_positive_rate"],
+        per_anion_accuracy=metrics["per_anion_accuracy"],
+        group_metrics=metrics["group_metrics"],
+        generalization=metrics.get("generalization", {}),
+        regression=metrics.get("regression", {}),
+        thresholds=thresholds,
+        plot_path=str(plot_path),
+        metrics_summary=_format_metrics_summary(accuracy, metrics, thresholds),
+        exec_path=scored["exec_path"],
+        rank_fingerprint=scored["rank_fingerprint"],
+    )
+
+
+def _cache_key(
+    cache: EvalCache | None,
+    func_code: str,
+    df: pd.DataFrame,
+    max_depth: int,
+    train_split_label: int,
+    extras: Extras = NO_EXTRAS,
+) -> str | None:
+    if cache is None:
+        return None
+    fingerprint = _dataset_fingerprint(df, extras)
+    # try-catch approved: unparsable code is not cacheable and gets its error from exec
+    try:
+        return cache.key(func_code, fingerprint, max_depth, train_split_label)
+    except (SyntaxError, ValueError):
+        return None
+
+
+def _cache_record(result: EvalResult, metrics: dict) -> dict:
+    return {
+        "accuracy": result.accuracy,
+        "thresholds": [float(t) for t in result.thresholds],
+        "metrics": metrics,
+        "exec_path": result.exec_path,
+        "plot_path": result.plot_path,
+    }
+
+
+def _result_from_cache(
+    record: dict, values: np.ndarray, plot_dir: Path, node_id: str
+) -> EvalResult:
+    """Rebuild a result from a cache entry, reusing its plot instead of re-rendering."""
+    plot_path = plot_dir / f"{node_id}.png"
+    copy_plot(record["plot_path"], plot_path)
+
+    metrics = record["metrics"]
+    return EvalResult(
+        accuracy=record["accuracy"],
+        train_accuracy=metrics["train_accuracy"],
+        test_accuracy=metrics["test_accuracy"],
+        false_positive_rate=metrics["false_positive_rate"],
+        per_anion_accuracy=metrics["per_anion_accuracy"],
+        group_metrics=metrics["group_metrics"],
+        generalization=metrics.get("generalization", {}),
+        regression=metrics.get("regression", {}),
+        thresholds=record["thresholds"],
+        plot_path=str(plot_path),
+        metrics_summary=_format_metrics_summary(record["accuracy"], metrics, record["thresholds"]),
+        exec_path=record["exec_path"],
+        rank_fingerprint=rank_fingerprint(values),
+    )
+
+
+def _equivalent_result(exec_path: str, fingerprint: str, node_id: str) -> EvalResult:
+    return EvalResult(exec_path=exec_path, rank_fingerprint=fingerprint, equivalent_to=node_id)
+
+
+def _keep_values(
+    result: EvalResult, values: np.ndarray, store: ValueStore | None, node_id: str
+) -> EvalResult:
+    """Put the descriptor values in ``store``, or a private one, and reference the row."""
+    result.value_store = store if store is not None else ValueStore()
+    result.values_row = result.value_store.add(node_id, values)
+    return result
 
 
 def evaluate_candidate(
@@ -204,32 +876,216 @@ def evaluate_candidate(
     node_id: str,
     decision_tree_max_depth: int = 2,
     train_split_label: int = 1,
+    cache: EvalCache | None = None,
+    known_fingerprints: Mapping[str, str] | None = None,
+    renderer: PlotRenderer | None = None,
+    store: ValueStore | None = None,
+    generalization: pd.DataFrame | None = None,
+    regression: pd.DataFrame | None = None,
 ) -> EvalResult:
+    """Evaluate one candidate descriptor.
+
+    When ``known_fingerprints`` maps rank fingerprints to node ids and the candidate is
+    rank-equivalent to one of them, classification and plotting are skipped and the
+    returned result only carries ``equivalent_to`` and the descriptor values. With a
+    non-eager ``renderer`` the plot at ``plot_path`` is deferred; see ``ensure_plot``.
+    Code that fails the static ``prescreen`` is rejected without being run. The
+    descriptor values are kept in ``store`` under ``node_id``. With a
+    ``generalization`` set (see ``load_double_perovskites``) the descriptor is run
+    on it in the same call, and the thresholds learned on ``df`` are scored on it.
+    Likewise a ``regression`` set (see ``load_decomposition_enthalpies``) adds the
+    sign agreement with, and per-family R² against, the DFT decomposition enthalpy.
+    """
+    report = prescreen(func_code)
+    if not report.ok:
+        return EvalResult(accuracy=0.0, error=report.message(), cost_class=report.cost_class)
+    result = _evaluate_screened(
+        func_code,
+        df,
+        plot_dir,
+        node_id,
+        decision_tree_max_depth,
+        train_split_label,
+        cache,
+        known_fingerprints,
+        renderer,
+        store,
+        (generalization, regression),
+    )
+    result.cost_class = report.cost_class
+    return result
+
+
+def _evaluate_screened(
+    func_code: str,
+    df: pd.DataFrame,
+    plot_dir: Path,
+    node_id: str,
+    decision_tree_max_depth: int,
+    train_split_label: int,
+    cache: EvalCache | None,
+    known_fingerprints: Mapping[str, str] | None,
+    renderer: PlotRenderer | None,
+    store: ValueStore | None,
+    extras: Extras,
+) -> EvalResult:
+    known_fingerprints = known_fingerprints or {}
+    key = _cache_key(cache, func_code, df, decision_tree_max_depth, train_split_label, extras)
+    if key is not None and (hit := cache.get(key)) is not None:
+        record, values = hit
+        fingerprint = rank_fingerprint(values)
+        if fingerprint in known_fingerprints:
+            twin = known_fingerprints[fingerprint]
+            result = _equivalent_result(record["exec_path"], fingerprint, twin)
+        else:
+            result = _result_from_cache(record, values, plot_dir, node_id)
+        return _keep_values(result, values, store, node_id)
+
     # try-catch approved: exec runs untrusted LLM-generated code that can crash arbitrarily
     try:
-        values = _exec_descriptor(func_code, df)
+        values, exec_path = _exec_descriptor(func_code, df, extras)
     except Exception as e:
-        return EvalResult(accuracy=0.0, error=str(e))
+        return EvalResult(accuracy=0.0, error=str(e), failing_rows=getattr(e, "rows", []))
+    values, combined = values[: len(df)], values
 
-    labels = df["exp_label"].values
-    train_mask = df["is_train"].values == train_split_label
+    fingerprint = rank_fingerprint(values)
+    if fingerprint in known_fingerprints:
+        twin = known_fingerprints[fingerprint]
+        return _keep_values(
+            _equivalent_result(exec_path, fingerprint, twin), values, store, node_id
+        )
 
-    thresholds, accuracy, preds, clf = _classify(
-        values, labels, train_mask, decision_tree_max_depth
+    labels = df["exp_label"].values
+    scored = _score_values(
+        values,
+        labels,
+        df["is_train"].values,
+        metrics_engine(df),
+        decision_tree_max_depth,
+        train_split_label,
     )
-    metrics = _compute_metrics(preds, labels, train_mask, df)
+    scored.update(values=values, exec_path=exec_path, rank_fingerprint=fingerprint)
+    scored["metrics"].update(_extra_metrics(scored["rule"], combined, _extras_of(df, extras)))
 
-    plot_path = plot_dir / f"{node_id}.png"
-    _generate_plot(values, labels, thresholds, clf, plot_path)
+    result = _build_result(scored, labels, plot_dir, node_id, renderer)
+    if key is not None:
+        cache.put(key, _cache_record(result, scored["metrics"]), values)
+    return _keep_values(result, values, store, node_id)
 
-    return EvalResult(
-        accuracy=accuracy,
-        train_accuracy=metrics["train_accuracy"],
-        test_accuracy=metrics["test_accuracy"],
-        false_positive_rate=metrics["false_positive_rate"],
-        per_anion_accuracy=metrics["per_anion_accuracy"],
-        thresholds=thresholds,
-        plot_path=str(plot_path),
-        metrics_summary=_format_metrics_summary(accuracy, metrics, thresholds),
-        descriptor_values=values.tolist(),
+
+def refine_constants(
+    func_code: str,
+    df: pd.DataFrame,
+    decision_tree_max_depth: int = 2,
+    train_split_label: int = 1,
+    max_trials: int = 200,
+    max_seconds: float = REFINE_SECONDS,
+    generalization: pd.DataFrame | None = None,
+    regression: pd.DataFrame | None = None,
+) -> dict | None:
+    """Tune the numeric constants of a descriptor for training accuracy.
+
+    Each trial substitutes new constants and runs the descriptor once on the arrays
+    (descriptors that only run row-wise are not refined), in a sandbox worker. Pass
+    the run's ``generalization`` and ``regression`` sets so the worker pool that
+    evaluation uses is reused rather than rebuilt; they are not scored.
+    Returns None unless the training accuracy strictly improves; otherwise the tuned
+    ``code``, its ``train_accuracy``, the ``start_train_accuracy``, the (old, new)
+    ``constants`` and the number of ``trials``.
+    """
+    sandbox = _get_sandbox(df, extras=(generalization, regression))
+    request = (
+        "refine",
+        func_code,
+        decision_tree_max_depth,
+        train_split_label,
+        max_trials,
+        max_seconds,
     )
+    # try-catch approved: refinement is optional, a failing or slow run just skips it
+    try:
+        return sandbox.run(request, timeout=max_seconds + TIMEOUT_SECONDS)
+    except Exception as e:
+        log.warning("Constant refinement failed: %s", e)
+        return None
+
+
+def evaluate_many(
+    codes: list[str],
+    df: pd.DataFrame,
+    plot_dir: Path,
+    node_ids: list[str] | None = None,
+    decision_tree_max_depth: int = 2,
+    train_split_label: int = 1,
+    workers: int | None = None,
+    cache: EvalCache | None = None,
+    known_fingerprints: Mapping[str, str] | None = None,
+    renderer: PlotRenderer | None = None,
+    store: ValueStore | None = None,
+    generalization: pd.DataFrame | None = None,
+    regression: pd.DataFrame | None = None,
+) -> list[EvalResult]:
+    """Evaluate many candidates in parallel and return their results in input order.
+
+    Execution, classification and metrics run across a pool of ``workers`` sandbox
+    processes (default: one per core); a candidate that crashes or times out only
+    produces an error result for itself. Candidates rank-equivalent to a known
+    fingerprint, or to an earlier candidate of the batch, are flagged via
+    ``equivalent_to`` and not plotted. Code rejected by ``prescreen`` never reaches
+    the sandbox. Descriptor values are kept in ``store`` under the node ids. A
+    ``generalization`` or ``regression`` set is scored as in ``evaluate_candidate``.
+    """
+    if node_ids is None:
+        node_ids = [f"cand_{i}" for i in range(len(codes))]
+    extras = (generalization, regression)
+    seen = dict(known_fingerprints or {})
+    reports = [prescreen(code) for code in codes]
+    keys = [
+        _cache_key(cache, code, df, decision_tree_max_depth, train_split_label, extras)
+        if report.ok
+        else None
+        for code, report in zip(codes, reports, strict=True)
+    ]
+    hits = {i: cache.get(key) for i, key in enumerate(keys) if key is not None}
+    pending = [i for i in range(len(codes)) if reports[i].ok and hits.get(i) is None]
+
+    workers = workers or os.cpu_count() or 1
+    sandbox = _get_sandbox(df, min(workers, max(len(pending), 1)), extras)
+    requests = [("score", codes[i], decision_tree_max_depth, train_split_label) for i in pending]
+    outcomes = dict(zip(pending, sandbox.map(requests, timeout=TIMEOUT_SECONDS), strict=True))
+
+    labels = df["exp_label"].values
+    results = []
+    for i, node_id in enumerate(node_ids):
+        values = None
+        if not reports[i].ok:
+            result = EvalResult(accuracy=0.0, error=reports[i].message())
+        elif hits.get(i) is not None:
+            record, values = hits[i]
+            fingerprint = rank_fingerprint(values)
+            if fingerprint in seen:
+                result = _equivalent_result(record["exec_path"], fingerprint, seen[fingerprint])
+            else:
+                result = _result_from_cache(record, values, plot_dir, node_id)
+        elif isinstance(outcome := outcomes[i], TimeoutError):
+            error = f"descriptor timed out after {TIMEOUT_SECONDS}s"
+            result = EvalResult(accuracy=0.0, error=error)
+        elif isinstance(outcome, Exception):
+            rows = getattr(outcome, "rows", [])
+            result = EvalResult(accuracy=0.0, error=str(outcome), failing_rows=rows)
+        elif outcome["rank_fingerprint"] in seen:
+            fingerprint = outcome["rank_fingerprint"]
+            values = outcome["values"]
+            result = _equivalent_result(outcome["exec_path"], fingerprint, seen[fingerprint])
+        else:
+            values = outcome["values"]
+            result = _build_result(outcome, labels, plot_dir, node_id, renderer)
+            if keys[i] is not None:
+                cache.put(keys[i], _cache_record(result, outcome["metrics"]), outcome["values"])
+        if values is not None:
+            _keep_values(result, values, store, node_id)
+        if result.rank_fingerprint and not result.equivalent_to:
+            seen.setdefault(result.rank_fingerprint, node_id)
+        result.cost_class = reports[i].cost_class
+        results.append(result)
+    return results
@@ -0,0 +1,88 @@
+"""Precomputed, read-only feature arrays shared by descriptor evaluation and proposers.
+
+A ``FeatureBank`` wraps the base input columns of a dataset and computes derived
+features (ratios, the Goldschmidt t, ...) on first access, memoizing the result.
+Features are registered by name with a function of the bank, so a feature can be
+built from other features; ``register_feature`` adds one to every bank and
+``FeatureBank.register`` to a single bank.
+"""
+
+import math
+from collections.abc import Callable, Iterator, Mapping
+
+import numpy as np
+
+FeatureFn = Callable[["FeatureBank"], np.ndarray]
+
+_FEATURES: dict[str, FeatureFn] = {}
+
+
+def register_feature(name: str, fn: FeatureFn | None = None):
+    """Register a derived feature for all banks; usable as a decorator."""
+
+    def decorate(fn: FeatureFn) -> FeatureFn:
+        _FEATURES[name] = fn
+        return fn
+
+    return decorate(fn) if fn is not None else decorate
+
+
+register_feature("rA_rB", lambda f: f["rA"] / f["rB"])
+register_feature("rX_rB", lambda f: f["rX"] / f["rB"])
+register_feature("log_rA_rB", lambda f: np.log(f["rA_rB"]))
+register_feature("rA_plus_rX", lambda f: f["rA"] + f["rX"])
+register_feature("t", lambda f: f["rA_plus_rX"] / (math.sqrt(2) * (f["rB"] + f["rX"])))
+register_feature("octahedral_factor", lambda f: f["rB"] / f["rX"])
+
+
+def _read_only(values) -> np.ndarray:
+    # A view, so locking it never changes the caller's array.
+    array = np.asarray(values, dtype=np.float64).view()
+    array.flags.writeable = False
+    return array
+
+
+class FeatureBank(Mapping):
+    """Read-only float64 arrays by name: the base columns and lazily built features."""
+
+    def __init__(self, base: Mapping[str, np.ndarray]):
+        self._values = {name: _read_only(values) for name, values in base.items()}
+        self._features = dict(_FEATURES)
+        self._building: set[str] = set()
+
+    def register(self, name: str, fn: FeatureFn) -> None:
+        """Add a derived feature to this bank only."""
+        if name in self._values:
+            raise ValueError(f"Feature {name!r} is already built")
+        self._features[name] = fn
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        if name in self._values:
+            return self._values[name]
+        if name not in self._features:
+            raise KeyError(name)
+        if name in self._building:
+            raise ValueError(f"Feature {name!r} depends on itself")
+        self._building.add(name)
+        # try-catch approved: a failing feature must not stay marked as in progress
+        try:
+            with np.errstate(all="ignore"):
+                values = _read_only(self._features[name](self))
+        finally:
+            self._building.discard(name)
+        self._values[name] = values
+        return values
+
+    def __contains__(self, name) -> bool:
+        return name in self._values or name in self._features
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._values
+        yield from (name for name in self._features if name not in self._values)
+
+    def __len__(self) -> int:
+        return len(self._values.keys() | self._features.keys())
+
+    def built(self) -> list[str]:
+        """Names of the arrays computed so far."""
+        return list(self._values)
@@ -0,0 +1,98 @@
+"""Per-group accuracy and confusion counts from one ``np.bincount`` pass per grouping.
+
+Grouping columns (anion, oxidation states, train/test split) are factorized once into
+integer codes. Every compound then falls in one confusion cell (TN, FP, FN, TP) of
+its group, so the counts of all groups come from a single ``bincount`` over
+``group * 4 + cell``. A batch of candidates is offset by ``candidate * groups`` and
+still takes one ``bincount`` per grouping.
+"""
+
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+
+import numpy as np
+
+# Confusion cell of a compound: 2 * (label is positive) + (prediction is positive).
+CELLS = ("tn", "fp", "fn", "tp")
+ANION_ORDER = ("O", "F", "Cl", "Br", "I")
+
+
+@dataclass(frozen=True)
+class Grouping:
+    """Group code of every compound and the label of every group."""
+
+    codes: np.ndarray
+    keys: tuple[str, ...]
+
+
+def factorize(values: Sequence, order: Sequence = ()) -> Grouping:
+    """Group by value; groups listed in ``order`` come first, the rest sorted."""
+    present, inverse = np.unique(np.asarray(values), return_inverse=True)
+    present = present.tolist()
+    keys = [v for v in order if v in present]
+    keys += [v for v in present if v not in keys]
+    position = {v: i for i, v in enumerate(keys)}
+    remap = np.array([position[v] for v in present], dtype=np.int64)
+    return Grouping(remap[inverse.reshape(-1)], tuple(str(k) for k in keys))
+
+
+def factorize_pairs(first: Sequence, second: Sequence) -> Grouping:
+    """Group by the pair of values, e.g. the (nA, nB) charge class."""
+    pairs = np.stack([np.asarray(first), np.asarray(second)], axis=1)
+    unique, codes = np.unique(pairs, axis=0, return_inverse=True)
+    keys = tuple(f"({a}, {b})" for a, b in unique.tolist())
+    return Grouping(codes.reshape(-1).astype(np.int64), keys)
+
+
+class GroupMetrics:
+    """Confusion counts of predictions within every group of several groupings."""
+
+    def __init__(self, labels: np.ndarray, groupings: Mapping[str, Grouping]):
+        self.groupings = dict(groupings)
+        self.labels = np.asarray(labels)
+        self._truth = 2 * (self.labels == 1).astype(np.int64)
+
+    def counts(self, preds: np.ndarray) -> dict[str, np.ndarray]:
+        """TN/FP/FN/TP of every group, shaped ``preds.shape[:-1] + (groups, 4)``.
+
+        ``preds`` holds one row of +1/-1 predictions per candidate, or a single row.
+        """
+        preds = np.asarray(preds)
+        batch = preds.reshape(-1, preds.shape[-1])
+        cells = self._truth + (batch == 1)
+        offsets = np.arange(len(batch))[:, None]
+        counts = {}
+        for name, grouping in self.groupings.items():
+            size = len(grouping.keys)
+            index = ((offsets * size + grouping.codes) * 4 + cells).ravel()
+            flat = np.bincount(index, minlength=len(batch) * size * 4)
+            counts[name] = flat.reshape(*preds.shape[:-1], size, 4)
+        return counts
+
+    def summarize(self, name: str, counts: np.ndarray) -> dict[str, dict]:
+        """Accuracy and confusion counts by group label for one candidate's counts."""
+        summary = {}
+        for key, cell_counts in zip(self.groupings[name].keys, counts.tolist(), strict=True):
+            total = sum(cell_counts)
+            if total:
+                tn, fp, fn, tp = cell_counts
+                summary[key] = {
+                    "accuracy": (tp + tn) / total,
+                    "n": total,
+                    **dict(zip(CELLS, cell_counts, strict=True)),
+                }
+        return summary
+
+
+def dataset_groupings(
+    anions: np.ndarray, n_a: np.ndarray, n_b: np.ndarray, split: np.ndarray
+) -> dict[str, Grouping]:
+    """The groupings reported for every candidate, plus the overall and split ones."""
+    return {
+        "all": Grouping(np.zeros(len(anions), dtype=np.int64), ("all",)),
+        "split": factorize(split),
+        "anion": factorize(anions, ANION_ORDER),
+        "nA": factorize(n_a),
+        "nB": factorize(n_b),
+        "nA_nB": factorize_pairs(n_a, n_b),
+    }
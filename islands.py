@@ -0,0 +1,171 @@
+"""Island model: independent searches in separate processes that trade their best nodes.
+
+Each island grows its own tree with its own LLM seed and prompt variant. After every
+``islands.migration_interval`` units of its budget, an island publishes its top-k
+nodes to a SQLite file shared by all islands and adopts the nodes the others have
+published as new root children. Adopted nodes (migrants) cost no budget, keep their
+metrics and descriptor values, and are never published again. Islands do not wait
+for each other. At the end, ``merge_islands`` ranks the nodes of every island in one
+state.
+"""
+
+import copy
+import json
+import logging
+import sqlite3
+from dataclasses import asdict, replace
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from llm_client import LLMClient
+from mcts import backpropagate, run_mcts
+from state import FormulaNode, SearchState
+from value_store import ValueStore
+
+log = logging.getLogger(__name__)
+
+# Metrics key naming the island a migrant came from.
+MIGRANT_KEY = "migrated_from"
+
+
+class MigrationChannel:
+    """Nodes published by the islands, in a SQLite file any island process can open."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=60)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS migrants ("
+            " island INTEGER NOT NULL, node_id TEXT NOT NULL, record TEXT NOT NULL,"
+            " PRIMARY KEY (island, node_id))"
+        )
+        self._conn.commit()
+
+    def publish(self, island: int, records: list[dict]) -> None:
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO migrants (island, node_id, record) VALUES (?, ?, ?)",
+            [(island, r["node"]["id"], json.dumps(r)) for r in records],
+        )
+        self._conn.commit()
+
+    def fetch(self, island: int) -> list[dict]:
+        """Everything published by the other islands, oldest first, with its ``island``."""
+        rows = self._conn.execute(
+            "SELECT island, record FROM migrants WHERE island != ? ORDER BY rowid", (island,)
+        ).fetchall()
+        return [{**json.loads(record), "island": origin} for origin, record in rows]
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def _migrant_record(node: FormulaNode, state: SearchState) -> dict:
+    values = None
+    if state.values is not None and node.values_row >= 0:
+        values = state.values.row(node.values_row).tolist()
+    return {"node": asdict(node), "values": values}
+
+
+def migrate(
+    state: SearchState,
+    channel: MigrationChannel,
+    island: int,
+    top_k: int,
+    regression_weight: float = 0.0,
+) -> int:
+    """Publish this island's top ``top_k`` nodes and adopt the other islands' ones.
+
+    A published node is skipped if it is already in the tree or rank-equivalent to a
+    node that is. Returns the number of nodes adopted.
+    """
+    own = [n for n in state.nodes.values() if MIGRANT_KEY not in n.metrics]
+    best = sorted(own, key=lambda n: n.accuracy, reverse=True)[:top_k]
+    channel.publish(island, [_migrant_record(n, state) for n in best])
+
+    adopted = 0
+    for record in channel.fetch(island):
+        fields = record["node"]
+        if fields["id"] in state.nodes or fields["rank_fingerprint"] in state.fingerprint_index:
+            continue
+        node = FormulaNode(
+            id=fields["id"],
+            parent_id=None,
+            code=fields["code"],
+            description=fields["description"],
+            formula=fields["formula"],
+            accuracy=fields["accuracy"],
+            metrics={**fields["metrics"], MIGRANT_KEY: record["island"]},
+            plot_path=fields["plot_path"],
+            visit_count=1,
+            rank_fingerprint=fields["rank_fingerprint"],
+        )
+        if state.values is not None and record["values"] is not None:
+            node.values_row = state.values.add(node.id, np.asarray(record["values"]))
+        state.add_node(node)
+        backpropagate(state, node, regression_weight)
+        adopted += 1
+    if adopted:
+        log.info("Island %d adopted %d nodes", island, adopted)
+    return adopted
+
+
+def run_island(
+    client: LLMClient,
+    state: SearchState,
+    df: pd.DataFrame,
+    plot_dir: Path,
+    cfg,
+    *,
+    island: int,
+    channel: MigrationChannel,
+    state_save_path: Path,
+    **kwargs,
+) -> SearchState:
+    """``run_mcts`` in segments of ``islands.migration_interval``, migrating in between.
+
+    ``kwargs`` go to ``run_mcts``.
+    """
+    budget = cfg.mcts.budget
+    interval = max(1, cfg.islands.migration_interval)
+    segment = copy.deepcopy(cfg)
+    while state.budget_used < budget:
+        used = state.budget_used
+        segment.mcts.budget = min(budget, (used // interval + 1) * interval)
+        run_mcts(client, state, df, plot_dir, segment, state_save_path=state_save_path, **kwargs)
+        migrate(state, channel, island, cfg.islands.migrate_top_k, cfg.mcts.regression_weight)
+        state.save(state_save_path)
+        if state.budget_used == used:
+            log.warning("Island %d made no progress, stopping", island)
+            break
+    return state
+
+
+def merge_islands(states: list[SearchState], values: ValueStore | None = None) -> SearchState:
+    """One state holding every island's own nodes as roots, ids prefixed ``i<island>-``.
+
+    Migrants are left out, since they are a copy of a node of another island.
+    Descriptor values are copied to ``values`` (default: an in-memory store).
+    """
+    merged = SearchState(values=values if values is not None else ValueStore())
+    for island, state in enumerate(states):
+        for node in state.nodes.values():
+            if MIGRANT_KEY in node.metrics:
+                continue
+            copy_id = f"i{island}-{node.id}"
+            values_row = -1
+            if state.values is not None and node.values_row >= 0:
+                values_row = merged.values.add(copy_id, state.values.row(node.values_row))
+            merged.add_node(
+                replace(
+                    node,
+                    id=copy_id,
+                    parent_id=None,
+                    children_ids=[],
+                    metrics={**node.metrics, "island": island},
+                    values_row=values_row,
+                )
+            )
+    return merged
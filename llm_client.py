@@ -4,6 +4,7 @@ import base64
 import json
 import logging
 import re
+import threading
 from dataclasses import dataclass
 from pathlib import Path
 
@@ -26,8 +27,13 @@ class LLMClient:
         self.model = cfg.llm.model
         self.temperature = cfg.llm.temperature
         self.max_tokens = cfg.llm.max_tokens
+        self.seed = cfg.llm.seed
+        # Appended to every system prompt, e.g. a different focus for each island.
+        self.system_suffix = cfg.llm.system_suffix
         self.client = OpenAI(api_key=api_key)
         self.stats = UsageStats()
+        # Proposals may be requested from several threads (mcts.parallel).
+        self._stats_lock = threading.Lock()
 
     def _encode_image(self, path: Path) -> str:
         with open(path, "rb") as f:
@@ -122,7 +128,16 @@ class LLMClient:
             raise ValueError(f"Could not parse JSON from LLM response:\n{response[:300]}") from e
 
     def _call(self, messages: list[dict]) -> str:
-        self.stats.total_calls += 1
+        if self.system_suffix:
+            messages = [
+                {**m, "content": f"{m['content']}\n\n{self.system_suffix}"}
+                if m["role"] == "system"
+                else m
+                for m in messages
+            ]
+        options = {"seed": self.seed} if self.seed is not None else {}
+        with self._stats_lock:
+            self.stats.total_calls += 1
         # try-catch approved: OpenAI API is external, need to track failed_calls before re-raising
         try:
             response = self.client.chat.completions.create(
@@ -130,13 +145,16 @@ class LLMClient:
                 messages=messages,
                 temperature=self.temperature,
                 max_tokens=self.max_tokens,
+                **options,
             )
-            self.stats.total_input_tokens += response.usage.prompt_tokens
-            self.stats.total_output_tokens += response.usage.completion_tokens
-            self.stats.successful_calls += 1
+            with self._stats_lock:
+                self.stats.total_input_tokens += response.usage.prompt_tokens
+                self.stats.total_output_tokens += response.usage.completion_tokens
+                self.stats.successful_calls += 1
             return response.choices[0].message.content.strip()
         except Exception:
-            self.stats.failed_calls += 1
+            with self._stats_lock:
+                self.stats.failed_calls += 1
             log.exception("LLM call failed")
             raise
 
@@ -2,87 +2,181 @@
 
 import logging
 import math
+import os
+import time
 import uuid
+from collections import Counter
+from collections.abc import Mapping
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field, replace
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
+from scipy.stats import rankdata
 
 from debugger import debug_function
-from evaluator import evaluate_candidate
+from eval_cache import EvalCache
+from evaluator import evaluate_candidate, evaluate_many, feature_bank, refine_constants
 from llm_client import LLMClient
-from proposer import propose_improvement, propose_initial
+from plotting import PlotRenderer, ensure_plot
+from proposer import (
+    Proposal,
+    propose_enumerated,
+    propose_improvement,
+    propose_improvements,
+    propose_initial,
+)
 from state import FormulaNode, SearchState
 
 log = logging.getLogger(__name__)
 
 
+@dataclass(frozen=True)
+class EvalContext:
+    """What every evaluation of a run shares, built once in ``run_mcts``."""
+
+    cache: EvalCache | None = None
+    renderer: PlotRenderer | None = None
+    generalization: pd.DataFrame | None = None
+    regression: pd.DataFrame | None = None
+
+
 def _generate_node_id() -> str:
     return uuid.uuid4().hex[:8]
 
 
-def _ucb1(node: FormulaNode, parent_visits: int, c: float) -> float:
-    if node.visit_count == 0:
+def _ucb1(
+    state: SearchState, node: FormulaNode, parent_visits: int, c: float, pending: int = 0
+) -> float:
+    """UCB1 score; ``pending`` expansions below the node count as visits with no reward."""
+    visits = node.visit_count + pending
+    if visits == 0:
         return float("inf")
-    exploitation = node.total_reward / node.visit_count
-    exploration = c * math.sqrt(math.log(parent_visits) / node.visit_count)
+    exploitation = state.total_reward(node) / visits
+    exploration = c * math.sqrt(math.log(parent_visits) / visits)
     return exploitation + exploration
 
 
-def select_node(state: SearchState, cfg) -> FormulaNode | None:
-    """UCB1 selection: traverse from root children to a leaf or expandable node."""
+def select_node(
+    state: SearchState, cfg, pending: Mapping[str, int] | None = None
+) -> FormulaNode | None:
+    """UCB1 selection: traverse from root children to a leaf or expandable node.
+
+    ``pending`` counts the in-flight expansions below each node (virtual loss), so
+    concurrent selections spread over the tree instead of piling onto one path. With
+    ``SearchState.use_arrays`` the same walk runs vectorized on ``state.arrays``.
+    """
     if not state.root_children:
         return None
 
     ucb_constant = cfg.mcts.ucb_constant
     max_depth = cfg.mcts.max_depth
+    if state.arrays is not None:
+        node_id = state.arrays.select(ucb_constant, max_depth, state.reward_epoch, pending)
+        return state.nodes[node_id] if node_id is not None else None
+
+    pending = pending or {}
 
-    total_root_visits = sum(state.nodes[cid].visit_count for cid in state.root_children)
+    total_root_visits = sum(
+        state.nodes[cid].visit_count + pending.get(cid, 0) for cid in state.root_children
+    )
     if total_root_visits == 0:
         total_root_visits = 1
 
     best_id = max(
         state.root_children,
-        key=lambda cid: _ucb1(state.nodes[cid], total_root_visits, ucb_constant),
+        key=lambda cid: _ucb1(
+            state, state.nodes[cid], total_root_visits, ucb_constant, pending.get(cid, 0)
+        ),
     )
     current = state.nodes[best_id]
 
     while current.children_ids and current.depth < max_depth:
-        parent_visits = current.visit_count if current.visit_count > 0 else 1
+        parent_visits = current.visit_count + pending.get(current.id, 0)
+        parent_visits = parent_visits if parent_visits > 0 else 1
         best_child_id = max(
             current.children_ids,
-            key=lambda cid: _ucb1(state.nodes[cid], parent_visits, ucb_constant),
+            key=lambda cid: _ucb1(
+                state, state.nodes[cid], parent_visits, ucb_constant, pending.get(cid, 0)
+            ),
         )
         current = state.nodes[best_child_id]
 
     return current
 
 
-def _try_evaluate(
+def _path_ids(state: SearchState, node: FormulaNode) -> list[str]:
+    """Ids of ``node`` and its ancestors."""
+    path = []
+    current_id = node.id
+    while current_id is not None:
+        path.append(current_id)
+        current_id = state.nodes[current_id].parent_id
+    return path
+
+
+def _known_fingerprints(state: SearchState, cfg) -> dict[str, str] | None:
+    return state.fingerprint_index if cfg.mcts.reuse_equivalent else None
+
+
+def _resolve_equivalent(result, state: SearchState):
+    """Fill a rank-equivalent result with the metrics of the node it duplicates.
+
+    The training accuracy is exact; test, group and extra-set metrics are approximate
+    (see ``evaluator.rank_fingerprint``).
+    """
+    if not result.equivalent_to:
+        return result
+    twin = state.nodes[result.equivalent_to]
+    log.info("Candidate is rank-equivalent to node %s, reusing its result", twin.id)
+    return replace(
+        result,
+        accuracy=twin.accuracy,
+        train_accuracy=twin.metrics["train_accuracy"],
+        test_accuracy=twin.metrics["test_accuracy"],
+        false_positive_rate=twin.metrics["false_positive_rate"],
+        per_anion_accuracy=twin.metrics["per_anion_accuracy"],
+        group_metrics=twin.metrics.get("group_metrics", {}),
+        generalization=twin.metrics.get("generalization", {}),
+        regression=twin.metrics.get("regression", {}),
+        metrics_summary=twin.metrics["metrics_summary"],
+        plot_path=twin.plot_path,
+    )
+
+
+def _debug_and_retry(
     code: str,
+    error: str,
     client: LLMClient,
     df: pd.DataFrame,
     plot_dir: Path,
     node_id: str,
     state: SearchState,
     cfg,
+    *,
+    ctx: EvalContext,
+    failing_rows: list[dict] | None = None,
 ):
-    """Try to evaluate a function, with one debug attempt on failure."""
-    result = evaluate_candidate(
-        code,
-        df,
-        plot_dir,
-        node_id,
-        decision_tree_max_depth=cfg.eval.decision_tree_max_depth,
-        train_split_label=cfg.eval.train_split_label,
-    )
-
-    if not result.error:
-        return result, code
-
-    log.warning("Evaluation failed: %s — attempting debug fix", result.error)
-    fixed_code = debug_function(client, code, result.error)
+    """Ask the LLM to fix a failed function and evaluate the fix once."""
+    log.warning("Evaluation failed: %s — attempting debug fix", error)
+    fixed_code = debug_function(client, code, error, failing_rows)
     state.debug_calls += 1
+    return _evaluate_fix(fixed_code, code, df, plot_dir, node_id, state, cfg, ctx=ctx)
+
 
+def _evaluate_fix(
+    fixed_code: str,
+    code: str,
+    df: pd.DataFrame,
+    plot_dir: Path,
+    node_id: str,
+    state: SearchState,
+    cfg,
+    *,
+    ctx: EvalContext,
+):
+    """Evaluate a debugged function; on failure the original ``code`` is returned."""
     result2 = evaluate_candidate(
         fixed_code,
         df,
@@ -90,12 +184,34 @@ def _try_evaluate(
         node_id,
         decision_tree_max_depth=cfg.eval.decision_tree_max_depth,
         train_split_label=cfg.eval.train_split_label,
+        cache=ctx.cache,
+        known_fingerprints=_known_fingerprints(state, cfg),
+        renderer=ctx.renderer,
+        generalization=ctx.generalization,
+        regression=ctx.regression,
+        store=state.values,
     )
     if not result2.error:
-        return result2, fixed_code
+        return _resolve_equivalent(result2, state), fixed_code
     return result2, code
 
 
+def _result_metrics(result) -> dict:
+    metrics = {
+        "train_accuracy": result.train_accuracy,
+        "test_accuracy": result.test_accuracy,
+        "false_positive_rate": result.false_positive_rate,
+        "per_anion_accuracy": result.per_anion_accuracy,
+        "group_metrics": result.group_metrics,
+        "generalization": result.generalization,
+        "regression": result.regression,
+        "metrics_summary": result.metrics_summary,
+    }
+    if result.equivalent_to:
+        metrics["equivalent_to"] = result.equivalent_to
+    return metrics
+
+
 def _result_to_node(
     node_id: str, parent_id: str | None, code: str, proposal, result, depth: int
 ) -> FormulaNode:
@@ -106,93 +222,703 @@ def _result_to_node(
         description=proposal.explanation,
         formula=proposal.formula,
         accuracy=result.accuracy,
-        metrics={
-            "train_accuracy": result.train_accuracy,
-            "test_accuracy": result.test_accuracy,
-            "false_positive_rate": result.false_positive_rate,
-            "per_anion_accuracy": result.per_anion_accuracy,
-            "metrics_summary": result.metrics_summary,
-        },
+        metrics=_result_metrics(result),
         plot_path=result.plot_path,
         visit_count=1,
         total_reward=0.0,
         children_ids=[],
         depth=depth,
+        rank_fingerprint=result.rank_fingerprint,
+        values_row=result.values_row,
     )
 
 
-def expand_initial(
-    client: LLMClient, state: SearchState, df: pd.DataFrame, plot_dir: Path, cfg
-) -> FormulaNode | None:
-    """Propose and evaluate an initial formula (root child)."""
-    proposal = propose_initial(client)
-    state.total_llm_calls += 1
-    node_id = _generate_node_id()
+def expand_initial_batch(
+    client: LLMClient,
+    state: SearchState,
+    df: pd.DataFrame,
+    plot_dir: Path,
+    cfg,
+    n: int,
+    *,
+    ctx: EvalContext,
+) -> list[FormulaNode]:
+    """Propose ``n`` initial formulas and evaluate them together in one parallel batch.
+
+    Up to ``mcts.parallel`` proposals are requested concurrently.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, min(cfg.mcts.parallel, n))) as pool:
+        proposals = list(pool.map(lambda _: propose_initial(client), range(n)))
+    state.total_llm_calls += len(proposals)
+    node_ids = [_generate_node_id() for _ in proposals]
+
+    results = evaluate_many(
+        [p.function for p in proposals],
+        df,
+        plot_dir,
+        node_ids,
+        decision_tree_max_depth=cfg.eval.decision_tree_max_depth,
+        train_split_label=cfg.eval.train_split_label,
+        workers=cfg.eval.workers,
+        cache=ctx.cache,
+        known_fingerprints=_known_fingerprints(state, cfg),
+        renderer=ctx.renderer,
+        generalization=ctx.generalization,
+        regression=ctx.regression,
+        store=state.values,
+    )
+
+    nodes = []
+    for proposal, node_id, result in zip(proposals, node_ids, results, strict=True):
+        code = proposal.function
+        if result.error:
+            result, code = _debug_and_retry(
+                code,
+                result.error,
+                client,
+                df,
+                plot_dir,
+                node_id,
+                state,
+                cfg,
+                ctx=ctx,
+                failing_rows=result.failing_rows,
+            )
+        if result.error:
+            log.warning("Initial formula failed even after debugging: %s", result.error)
+            continue
+        result = _resolve_equivalent(result, state)
+        node = _result_to_node(node_id, None, code, proposal, result, depth=0)
+        state.add_node(node)
+        state.budget_used += 1
+        nodes.append(node)
+    return nodes
+
+
+def expand_enumerated(
+    state: SearchState,
+    df: pd.DataFrame,
+    plot_dir: Path,
+    cfg,
+    *,
+    ctx: EvalContext,
+) -> list[FormulaNode]:
+    """Add the best brute-force formulas as root children, without any LLM call."""
+    enum_cfg = cfg.enumerate
+    bank = feature_bank(df)
+    proposals = propose_enumerated(
+        {name: bank[name] for name in enum_cfg.features},
+        df["exp_label"].to_numpy(),
+        df["is_train"].to_numpy() == cfg.eval.train_split_label,
+        enum_cfg.top_n,
+        complexity=enum_cfg.complexity,
+        subspace_size=enum_cfg.subspace_size,
+        chunk_elements=enum_cfg.chunk_elements,
+        max_depth=cfg.eval.decision_tree_max_depth,
+        workers=enum_cfg.workers or os.cpu_count() or 1,
+    )
+    node_ids = [_generate_node_id() for _ in proposals]
+    results = evaluate_many(
+        [p.function for p in proposals],
+        df,
+        plot_dir,
+        node_ids,
+        decision_tree_max_depth=cfg.eval.decision_tree_max_depth,
+        train_split_label=cfg.eval.train_split_label,
+        workers=cfg.eval.workers,
+        cache=ctx.cache,
+        known_fingerprints=_known_fingerprints(state, cfg),
+        renderer=ctx.renderer,
+        generalization=ctx.generalization,
+        regression=ctx.regression,
+        store=state.values,
+    )
 
-    result, final_code = _try_evaluate(proposal.function, client, df, plot_dir, node_id, state, cfg)
+    nodes = []
+    for proposal, node_id, result in zip(proposals, node_ids, results, strict=True):
+        if result.error:
+            log.warning("Enumerated formula %s failed: %s", proposal.formula, result.error)
+            continue
+        result = _resolve_equivalent(result, state)
+        node = _result_to_node(node_id, None, proposal.function, proposal, result, depth=0)
+        state.add_node(node)
+        nodes.append(node)
+    return nodes
+
+
+def _improvement_request(parent: FormulaNode, renderer: PlotRenderer | None) -> tuple:
+    """Arguments of ``propose_improvement`` after the client, rendering the plot if needed."""
+    return (
+        parent.code,
+        parent.formula,
+        parent.description,
+        parent.metrics["metrics_summary"],
+        ensure_plot(parent.plot_path, renderer),
+    )
 
-    if result.error:
-        log.warning("Initial formula failed even after debugging: %s", result.error)
-        return None
 
-    node = _result_to_node(node_id, None, final_code, proposal, result, depth=0)
-    state.add_node(node)
-    state.budget_used += 1
-    return node
+def _propose(client: LLMClient, k: int, request: tuple) -> list[Proposal]:
+    """One LLM call for ``k`` improvements; ``request`` as from ``_improvement_request``."""
+    if k <= 1:
+        return [propose_improvement(client, *request)]
+    return propose_improvements(client, *request, k)
+
+
+def _pick_children(
+    parent: FormulaNode, candidates: list[tuple], m: int, state: SearchState, by: str
+) -> list[tuple]:
+    """The ``m`` (proposal, node id, result, code) candidates to insert under ``parent``.
+
+    ``accuracy`` takes the most accurate. ``novelty`` picks greedily the candidate whose
+    largest Spearman correlation with the parent's path, its children and the
+    candidates already picked is smallest, ties going to the more accurate.
+    """
+    candidates = sorted(candidates, key=lambda c: -c[2].accuracy)
+    if by == "accuracy" or len(candidates) <= 1:
+        return candidates[:m]
+    if by != "novelty":
+        raise ValueError(f"Unknown child selection {by!r}")
+
+    reference = [state.nodes[nid] for nid in _path_ids(state, parent) + parent.children_ids]
+    rows = [n.values_row for n in reference if n.values_row >= 0]
+    own = np.stack([c[2].descriptor_values for c in candidates])
+    known = state.values.rows(rows) if state.values is not None and rows else own[:0]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        corr = np.corrcoef(rankdata(np.vstack([known, own]), axis=1))
+    # A constant descriptor has no correlation; it adds nothing new either.
+    corr = np.abs(np.nan_to_num(np.atleast_2d(corr), nan=1.0))
+
+    compared = list(range(len(known)))
+    remaining = list(range(len(known), len(known) + len(candidates)))
+    picked = []
+    while remaining and len(picked) < m:
+        similarity = corr[np.ix_(remaining, compared)].max(axis=1, initial=0.0)
+        best = remaining.pop(int(np.argmin(similarity)))
+        compared.append(best)
+        picked.append(candidates[best - len(known)])
+    return picked
+
+
+def _evaluate_proposals(
+    proposals: list[Proposal],
+    state: SearchState,
+    df: pd.DataFrame,
+    plot_dir: Path,
+    cfg,
+    *,
+    ctx: EvalContext,
+) -> tuple[list[tuple], tuple | None]:
+    """Evaluate proposals; returns the usable (proposal, node id, result, code) candidates
+    and, if there are none, the (proposal, node id, result) to debug.
+
+    Several proposals are scored as one batch without keeping their values in the
+    run's value store; candidates rank-equivalent to an earlier one of the batch are
+    dropped.
+    """
+    node_ids = [_generate_node_id() for _ in proposals]
+    if len(proposals) == 1:
+        results = [
+            evaluate_candidate(
+                proposals[0].function,
+                df,
+                plot_dir,
+                node_ids[0],
+                decision_tree_max_depth=cfg.eval.decision_tree_max_depth,
+                train_split_label=cfg.eval.train_split_label,
+                cache=ctx.cache,
+                known_fingerprints=_known_fingerprints(state, cfg),
+                renderer=ctx.renderer,
+                generalization=ctx.generalization,
+                regression=ctx.regression,
+                store=state.values,
+            )
+        ]
+    else:
+        results = evaluate_many(
+            [p.function for p in proposals],
+            df,
+            plot_dir,
+            node_ids,
+            decision_tree_max_depth=cfg.eval.decision_tree_max_depth,
+            train_split_label=cfg.eval.train_split_label,
+            workers=cfg.eval.workers,
+            cache=ctx.cache,
+            known_fingerprints=_known_fingerprints(state, cfg),
+            renderer=ctx.renderer,
+            generalization=ctx.generalization,
+            regression=ctx.regression,
+        )
+    candidates = []
+    for proposal, node_id, result in zip(proposals, node_ids, results, strict=True):
+        if result.error or (result.equivalent_to and result.equivalent_to not in state.nodes):
+            continue
+        candidates.append(
+            (proposal, node_id, _resolve_equivalent(result, state), proposal.function)
+        )
+    if candidates or not proposals:
+        return candidates, None
+    return [], (proposals[0], node_ids[0], results[0])
+
+
+def _insert_children(
+    parent: FormulaNode, candidates: list[tuple], limit: int, state: SearchState, cfg
+) -> list[FormulaNode]:
+    """Add up to ``limit`` candidates under ``parent``, chosen by ``mcts.child_selection``."""
+    children = []
+    for proposal, node_id, result, code in _pick_children(
+        parent, candidates, limit, state, cfg.mcts.child_selection
+    ):
+        if state.values is not None and result.value_store is not state.values:
+            result = replace(
+                result,
+                values_row=state.values.add(node_id, result.descriptor_values),
+                value_store=state.values,
+            )
+        node = _result_to_node(node_id, parent.id, code, proposal, result, depth=parent.depth + 1)
+        state.add_node(node)
+        state.budget_used += 1
+        children.append(node)
+    return children
 
 
-def expand_child(
+def _add_children(
     parent: FormulaNode,
+    proposals: list[Proposal],
+    limit: int,
     client: LLMClient,
     state: SearchState,
     df: pd.DataFrame,
     plot_dir: Path,
     cfg,
-) -> FormulaNode | None:
-    """Propose an improvement of a parent formula and evaluate it."""
+    *,
+    ctx: EvalContext,
+) -> list[FormulaNode]:
+    """Evaluate proposed improvements of ``parent`` and add up to ``limit`` of them.
+
+    Which ones is ``mcts.child_selection`` (see ``_pick_children``). Only if every
+    proposal fails is the first one debugged.
+    """
+    candidates, failed = _evaluate_proposals(proposals, state, df, plot_dir, cfg, ctx=ctx)
+    if failed is not None:
+        proposal, node_id, result = failed
+        result, code = _debug_and_retry(
+            proposal.function,
+            result.error,
+            client,
+            df,
+            plot_dir,
+            node_id,
+            state,
+            cfg,
+            failing_rows=result.failing_rows,
+            ctx=ctx,
+        )
+        if result.error:
+            log.warning("Improved formula failed even after debugging: %s", result.error)
+            return []
+        candidates = [(proposal, node_id, result, code)]
+
+    children = _insert_children(parent, candidates, limit, state, cfg)
+    if len(proposals) > 1:
+        log.info("Added %d of %d proposals under node %s", len(children), len(proposals), parent.id)
+    return children
+
+
+def expand_children(
+    parent: FormulaNode,
+    client: LLMClient,
+    state: SearchState,
+    df: pd.DataFrame,
+    plot_dir: Path,
+    cfg,
+    *,
+    limit: int = 1,
+    ctx: EvalContext,
+) -> list[FormulaNode]:
+    """Request ``mcts.proposals_per_call`` improvements of a parent in one LLM call and
+    add the best ``mcts.children_per_call`` of them, but no more than ``limit``."""
     if parent.depth >= cfg.mcts.max_depth:
         log.info("Max depth reached at node %s", parent.id)
-        return None
+        return []
 
-    proposal = propose_improvement(
-        client,
-        parent.code,
-        parent.formula,
-        parent.description,
-        parent.metrics["metrics_summary"],
-        Path(parent.plot_path),
+    proposals = _propose(
+        client, cfg.mcts.proposals_per_call, _improvement_request(parent, ctx.renderer)
     )
     state.total_llm_calls += 1
-    node_id = _generate_node_id()
+    return _add_children(
+        parent,
+        proposals,
+        min(limit, cfg.mcts.children_per_call),
+        client,
+        state,
+        df,
+        plot_dir,
+        cfg,
+        ctx=ctx,
+    )
 
-    result, final_code = _try_evaluate(proposal.function, client, df, plot_dir, node_id, state, cfg)
 
+def refine_node(
+    node: FormulaNode,
+    state: SearchState,
+    df: pd.DataFrame,
+    plot_dir: Path,
+    cfg,
+    *,
+    ctx: EvalContext,
+) -> FormulaNode | None:
+    """Add a child of ``node`` with its numeric constants tuned, if that helps on train."""
+    if node.depth >= cfg.mcts.max_depth:
+        return None
+    refined = refine_constants(
+        node.code,
+        df,
+        decision_tree_max_depth=cfg.eval.decision_tree_max_depth,
+        train_split_label=cfg.eval.train_split_label,
+        max_trials=cfg.refine.max_trials,
+        max_seconds=cfg.refine.max_seconds,
+        generalization=ctx.generalization,
+        regression=ctx.regression,
+    )
+    if refined is None:
+        return None
+    node_id = _generate_node_id()
+    result = evaluate_candidate(
+        refined["code"],
+        df,
+        plot_dir,
+        node_id,
+        decision_tree_max_depth=cfg.eval.decision_tree_max_depth,
+        train_split_label=cfg.eval.train_split_label,
+        cache=ctx.cache,
+        known_fingerprints=_known_fingerprints(state, cfg),
+        renderer=ctx.renderer,
+        generalization=ctx.generalization,
+        regression=ctx.regression,
+        store=state.values,
+    )
     if result.error:
-        log.warning("Improved formula failed even after debugging: %s", result.error)
+        log.warning("Refined formula of node %s failed: %s", node.id, result.error)
         return None
+    changes = ", ".join(f"{old:g} -> {new:.4g}" for old, new in refined["constants"] if old != new)
+    proposal = Proposal(
+        function=refined["code"],
+        explanation=(
+            f"{node.description}\n\nConstants refined ({changes}): train accuracy "
+            f"{refined['start_train_accuracy']:.1%} -> {refined['train_accuracy']:.1%}"
+        ),
+        formula=node.formula,
+    )
+    result = _resolve_equivalent(result, state)
+    child = _result_to_node(node_id, node.id, refined["code"], proposal, result, node.depth + 1)
+    state.add_node(child)
+    return child
 
-    node = _result_to_node(node_id, parent.id, final_code, proposal, result, depth=parent.depth + 1)
-    state.add_node(node)
-    state.budget_used += 1
-    return node
-
-
-def backpropagate(state: SearchState, node: FormulaNode) -> None:
-    """Recompute all rewards and backpropagate up the tree."""
-    rewards = state.recompute_ranks()
 
-    for nid, reward in rewards.items():
-        n = state.nodes[nid]
-        n.total_reward = reward * n.visit_count
+def rescore_state(
+    state: SearchState,
+    df: pd.DataFrame,
+    plot_dir: Path,
+    cfg,
+    *,
+    renderer: PlotRenderer | None = None,
+    generalization: pd.DataFrame | None = None,
+    regression: pd.DataFrame | None = None,
+) -> None:
+    """Re-evaluate every node of a saved state in one parallel batch.
+
+    Used when the dataset or evaluation settings changed since the state was saved.
+    Nodes whose code no longer evaluates keep their previous metrics.
+    """
+    plot_dir.mkdir(parents=True, exist_ok=True)
+    nodes = list(state.nodes.values())
+    results = evaluate_many(
+        [n.code for n in nodes],
+        df,
+        plot_dir,
+        [n.id for n in nodes],
+        decision_tree_max_depth=cfg.eval.decision_tree_max_depth,
+        train_split_label=cfg.eval.train_split_label,
+        workers=cfg.eval.workers,
+        renderer=renderer,
+        generalization=generalization,
+        regression=regression,
+        store=state.values,
+    )
+    for node, result in zip(nodes, results, strict=True):
+        if result.error:
+            log.warning("Re-scoring node %s failed: %s", node.id, result.error)
+            continue
+        node.accuracy = result.accuracy
+        node.metrics = _result_metrics(result)
+        node.plot_path = result.plot_path
+        node.rank_fingerprint = result.rank_fingerprint
+        node.values_row = result.values_row
+    state.rebuild_fingerprint_index()
+    state.rebuild_rank_index()
+    log.info("Re-scored %d nodes", len(nodes))
+
+
+def backpropagate(state: SearchState, node: FormulaNode, regression_weight: float = 0.0) -> None:
+    """Reset all rewards to the current ranks and backpropagate up the tree.
+
+    With a ``regression_weight`` nodes are ranked by accuracy plus that weight times
+    their DFT decomposition enthalpy reward (see ``regression.regression_scores``).
+    The reset is lazy (``SearchState.reset_rewards``), so this costs O(depth log N);
+    inserting the node in the rank index beforehand (``SearchState.add_node``) is O(N).
+    """
+    state.reset_rewards(regression_weight)
+    reward = state.rank_reward(node.id)
 
     current_id = node.parent_id
     while current_id is not None:
         parent = state.nodes[current_id]
-        parent.visit_count += 1
-        parent.total_reward += rewards[node.id]
+        state.add_reward(parent, reward)
         current_id = parent.parent_id
 
 
+def _refine_and_backpropagate(
+    node: FormulaNode,
+    state: SearchState,
+    df: pd.DataFrame,
+    plot_dir: Path,
+    cfg,
+    *,
+    ctx: EvalContext,
+) -> None:
+    refined = refine_node(node, state, df, plot_dir, cfg, ctx=ctx)
+    if refined:
+        backpropagate(state, refined, cfg.mcts.regression_weight)
+        log.info(
+            "Refined node %s: accuracy=%.3f (from %.3f)",
+            refined.id,
+            refined.accuracy,
+            node.accuracy,
+        )
+
+
+def _record_expansion(
+    selected: FormulaNode,
+    children: list[FormulaNode],
+    state: SearchState,
+    df: pd.DataFrame,
+    plot_dir: Path,
+    cfg,
+    *,
+    ctx: EvalContext,
+) -> None:
+    """Backpropagate the new children of ``selected``, or charge a failed expansion to it."""
+    if not children:
+        state.budget_used += 1
+        state.add_visit(selected)
+        return
+    for child in children:
+        backpropagate(state, child, cfg.mcts.regression_weight)
+        log.info(
+            "New node %s: accuracy=%.3f (parent %s: %.3f)",
+            child.id,
+            child.accuracy,
+            selected.id,
+            selected.accuracy,
+        )
+        if cfg.refine.enabled:
+            _refine_and_backpropagate(child, state, df, plot_dir, cfg, ctx=ctx)
+
+
+def _busy_seconds(intervals: list[tuple[float, float]]) -> float:
+    """Length of the union of ``(start, end)`` intervals."""
+    busy = 0.0
+    reach = -math.inf
+    for start, end in sorted(intervals):
+        busy += max(0.0, end - max(start, reach))
+        reach = max(reach, end)
+    return busy
+
+
+@dataclass
+class _StageClock:
+    """Busy intervals of the pipeline stages, on the ``time.monotonic`` clock."""
+
+    started: float = field(default_factory=time.monotonic)
+    llm: list[tuple[float, float]] = field(default_factory=list)
+    cpu: list[tuple[float, float]] = field(default_factory=list)
+    persist: list[tuple[float, float]] = field(default_factory=list)
+
+    def timed(self, stage: list, fn, *args):
+        start = time.monotonic()
+        # try-catch approved: the interval is recorded even if the stage raises
+        try:
+            return fn(*args)
+        finally:
+            stage.append((start, time.monotonic()))
+
+    def report(self) -> dict:
+        """Busy fraction of each stage over the run, and of LLM and CPU at once."""
+        wall = max(time.monotonic() - self.started, 1e-9)
+        llm = _busy_seconds(self.llm)
+        cpu = _busy_seconds(self.cpu)
+        both = llm + cpu - _busy_seconds(self.llm + self.cpu)
+        return {
+            "wall_seconds": round(wall, 3),
+            "llm_busy": round(llm / wall, 3),
+            "cpu_busy": round(cpu / wall, 3),
+            "persist_busy": round(_busy_seconds(self.persist) / wall, 3),
+            "overlap": round(both / wall, 3),
+            "llm_calls": len(self.llm),
+            "mean_llm_in_flight": round(sum(end - start for start, end in self.llm) / wall, 3),
+        }
+
+
+@dataclass
+class _Expansion:
+    """An expansion from selection until it is recorded, holding virtual loss and budget."""
+
+    selected: FormulaNode
+    path: list[str]
+    limit: int
+    # Set while a debug call for it is in flight.
+    failed: tuple | None = None
+
+
+def _run_pipelined(
+    client: LLMClient,
+    state: SearchState,
+    df: pd.DataFrame,
+    plot_dir: Path,
+    cfg,
+    *,
+    state_save_path: Path,
+    ctx: EvalContext,
+) -> dict:
+    """MCTS with the LLM calls pipelined against evaluation and persistence.
+
+    Up to ``mcts.parallel`` proposal calls are in flight on worker threads. When calls
+    return, the free slots are refilled first, by selecting from the current
+    statistics, so the next proposals are already on their way while this thread
+    evaluates, plots, backpropagates and snapshots the returned ones. Debug calls for
+    failed proposals also go to the workers, and state files are written on a
+    separate thread. The tree is only touched on this thread.
+
+    An expansion keeps a virtual loss on its path (see ``select_node``) and reserves
+    the budget of the children it may add (``mcts.children_per_call``) until it is
+    recorded. Expansions only start while the budget covers them, so ``budget_used``
+    ends exactly at the budget. Returns the stage utilization (``_StageClock.report``).
+    """
+    budget = cfg.mcts.budget
+    pending: Counter[str] = Counter()
+    in_flight: dict[Future, _Expansion] = {}
+    reserved = 0
+    clock = _StageClock()
+
+    def proposals_in_flight() -> int:
+        return sum(1 for expansion in in_flight.values() if expansion.failed is None)
+
+    def fill(pool: ThreadPoolExecutor) -> None:
+        nonlocal reserved
+        while proposals_in_flight() < cfg.mcts.parallel and state.budget_used + reserved < budget:
+            selected = select_node(state, cfg, pending)
+            if selected is None:
+                return
+            if selected.depth >= cfg.mcts.max_depth:
+                log.info("Max depth reached at node %s", selected.id)
+                _record_expansion(selected, [], state, df, plot_dir, cfg, ctx=ctx)
+                continue
+            log.info(
+                "=== MCTS expansion of node %s (depth=%d, accuracy=%.3f, budget %d/%d, "
+                "%d in flight) ===",
+                selected.id,
+                selected.depth,
+                selected.accuracy,
+                state.budget_used,
+                budget,
+                len(in_flight) + 1,
+            )
+            request = _improvement_request(selected, ctx.renderer)
+            limit = min(cfg.mcts.children_per_call, budget - state.budget_used - reserved)
+            reserved += limit
+            expansion = _Expansion(selected, _path_ids(state, selected), limit)
+            pending.update(expansion.path)
+            future = pool.submit(
+                clock.timed, clock.llm, _propose, client, cfg.mcts.proposals_per_call, request
+            )
+            in_flight[future] = expansion
+
+    def finish(expansion: _Expansion, children: list[FormulaNode]) -> None:
+        nonlocal pending, reserved
+        pending.subtract(expansion.path)
+        pending = +pending
+        reserved -= expansion.limit
+        _record_expansion(expansion.selected, children, state, df, plot_dir, cfg, ctx=ctx)
+
+    def process(pool: ThreadPoolExecutor, future: Future, expansion: _Expansion) -> None:
+        if expansion.failed is not None:
+            proposal, node_id, result = expansion.failed
+            state.debug_calls += 1
+            result, code = _evaluate_fix(
+                future.result(), proposal.function, df, plot_dir, node_id, state, cfg, ctx=ctx
+            )
+            if result.error:
+                log.warning("Improved formula failed even after debugging: %s", result.error)
+                finish(expansion, [])
+                return
+            candidates = [(proposal, node_id, result, code)]
+        else:
+            state.total_llm_calls += 1
+            proposals = future.result()
+            candidates, failed = _evaluate_proposals(proposals, state, df, plot_dir, cfg, ctx=ctx)
+            if failed is not None:
+                proposal, _node_id, result = failed
+                log.warning("Evaluation failed: %s — attempting debug fix", result.error)
+                expansion.failed = failed
+                debug = pool.submit(
+                    clock.timed,
+                    clock.llm,
+                    debug_function,
+                    client,
+                    proposal.function,
+                    result.error,
+                    result.failing_rows,
+                )
+                in_flight[debug] = expansion
+                return
+        selected = expansion.selected
+        finish(expansion, _insert_children(selected, candidates, expansion.limit, state, cfg))
+
+    def persist_snapshot(data: dict) -> None:
+        clock.timed(clock.persist, SearchState.write, state_save_path, data)
+
+    # Debug calls may wait on top of the proposal calls.
+    with (
+        ThreadPoolExecutor(max_workers=2 * cfg.mcts.parallel) as pool,
+        ThreadPoolExecutor(max_workers=1) as persist,
+    ):
+        while True:
+            fill(pool)
+            if not in_flight:
+                if state.budget_used < budget:
+                    log.warning("No node selected, stopping")
+                break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            ready = [(future, in_flight.pop(future)) for future in done]
+            # Speculative selection: the next calls start before these are evaluated.
+            fill(pool)
+            start = time.monotonic()
+            for future, expansion in ready:
+                process(pool, future, expansion)
+            data = state.snapshot()
+            if state.values is not None:
+                state.values.flush()
+            clock.cpu.append((start, time.monotonic()))
+            persist.submit(persist_snapshot, data)
+
+    # After the writer thread finished, so this is the last write.
+    state.save(state_save_path)
+    state.utilization = clock.report()
+    log.info("Pipeline utilization: %s", state.utilization)
+    return state.utilization
+
+
 def run_mcts(
     client: LLMClient,
     state: SearchState,
@@ -201,26 +927,47 @@ def run_mcts(
     cfg,
     *,
     state_save_path: Path,
+    cache: EvalCache | None = None,
+    renderer: PlotRenderer | None = None,
+    generalization: pd.DataFrame | None = None,
+    regression: pd.DataFrame | None = None,
 ) -> SearchState:
     """Main MCTS loop."""
+    ctx = EvalContext(cache, renderer, generalization, regression)
     plot_dir.mkdir(parents=True, exist_ok=True)
     budget = cfg.mcts.budget
     initial_samples = cfg.mcts.initial_samples
+    if cfg.mcts.array_tree and state.arrays is None:
+        state.use_arrays()
+
+    if cfg.enumerate.top_n and not state.nodes:
+        log.info("=== Brute-force enumeration (top %d) ===", cfg.enumerate.top_n)
+        for node in expand_enumerated(state, df, plot_dir, cfg, ctx=ctx):
+            backpropagate(state, node, cfg.mcts.regression_weight)
+            log.info("Enumerated node %s: accuracy=%.3f", node.id, node.accuracy)
+        state.save(state_save_path)
 
     while len(state.root_children) < initial_samples and state.budget_used < budget:
+        n = min(initial_samples - len(state.root_children), budget - state.budget_used)
         log.info(
-            "=== Initial sample %d/%d (budget %d/%d) ===",
+            "=== Initial samples %d-%d/%d (budget %d/%d) ===",
             len(state.root_children) + 1,
+            len(state.root_children) + n,
             initial_samples,
             state.budget_used,
             budget,
         )
-        node = expand_initial(client, state, df, plot_dir, cfg)
-        if node:
-            backpropagate(state, node)
+        for node in expand_initial_batch(client, state, df, plot_dir, cfg, n, ctx=ctx):
+            backpropagate(state, node, cfg.mcts.regression_weight)
             log.info("Initial node %s: accuracy=%.3f", node.id, node.accuracy)
+            if cfg.refine.enabled:
+                _refine_and_backpropagate(node, state, df, plot_dir, cfg, ctx=ctx)
         state.save(state_save_path)
 
+    if cfg.mcts.parallel > 1 or cfg.mcts.pipeline:
+        _run_pipelined(client, state, df, plot_dir, cfg, state_save_path=state_save_path, ctx=ctx)
+        return state
+
     while state.budget_used < budget:
         log.info("=== MCTS iteration (budget %d/%d) ===", state.budget_used, budget)
 
@@ -236,20 +983,17 @@ def run_mcts(
             selected.accuracy,
         )
 
-        child = expand_child(selected, client, state, df, plot_dir, cfg)
-        if child:
-            backpropagate(state, child)
-            log.info(
-                "New node %s: accuracy=%.3f (parent %s: %.3f)",
-                child.id,
-                child.accuracy,
-                selected.id,
-                selected.accuracy,
-            )
-        else: 
-            state.budget_used += 1
-            selected.visit_count += 1
-
+        children = expand_children(
+            selected,
+            client,
+            state,
+            df,
+            plot_dir,
+            cfg,
+            limit=budget - state.budget_used,
+            ctx=ctx,
+        )
+        _record_expansion(selected, children, state, df, plot_dir, cfg, ctx=ctx)
         state.save(state_save_path)
 
     return state
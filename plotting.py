@@ -0,0 +1,188 @@
+"""Descriptor histogram rendering, eager, lazy or on a background thread.
+
+Only the plots of nodes selected for expansion are ever shown to the LLM, so rendering
+can be deferred. A deferred plot is recorded as a small ``.npz`` spec next to its
+``.png`` path; ``ensure_plot`` renders it on first use, also after a resumed run.
+Figures are built with the object-oriented API rather than pyplot so background
+rendering never touches pyplot's global state, and the PNG bytes are the same in
+every mode.
+"""
+
+import contextlib
+import logging
+import os
+import shutil
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from matplotlib.figure import Figure
+
+from splits import SplitRule
+
+log = logging.getLogger(__name__)
+
+PLOT_MODES = ("eager", "lazy", "background")
+
+
+def render_plot(
+    values: np.ndarray,
+    labels: np.ndarray,
+    thresholds: list[float],
+    rule: SplitRule,
+    plot_path: Path,
+) -> None:
+    perov_vals = values[labels == 1]
+    nonperov_vals = values[labels == -1]
+
+    margin = max(1.0, (values.max() - values.min()) * 0.05)
+    vmin = min(np.percentile(values, 1), min(thresholds, default=0) - margin)
+    vmax = max(np.percentile(values, 99), max(thresholds, default=0) + margin)
+    bins = np.linspace(vmin, vmax, 40)
+
+    fig = Figure(figsize=(7, 4))
+    ax = fig.subplots()
+
+    xs = np.linspace(vmin, vmax, 500)
+    preds = rule.predict(xs)
+    prev_x = vmin
+    prev_pred = preds[0]
+    for x, pred in zip(xs[1:], preds[1:], strict=True):
+        if pred != prev_pred or x == xs[-1]:
+            color = "#c8e6c9" if prev_pred == 1 else "#ffcdd2"
+            ax.axvspan(prev_x, x, color=color, zorder=0, alpha=0.5)
+            prev_x = x
+            prev_pred = pred
+    color = "#c8e6c9" if prev_pred == 1 else "#ffcdd2"
+    ax.axvspan(prev_x, vmax, color=color, zorder=0, alpha=0.5)
+
+    ax.hist(
+        perov_vals, bins=bins, alpha=0.7, color="#1976d2", label="Perovskite", edgecolor="white"
+    )
+    ax.hist(
+        nonperov_vals,
+        bins=bins,
+        alpha=0.7,
+        color="#e65100",
+        label="Nonperovskite",
+        edgecolor="white",
+    )
+    for t in thresholds:
+        ax.axvline(t, color="k", linestyle="--", linewidth=1)
+    ax.set_xlabel("Descriptor value", fontsize=12)
+    ax.set_ylabel("Counts", fontsize=12)
+    ax.legend(fontsize=8, loc="upper right")
+
+    fig.tight_layout()
+    fig.savefig(plot_path, dpi=150, bbox_inches="tight")
+
+
+def spec_path(plot_path: str | Path) -> Path:
+    return Path(plot_path).with_suffix(".npz")
+
+
+def _write_spec(
+    plot_path: Path,
+    values: np.ndarray,
+    labels: np.ndarray,
+    thresholds: list[float],
+    rule: SplitRule,
+) -> None:
+    with open(spec_path(plot_path), "wb") as f:
+        np.savez(
+            f,
+            values=values,
+            labels=labels,
+            thresholds=np.asarray(thresholds, dtype=np.float64),
+            rule_thresholds=rule.thresholds,
+            leaf_labels=rule.leaf_labels,
+        )
+
+
+def _render_spec(plot_path: Path) -> None:
+    spec = spec_path(plot_path)
+    with np.load(spec) as data:
+        rule = SplitRule(data["rule_thresholds"], data["leaf_labels"])
+        values, labels = data["values"], data["labels"]
+        thresholds = data["thresholds"].tolist()
+    # Render to a temporary name so a half-written PNG is never mistaken for a plot.
+    tmp = plot_path.with_name(plot_path.stem + ".tmp.png")
+    render_plot(values, labels, thresholds, rule, tmp)
+    os.replace(tmp, plot_path)
+    spec.unlink(missing_ok=True)
+
+
+class PlotRenderer:
+    """Render plots now (``eager``), on first use (``lazy``) or on worker threads
+    (``background``)."""
+
+    def __init__(self, mode: str = "eager", workers: int = 1):
+        if mode not in PLOT_MODES:
+            raise ValueError(f"Unknown plot mode {mode!r}, expected one of {PLOT_MODES}")
+        self.mode = mode
+        self._pool = ThreadPoolExecutor(workers) if mode == "background" else None
+        self._pending: dict[Path, Future] = {}
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        plot_path: Path,
+        values: np.ndarray,
+        labels: np.ndarray,
+        thresholds: list[float],
+        rule: SplitRule,
+    ) -> None:
+        plot_path = Path(plot_path)
+        if self.mode == "eager":
+            render_plot(values, labels, thresholds, rule, plot_path)
+            return
+        _write_spec(plot_path, values, labels, thresholds, rule)
+        if self._pool is not None:
+            with self._lock:
+                self._pending[plot_path] = self._pool.submit(_render_spec, plot_path)
+
+    def wait(self, plot_path: str | Path) -> None:
+        """Block until a background render of ``plot_path`` has finished."""
+        with self._lock:
+            future = self._pending.pop(Path(plot_path), None)
+        if future is not None and future.exception() is not None:
+            log.warning("Background plot rendering failed: %s", future.exception())
+
+    def close(self) -> None:
+        """Finish all background renders."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            with self._lock:
+                futures, self._pending = list(self._pending.values()), {}
+            for future in futures:
+                if future.exception() is not None:
+                    log.warning("Background plot rendering failed: %s", future.exception())
+
+
+def ensure_plot(plot_path: str | Path, renderer: PlotRenderer | None = None) -> Path:
+    """Return ``plot_path``, rendering it first if it was deferred.
+
+    A path with neither a PNG nor a spec (an empty path, or a plot deleted from an
+    old run) is returned unchanged.
+    """
+    plot_path = Path(plot_path)
+    if not plot_path.name:
+        return plot_path
+    if renderer is not None:
+        renderer.wait(plot_path)
+    if not plot_path.is_file() and spec_path(plot_path).is_file():
+        _render_spec(plot_path)
+    return plot_path
+
+
+def copy_plot(src: str | Path, dst: Path) -> None:
+    """Copy a rendered or deferred plot from ``src`` to ``dst``."""
+    src = Path(src)
+    if not src.name or src.resolve() == dst.resolve():
+        return
+    # A background render may turn the spec into a PNG between the checks.
+    for source, target in ((src, dst), (spec_path(src), spec_path(dst)), (src, dst)):
+        with contextlib.suppress(FileNotFoundError):
+            shutil.copyfile(source, target)
+            return
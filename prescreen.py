@@ -0,0 +1,375 @@
+"""Static checks on descriptor code before it is executed.
+
+Descriptors that loop forever, import heavy modules or allocate huge buffers would
+otherwise only fail after the sandbox timeout. ``prescreen`` inspects the AST for
+clearly doomed code and returns a precise error, plus a rough cost class:
+
+- ``constant``: straight-line code
+- ``bounded``: loops with statically known trip counts
+- ``heavy``: known trip counts above ``HEAVY_ITERATIONS`` per compound
+- ``data-dependent``: ``while`` loops, loops over computed ranges or guarded recursion
+"""
+
+import ast
+import math
+from dataclasses import dataclass, field
+
+ALLOWED_MODULES = frozenset({"math", "cmath", "numpy"})
+FORBIDDEN_CALLS = frozenset(
+    {
+        "__import__",
+        "breakpoint",
+        "compile",
+        "delattr",
+        "eval",
+        "exec",
+        "exit",
+        "getattr",
+        "globals",
+        "input",
+        "locals",
+        "open",
+        "quit",
+        "setattr",
+        "vars",
+    }
+)
+# Functions whose leading arguments give the number of elements allocated.
+_ALLOCATORS = frozenset({"zeros", "ones", "empty", "full", "arange", "rand", "randn", "random"})
+
+MAX_ALLOCATION = 10**7
+MAX_ITERATIONS = 10**6
+HEAVY_ITERATIONS = 10**4
+MAX_INT_BITS = 10**6
+
+
+@dataclass
+class PrescreenReport:
+    errors: list[str] = field(default_factory=list)
+    cost_class: str = "constant"
+    iterations: int | None = 0  # loop iterations per compound; None when data-dependent
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def message(self) -> str:
+        return "Static check failed: " + "; ".join(self.errors)
+
+
+def _fold(node: ast.expr) -> float | None:
+    """Value of a constant integer/float expression, or None.
+
+    Powers too large to compute fold to ``math.inf``; expressions that raise (e.g.
+    ``0 ** -1``) or overflow a float are left to fail at run time and fold to None.
+    """
+    if isinstance(node, ast.Constant) and isinstance(node.value, int | float):
+        return node.value
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        value = _fold(node.operand)
+        return None if value is None else -value
+    if isinstance(node, ast.BinOp):
+        left, right = _fold(node.left), _fold(node.right)
+        if left is None or right is None:
+            return None
+        if isinstance(node.op, ast.Pow) and abs(left) > 1 and right * math.log2(abs(left)) > 1024:
+            return math.inf
+        # try-catch approved: constant code may divide by zero or overflow, which is the
+        # descriptor's runtime error to report, not the pre-screen's
+        try:
+            if isinstance(node.op, ast.Pow):
+                value = left**right
+                return value if isinstance(value, int | float) else None
+            ops = {ast.Add: float.__add__, ast.Sub: float.__sub__, ast.Mult: float.__mul__}
+            op = ops.get(type(node.op))
+            return None if op is None else op(float(left), float(right))
+        except (ZeroDivisionError, OverflowError):
+            return None
+    return None
+
+
+def _static_len(node: ast.expr) -> float | None:
+    """Number of items a ``for`` loop iterates over, when known statically."""
+    if isinstance(node, ast.List | ast.Tuple | ast.Set):
+        return len(node.elts)
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return len(node.value)
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+        args = [_fold(a) for a in node.args]
+        if node.func.id == "range" and args and None not in args:
+            start, stop, step = (0, args[0], 1) if len(args) == 1 else (*args[:2], 1)
+            if len(args) == 3:
+                step = args[2]
+            if step == 0:
+                return None
+            trips = (stop - start) / step
+            if math.isnan(trips):
+                return None
+            # An infinite bound (a power too large to fold) means too many items.
+            return max(0, math.ceil(trips)) if math.isfinite(trips) else max(0.0, trips)
+    return None
+
+
+def _call_name(node: ast.Call) -> str | None:
+    if isinstance(node.func, ast.Name):
+        return node.func.id
+    if isinstance(node.func, ast.Attribute):
+        return node.func.attr
+    return None
+
+
+def _loop_body_exits(loop: ast.While) -> bool:
+    """True when the loop body has a ``break`` or ``return`` that ends this loop."""
+    stack = list(loop.body)
+    while stack:
+        node = stack.pop()
+        if isinstance(node, ast.Break | ast.Return | ast.Raise):
+            return True
+        if isinstance(node, ast.For | ast.While | ast.FunctionDef | ast.Lambda):
+            # A break there ends the inner loop; a return still ends the function.
+            stack.extend(n for n in ast.walk(node) if isinstance(n, ast.Return | ast.Raise))
+            continue
+        stack.extend(ast.iter_child_nodes(node))
+    return False
+
+
+def _assigned_names(nodes: list[ast.stmt]) -> set[str]:
+    names = set()
+    for stmt in nodes:
+        for node in ast.walk(stmt):
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store | ast.Del):
+                names.add(node.id)
+            elif (
+                isinstance(node, ast.Call)
+                and isinstance(node.func, ast.Attribute)
+                and isinstance(node.func.value, ast.Name)
+            ):
+                # Mutating method calls such as ``items.pop()`` may change the condition.
+                names.add(node.func.value.id)
+    return names
+
+
+class _Checker(ast.NodeVisitor):
+    def __init__(self):
+        self.errors: list[str] = []
+        self.data_dependent = False
+
+    def error(self, node: ast.AST, message: str) -> None:
+        self.errors.append(f"line {node.lineno}: {message}")
+
+    def visit_Import(self, node: ast.Import) -> None:
+        for alias in node.names:
+            self._check_module(node, alias.name)
+
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
+        self._check_module(node, node.module or "")
+
+    def _check_module(self, node: ast.AST, module: str) -> None:
+        if module.split(".")[0] not in ALLOWED_MODULES:
+            allowed = ", ".join(sorted(ALLOWED_MODULES))
+            self.error(node, f"import of '{module}' is not allowed (available: {allowed})")
+
+    def visit_Attribute(self, node: ast.Attribute) -> None:
+        if node.attr.startswith("__") and node.attr.endswith("__"):
+            self.error(node, f"access to '{node.attr}' is not allowed")
+        self.generic_visit(node)
+
+    def visit_Call(self, node: ast.Call) -> None:
+        name = _call_name(node)
+        if isinstance(node.func, ast.Name) and name in FORBIDDEN_CALLS:
+            self.error(node, f"call to {name}() is not allowed")
+        if name in _ALLOCATORS and node.args:
+            self._check_allocation(node, node.args[0], f"{name}()")
+        if name in ("list", "tuple", "set", "sorted", "sum") and node.args:
+            size = _static_len(node.args[0])
+            if size is not None and size > MAX_ALLOCATION:
+                self.error(node, f"{name}() over {size:.0f} items is too large")
+        self.generic_visit(node)
+
+    def _check_allocation(self, node: ast.AST, shape: ast.expr, what: str) -> None:
+        dims = shape.elts if isinstance(shape, ast.Tuple | ast.List) else [shape]
+        sizes = [_fold(d) for d in dims]
+        if None in sizes:
+            return
+        size = math.prod(sizes)
+        if size > MAX_ALLOCATION:
+            self.error(node, f"{what} allocates {size:.3g} elements (limit {MAX_ALLOCATION:.0g})")
+
+    def visit_BinOp(self, node: ast.BinOp) -> None:
+        if isinstance(node.op, ast.Mult):
+            for seq, count in ((node.left, node.right), (node.right, node.left)):
+                if isinstance(seq, ast.List | ast.Tuple) or (
+                    isinstance(seq, ast.Constant) and isinstance(seq.value, str)
+                ):
+                    self._check_allocation(node, count, "sequence repetition")
+        if isinstance(node.op, ast.Pow):
+            base, exponent = _fold(node.left), _fold(node.right)
+            if (
+                isinstance(node.left, ast.Constant)
+                and isinstance(node.left.value, int)
+                and isinstance(node.right, ast.Constant)
+                and isinstance(node.right.value, int)
+                and abs(base) > 1
+                and exponent * math.log2(abs(base)) > MAX_INT_BITS
+            ):
+                self.error(node, "integer power is too large to compute")
+        self.generic_visit(node)
+
+    def visit_While(self, node: ast.While) -> None:
+        self.data_dependent = True
+        constant = isinstance(node.test, ast.Constant)
+        if constant and not node.test.value:
+            self.generic_visit(node)
+            return
+        if not _loop_body_exits(node):
+            if constant:
+                self.error(node, "'while True' loop never exits (no break or return)")
+            else:
+                tested = {n.id for n in ast.walk(node.test) if isinstance(n, ast.Name)}
+                if not tested & _assigned_names(node.body):
+                    self.error(node, "while loop condition never changes inside the loop")
+        self.generic_visit(node)
+
+
+def _iterations(stmts: list[ast.stmt]) -> float | None:
+    """Estimated loop iterations of a statement list, None when data-dependent."""
+    total = 0.0
+    for stmt in stmts:
+        if isinstance(stmt, ast.While):
+            return None
+        if isinstance(stmt, ast.For):
+            trips = _static_len(stmt.iter)
+            inner = _iterations(stmt.body + stmt.orelse)
+            if trips is None or inner is None:
+                return None
+            total += trips * (1 + inner)
+            continue
+        comprehension = 0.0
+        expressions = [c for c in ast.iter_child_nodes(stmt) if isinstance(c, ast.expr)]
+        for node in (n for e in expressions for n in ast.walk(e)):
+            if isinstance(node, ast.ListComp | ast.SetComp | ast.DictComp | ast.GeneratorExp):
+                trips = [_static_len(g.iter) for g in node.generators]
+                if None in trips:
+                    return None
+                comprehension += math.prod(trips)
+        total += comprehension
+        for body in ("body", "orelse", "finalbody"):
+            inner = getattr(stmt, body, None)
+            if isinstance(inner, list) and inner and isinstance(inner[0], ast.stmt):
+                nested = _iterations(inner)
+                if nested is None:
+                    return None
+                total += nested
+    return total
+
+
+def _functions(tree: ast.Module) -> dict[str, ast.FunctionDef]:
+    return {
+        node.name: node
+        for node in ast.walk(tree)
+        if isinstance(node, ast.FunctionDef | ast.AsyncFunctionDef)
+    }
+
+
+def _calls(fn: ast.AST, names: set[str]) -> set[str]:
+    return {
+        node.func.id
+        for node in ast.walk(fn)
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in names
+    }
+
+
+def _direct_call(node: ast.AST, targets: set[str]) -> ast.Call | None:
+    """A call to ``targets`` in ``node`` outside any conditional sub-expression."""
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in targets:
+        return node
+    if isinstance(node, ast.IfExp | ast.BoolOp | ast.Lambda | ast.comprehension):
+        return None
+    for child in ast.iter_child_nodes(node):
+        if (call := _direct_call(child, targets)) is not None:
+            return call
+    return None
+
+
+def _unconditional_call(fn: ast.FunctionDef, targets: set[str]) -> ast.Call | None:
+    """A call to ``targets`` reached on every path through ``fn``, if there is one."""
+    for stmt in fn.body:
+        if isinstance(stmt, ast.If | ast.For | ast.While | ast.Try | ast.With):
+            if any(isinstance(n, ast.Return | ast.Raise) for n in ast.walk(stmt)):
+                return None  # later statements only run on some paths
+            continue
+        if (call := _direct_call(stmt, targets)) is not None:
+            return call
+        if isinstance(stmt, ast.Return | ast.Raise):
+            return None
+    return None
+
+
+def _reach(graph: dict[str, set[str]], start: str) -> set[str]:
+    seen, stack = set(), list(graph[start])
+    while stack:
+        callee = stack.pop()
+        if callee not in seen:
+            seen.add(callee)
+            stack.extend(graph[callee])
+    return seen
+
+
+def _check_recursion(tree: ast.Module, checker: _Checker) -> None:
+    functions = _functions(tree)
+    graph = {name: _calls(fn, set(functions)) for name, fn in functions.items()}
+    reach = {name: _reach(graph, name) for name in graph}
+    for name, reachable in reach.items():
+        if name not in reachable:
+            continue
+        checker.data_dependent = True
+        cycle = {n for n in reachable if name in reach[n]}
+        call = _unconditional_call(functions[name], cycle)
+        if call is not None:
+            checker.error(call, f"'{name}' recurses unconditionally")
+
+
+def prescreen(func_code: str) -> PrescreenReport:
+    """Statically check descriptor code; ``report.errors`` is empty when it may run."""
+    # try-catch approved: code that does not parse is reported like any other static error
+    try:
+        tree = ast.parse(func_code)
+    except SyntaxError as e:
+        error = f"line {e.lineno}: SyntaxError: {e.msg}"
+        return PrescreenReport(errors=[error], cost_class="", iterations=None)
+
+    checker = _Checker()
+    checker.visit(tree)
+    functions = _functions(tree)
+    if "descriptor" not in functions:
+        checker.errors.append("no 'descriptor' function is defined")
+    _check_recursion(tree, checker)
+
+    iterations = _iterations(tree.body)
+    if iterations is not None and math.isnan(iterations):
+        # An unbounded loop nested with an empty one: unknown.
+        iterations = None
+    if iterations is not None and iterations > MAX_ITERATIONS:
+        first_loop = next(
+            n.iter if isinstance(n, ast.comprehension) else n
+            for n in ast.walk(tree)
+            if isinstance(n, ast.For | ast.comprehension)
+        )
+        checker.error(
+            first_loop,
+            f"loops run about {iterations:.3g} iterations per compound (limit {MAX_ITERATIONS:.0g})",
+        )
+
+    if checker.data_dependent or iterations is None:
+        cost_class, iterations = "data-dependent", None
+    elif iterations > HEAVY_ITERATIONS:
+        cost_class = "heavy"
+    elif iterations > 0:
+        cost_class = "bounded"
+    else:
+        cost_class = "constant"
+    return PrescreenReport(
+        errors=checker.errors,
+        cost_class=cost_class,
+        iterations=None if iterations is None or math.isinf(iterations) else int(iterations),
+    )
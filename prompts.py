@@ -47,7 +47,7 @@ Do NOT simply reproduce the Goldschmidt tolerance factor.
 Output ONLY the JSON, no other text.
 """.strip()
 
-IMPROVEMENT_PROMPT_TEMPLATE = """
+_IMPROVEMENT_CONTEXT = """
 {problem_desc}
 
 The previous descriptor was:
@@ -67,11 +67,29 @@ Analyze what the previous descriptor gets wrong:
 - Look at the overlap between perovskite and nonperovskite distributions
 - Consider which anion types (O, F, Cl, Br, I) have low accuracy
 - Think about what physical effects are missing
+""".strip()
+
+IMPROVEMENT_PROMPT_TEMPLATE = (
+    _IMPROVEMENT_CONTEXT
+    + """
 
 Propose an IMPROVED descriptor that addresses these weaknesses. Make a meaningful change to the functional form, not just parameter tweaking.
 
-Output ONLY the JSON, no other text.
-""".strip()
+Output ONLY the JSON, no other text."""
+)
+
+MULTI_IMPROVEMENT_PROMPT_TEMPLATE = (
+    _IMPROVEMENT_CONTEXT
+    + """
+
+Propose {k} IMPROVED descriptors that address these weaknesses. Make a meaningful change to the functional form, not just parameter tweaking, and make the {k} descriptors differ from each other in functional form or physical idea.
+
+Output a JSON object with one key, "proposals", holding a list of {k} objects in the format above:
+```json
+{{"proposals": [{{"function": "...", "explanation": "...", "formula": "..."}}, ...]}}
+```
+Output ONLY the JSON, no other text."""
+)
 
 DEBUG_PROMPT_TEMPLATE = """
 The following Python descriptor function crashed when executed on the dataset:
@@ -83,7 +101,7 @@ The following Python descriptor function crashed when executed on the dataset:
 Error message:
 ```
 {error}
-```
+```{failing_rows}
 
 Fix the function so it handles all valid inputs without errors.
 Constraints:
@@ -97,3 +115,9 @@ Constraints:
 
 Output ONLY the fixed Python function, no explanation.
 """.strip()
+
+DEBUG_FAILING_ROWS_TEMPLATE = """
+
+It fails on these compounds (inputs -> problem):
+{rows}
+""".rstrip()
@@ -1,19 +1,26 @@
 """LLM prompt construction for proposing and improving descriptor formulas."""
 
 import logging
+from collections.abc import Mapping
 from dataclasses import dataclass
 from pathlib import Path
 
+import numpy as np
+
+from evaluator import INPUT_COLUMNS
 from llm_client import LLMClient
 from prompts import (
     IMPROVEMENT_PROMPT_TEMPLATE,
     INITIAL_PROMPT_TEMPLATE,
+    MULTI_IMPROVEMENT_PROMPT_TEMPLATE,
     PROBLEM_DESCRIPTION,
     SYSTEM_PROMPT,
 )
+from sisso import enumerate_formulas
 
 log = logging.getLogger(__name__)
 
+
 @dataclass
 class Proposal:
     function: str
@@ -21,6 +28,9 @@ class Proposal:
     formula: str
 
 
+PROPOSAL_KEYS = ("function", "explanation", "formula")
+
+
 def _build_proposal(data: dict) -> Proposal:
     return Proposal(
         function=data["function"],
@@ -39,27 +49,111 @@ def propose_initial(client: LLMClient) -> Proposal:
     return _build_proposal(data)
 
 
-def propose_improvement(
+def _query_improvement(
     client: LLMClient,
+    template: str,
     parent_code: str,
     parent_formula: str,
     parent_explanation: str,
     metrics_summary: str,
     plot_image: Path,
-) -> Proposal:
-    prompt = IMPROVEMENT_PROMPT_TEMPLATE.format(
+    **fields,
+) -> dict:
+    prompt = template.format(
         problem_desc=PROBLEM_DESCRIPTION,
         parent_code=parent_code,
         parent_formula=parent_formula,
         parent_explanation=parent_explanation,
         metrics_summary=metrics_summary,
+        **fields,
     )
     messages = [
         {"role": "system", "content": SYSTEM_PROMPT},
         {"role": "user", "content": prompt},
     ]
     images = [plot_image] if plot_image.exists() else []
-    if plot_image.exists():
-        images.append(plot_image)
-    data = client.query_json(messages, images=images)
+    return client.query_json(messages, images=images)
+
+
+def propose_improvement(
+    client: LLMClient,
+    parent_code: str,
+    parent_formula: str,
+    parent_explanation: str,
+    metrics_summary: str,
+    plot_image: Path,
+) -> Proposal:
+    data = _query_improvement(
+        client,
+        IMPROVEMENT_PROMPT_TEMPLATE,
+        parent_code,
+        parent_formula,
+        parent_explanation,
+        metrics_summary,
+        plot_image,
+    )
     return _build_proposal(data)
+
+
+def propose_improvements(
+    client: LLMClient,
+    parent_code: str,
+    parent_formula: str,
+    parent_explanation: str,
+    metrics_summary: str,
+    plot_image: Path,
+    k: int,
+) -> list[Proposal]:
+    """Up to ``k`` diverse improvements of a parent from a single LLM call.
+
+    Entries of the response missing a key are dropped, so fewer than ``k`` may return.
+    """
+    data = _query_improvement(
+        client,
+        MULTI_IMPROVEMENT_PROMPT_TEMPLATE,
+        parent_code,
+        parent_formula,
+        parent_explanation,
+        metrics_summary,
+        plot_image,
+        k=k,
+    )
+    entries = data.get("proposals", []) if isinstance(data, dict) else []
+    proposals = [
+        _build_proposal(entry)
+        for entry in entries
+        if isinstance(entry, dict) and all(key in entry for key in PROPOSAL_KEYS)
+    ]
+    if len(proposals) < len(entries):
+        log.warning("Dropped %d malformed proposals", len(entries) - len(proposals))
+    return proposals[:k]
+
+
+def propose_enumerated(
+    inputs: Mapping[str, np.ndarray],
+    labels: np.ndarray,
+    train_mask: np.ndarray,
+    top_n: int,
+    **options,
+) -> list[Proposal]:
+    """Brute-force proposals without the LLM: the ``top_n`` enumerated formulas.
+
+    ``inputs`` are the features to build formulas from (descriptor inputs or feature
+    bank entries); ``options`` go to ``sisso.enumerate_formulas``.
+    """
+    formulas = enumerate_formulas(inputs, labels, train_mask, top_n=top_n, **options)
+    proposals = []
+    for f in formulas:
+        params = [*INPUT_COLUMNS, *(name for name in f.inputs if name not in INPUT_COLUMNS)]
+        function = (
+            f"def descriptor({', '.join(params)}):\n"
+            "    import numpy as np\n"
+            f"    return {f.formula}\n"
+        )
+        explanation = (
+            f"Brute-force enumeration: complexity {f.complexity}, "
+            f"train accuracy {f.train_accuracy:.1%}"
+        )
+        proposals.append(Proposal(function=function, explanation=explanation, formula=f.formula))
+    log.info("Enumerated %d proposals", len(proposals))
+    return proposals
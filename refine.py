@@ -0,0 +1,136 @@
+"""Tuning of the numeric constants in a descriptor without another LLM call.
+
+LLM proposals often contain exponents, weights and offsets that are close to, but
+not at, their best values. ``find_constants`` locates the numeric literals of the
+code, ``substitute`` writes new values in their place (keeping the rest of the
+source as written) and ``pattern_search`` tunes them with a derivative-free compass
+search, which suits the piecewise-constant accuracy objective.
+"""
+
+import ast
+import time
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+
+# Calls whose numeric arguments are counts or digits rather than tunable constants.
+_STRUCTURAL_CALLS = frozenset({"range", "round"})
+# Integers compared for equality or membership (``nA == 2``) select cases; they are
+# not tunable.
+_EQUALITY_OPS = (ast.Eq, ast.NotEq, ast.In, ast.NotIn)
+
+
+@dataclass(frozen=True)
+class Constant:
+    """A numeric literal and its position in the source (1-based line, byte columns)."""
+
+    value: float
+    lineno: int
+    col_offset: int
+    end_col_offset: int
+
+
+@dataclass
+class SearchResult:
+    values: list[float]
+    score: float | None
+    start_score: float | None
+    trials: int
+
+
+def _call_name(node: ast.Call) -> str:
+    func = node.func
+    return func.id if isinstance(func, ast.Name) else getattr(func, "attr", "")
+
+
+def find_constants(code: str) -> list[Constant]:
+    """The tunable numeric literals of ``code``, in source order.
+
+    Booleans, subscripts, the arguments of ``range``/``round`` and integers compared
+    with ``==``, ``!=``, ``in`` or ``not in`` are left alone.
+    """
+    tree = ast.parse(code)
+    skipped: set[int] = set()
+    for node in ast.walk(tree):
+        parts = []
+        if isinstance(node, ast.Subscript):
+            parts = [node.slice]
+        elif isinstance(node, ast.Call) and _call_name(node) in _STRUCTURAL_CALLS:
+            parts = [*node.args, *(k.value for k in node.keywords)]
+        for part in parts:
+            skipped.update(id(n) for n in ast.walk(part))
+        if isinstance(node, ast.Compare):
+            operands = [node.left, *node.comparators]
+            for i, operand in enumerate(operands):
+                ops = node.ops[max(i - 1, 0) : i + 1]
+                if any(isinstance(op, _EQUALITY_OPS) for op in ops):
+                    skipped.update(
+                        id(n)
+                        for n in ast.walk(operand)
+                        if isinstance(n, ast.Constant) and type(n.value) is int
+                    )
+
+    constants = []
+    for node in ast.walk(tree):
+        if (
+            isinstance(node, ast.Constant)
+            and type(node.value) in (int, float)
+            and id(node) not in skipped
+            and node.lineno == node.end_lineno
+        ):
+            constants.append(
+                Constant(float(node.value), node.lineno, node.col_offset, node.end_col_offset)
+            )
+    return sorted(constants, key=lambda c: (c.lineno, c.col_offset))
+
+
+def substitute(code: str, constants: Sequence[Constant], values: Sequence[float]) -> str:
+    """``code`` with each changed constant replaced by its new value."""
+    lines = code.splitlines(keepends=True)
+    changed = [(c, v) for c, v in zip(constants, values, strict=True) if v != c.value]
+    replacements = sorted(changed, key=lambda cv: (-cv[0].lineno, -cv[0].col_offset))
+    for constant, value in replacements:
+        # ast columns count UTF-8 bytes.
+        line = lines[constant.lineno - 1].encode()
+        text = format(value, ".8g").encode()
+        line = line[: constant.col_offset] + text + line[constant.end_col_offset :]
+        lines[constant.lineno - 1] = line.decode()
+    return "".join(lines)
+
+
+def pattern_search(
+    score: Callable[[list[float]], float | None],
+    start: Sequence[float],
+    *,
+    step: float = 0.25,
+    min_step: float = 1e-3,
+    max_trials: int = 200,
+    max_seconds: float = float("inf"),
+) -> SearchResult:
+    """Maximise ``score`` by moving one constant at a time.
+
+    Each constant is scaled by ``1 + step`` and ``1 - step`` (zero moves by ``step``);
+    the first strict improvement is kept, and ``step`` halves after a pass without
+    one. ``score`` returns None for values where the descriptor is unusable.
+    """
+    deadline = time.monotonic() + max_seconds
+    best = list(start)
+    best_score = start_score = score(best)
+    trials = 1
+    if best_score is None:
+        return SearchResult(best, None, None, trials)
+    while step >= min_step and trials < max_trials and time.monotonic() < deadline:
+        improved = False
+        for i in range(len(best)):
+            for sign in (1, -1):
+                trial = list(best)
+                trial[i] = best[i] * (1 + sign * step) if best[i] else sign * step
+                value = score(trial)
+                trials += 1
+                if value is not None and value > best_score:
+                    best, best_score, improved = trial, value, True
+                    break
+                if trials >= max_trials or time.monotonic() >= deadline:
+                    return SearchResult(best, best_score, start_score, trials)
+        if not improved:
+            step /= 2
+    return SearchResult(best, best_score, start_score, trials)
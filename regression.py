@@ -0,0 +1,97 @@
+"""Agreement of descriptors with DFT decomposition enthalpies (TableS2).
+
+Two numbers per candidate, as in Fig. 2D of Bartel et al.: how often the classifier
+learned on the ABX3 set agrees with the sign of dHdec (stable when positive), and the
+R² of a straight-line fit of dHdec against the descriptor within each anion family.
+The fits are closed-form weighted least squares over a whole batch of candidates, so
+scoring many candidates is a few matrix products.
+"""
+
+from collections.abc import Mapping, Sequence
+
+import numpy as np
+
+FAMILIES = {
+    "halides": ("F", "Cl", "Br", "I"),
+    "chalcogenides": ("O", "S", "Se", "Te"),
+}
+# Left out of the chalcogenide fit in the paper.
+EXCLUDED_FROM_FIT = ("CaZrO3", "CaHfO3")
+MIN_FIT_POINTS = 3
+
+
+def family_masks(
+    anions: Sequence[str], compounds: Sequence[str] | None = None
+) -> dict[str, np.ndarray]:
+    """Rows fitted for each family, without the compounds the paper excludes."""
+    anions = np.asarray(anions)
+    keep = np.ones(len(anions), dtype=bool)
+    if compounds is not None:
+        keep = ~np.isin(np.asarray(compounds), EXCLUDED_FROM_FIT)
+    return {name: np.isin(anions, members) & keep for name, members in FAMILIES.items()}
+
+
+def fit_lines(X: np.ndarray, y: np.ndarray, weights: np.ndarray) -> dict[str, np.ndarray]:
+    """Least-squares line ``y ~ slope * x + intercept`` for every row of ``X``.
+
+    ``weights`` (same shape as ``X``) selects the points of each fit. Returns arrays of
+    ``slope``, ``intercept``, ``r2`` and ``n``, NaN where a fit has fewer than
+    ``MIN_FIT_POINTS`` points or no spread.
+    """
+    w = weights.astype(np.float64)
+    X = np.where(w > 0, X, 0.0)
+    n = w.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_x = (w * X).sum(axis=1) / n
+        mean_y = (w @ y) / n
+        dx = X - mean_x[:, None]
+        dy = y[None, :] - mean_y[:, None]
+        sxx = (w * dx * dx).sum(axis=1)
+        syy = (w * dy * dy).sum(axis=1)
+        sxy = (w * dx * dy).sum(axis=1)
+        slope = sxy / sxx
+        r2 = sxy * sxy / (sxx * syy)
+    usable = (n >= MIN_FIT_POINTS) & (sxx > 0) & (syy > 0)
+    return {
+        "slope": np.where(usable, slope, np.nan),
+        "intercept": np.where(usable, mean_y - slope * mean_x, np.nan),
+        "r2": np.where(usable, r2, np.nan),
+        "n": n.astype(np.int64),
+    }
+
+
+def regression_scores(
+    values: np.ndarray,
+    preds: np.ndarray,
+    dhd: np.ndarray,
+    masks: Mapping[str, np.ndarray],
+) -> list[dict]:
+    """Sign agreement and per-family R² for each row of ``values``.
+
+    ``preds`` are the classifier's +1/-1 predictions on the same compounds. A compound
+    the descriptor is undefined on (NaN) counts as a disagreement and is left out of
+    the fits. ``reward`` averages the sign agreement and the family R² values.
+    """
+    values = np.atleast_2d(values)
+    preds = np.atleast_2d(preds)
+    finite = np.isfinite(values)
+    agree = finite & ((preds == 1) == (dhd > 0)[None, :])
+    sign_agreement = agree.mean(axis=1)
+    fits = {name: fit_lines(values, dhd, finite & mask[None, :]) for name, mask in masks.items()}
+
+    scores = []
+    for i in range(len(values)):
+        r2 = {name: float(fit["r2"][i]) for name, fit in fits.items()}
+        usable = [v for v in r2.values() if np.isfinite(v)]
+        parts = [float(sign_agreement[i]), *usable]
+        scores.append(
+            {
+                "sign_agreement": float(sign_agreement[i]),
+                "agree": int(agree[i].sum()),
+                "n": values.shape[1],
+                "r2": r2,
+                "slope": {name: float(fit["slope"][i]) for name, fit in fits.items()},
+                "reward": sum(parts) / len(parts),
+            }
+        )
+    return scores
@@ -7,15 +7,16 @@ from pathlib import Path
 
 import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
+
+from dataset_cache import load_table
 
 DATA_DIR = Path(__file__).parent.parent / "perovskite-stability"
 
 
 def load_data():
-    df = pd.read_csv(DATA_DIR / "TableS1.csv")
-    df.rename(columns={"rA (Ang)": "rA", "rB (Ang)": "rB", "rX (Ang)": "rX"}, inplace=True)
-    return df
+    return load_table(
+        DATA_DIR / "TableS1.csv", rename={"rA (Ang)": "rA", "rB (Ang)": "rB", "rX (Ang)": "rX"}
+    )
 
 
 def print_accuracy_metrics(df):
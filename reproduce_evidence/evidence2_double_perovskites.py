@@ -7,14 +7,14 @@ from pathlib import Path
 
 import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
+
+from dataset_cache import load_table
 
 DATA_DIR = Path(__file__).parent.parent / "perovskite-stability"
 
 
 def load_data():
-    df = pd.read_csv(DATA_DIR / "icsd_A2BBX6.csv")
-    return df
+    return load_table(DATA_DIR / "icsd_A2BBX6.csv")
 
 
 def print_accuracy_metrics(df):
@@ -7,9 +7,10 @@ from pathlib import Path
 
 import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
 from scipy import stats
 
+from dataset_cache import load_table
+
 DATA_DIR = Path(__file__).parent.parent / "perovskite-stability"
 
 ANION_STYLE = {
@@ -23,18 +24,16 @@ ANION_STYLE = {
 
 
 def load_data():
-    df = pd.read_csv(DATA_DIR / "TableS2.csv")
-    df.rename(
-        columns={
+    return load_table(
+        DATA_DIR / "TableS2.csv",
+        rename={
             "dHdec (meV/atom)": "dHd",
             "rA (Ang)": "rA",
             "rB1 (Ang)": "rB1",
             "rB2 (Ang)": "rB2",
             "rX (Ang)": "rX",
         },
-        inplace=True,
     )
-    return df
 
 
 def print_metrics(df):
@@ -1,18 +1,29 @@
 """Entry point for the MCTS formula search agent."""
 
 import logging
+import multiprocessing
 import os
 from datetime import datetime
 from pathlib import Path
 
 import hydra
+import pandas as pd
 from dotenv import load_dotenv
-from omegaconf import DictConfig
+from omegaconf import DictConfig, OmegaConf
 
-from evaluator import load_dataset
+from eval_cache import EvalCache
+from evaluator import (
+    load_dataset,
+    load_decomposition_enthalpies,
+    load_double_perovskites,
+    score_pairs,
+)
+from islands import MigrationChannel, merge_islands, run_island
 from llm_client import LLMClient
-from mcts import run_mcts
+from mcts import rescore_state, run_mcts
+from plotting import PlotRenderer, ensure_plot
 from state import SearchState
+from value_store import ValueStore
 
 log = logging.getLogger(__name__)
 
@@ -29,6 +40,16 @@ def _print_top_formulas(state: SearchState, k: int = 10) -> None:
         if per_anion:
             anion_str = ", ".join(f"{a}={v:.0%}" for a, v in per_anion.items())
             print(f"  Per-anion: {anion_str}")
+        charge_classes = node.metrics.get("group_metrics", {}).get("nA_nB", {})
+        if charge_classes:
+            class_str = ", ".join(f"{k}={g['accuracy']:.0%}" for k, g in charge_classes.items())
+            print(f"  Per (nA, nB): {class_str}")
+        gen = node.metrics.get("generalization")
+        if gen:
+            print(f"  A2BB'X6 accuracy: {gen['accuracy']:.1%} ({gen['n']} compounds)")
+        reg = node.metrics.get("regression")
+        if reg:
+            print(f"  dHdec sign agreement: {reg['sign_agreement']:.1%} ({reg['n']} compounds)")
         if node.formula:
             print(f"  Formula: {node.formula}")
         if node.description:
@@ -36,11 +57,193 @@ def _print_top_formulas(state: SearchState, k: int = 10) -> None:
         print(f"  Code:\n{_indent(node.code, 4)}")
 
 
+def _print_top_pairs(state: SearchState, df, cfg, shown: int = 5) -> None:
+    """Combine the top-k formulas pairwise as 2-D descriptors and print the best pairs."""
+    nodes = [n for n in state.top_k(cfg.eval.pair_top_k) if n.values_row >= 0]
+    if state.values is None or len(nodes) < 2:
+        return
+    results = score_pairs(
+        state.values.rows([n.values_row for n in nodes]),
+        df,
+        train_split_label=cfg.eval.train_split_label,
+    )
+    results.sort(key=lambda r: max(r["tree"]["accuracy"], r["linear"]["accuracy"]), reverse=True)
+    print("\n" + "=" * 70)
+    print(f"Best 2-D combinations of the top {len(nodes)} formulas")
+    print("=" * 70)
+    for r in results[:shown]:
+        first, second = (nodes[i] for i in r["pair"])
+        tree, linear = r["tree"], r["linear"]
+        print(
+            f"  {first.id} ({first.accuracy:.1%}) + {second.id} ({second.accuracy:.1%}): "
+            f"tree {tree['accuracy']:.1%} (test {tree['metrics']['test_accuracy']:.1%}), "
+            f"linear {linear['accuracy']:.1%} (test {linear['metrics']['test_accuracy']:.1%})"
+        )
+
+
 def _indent(text: str, spaces: int) -> str:
     prefix = " " * spaces
     return "\n".join(prefix + line for line in text.split("\n"))
 
 
+def _search(
+    cfg: DictConfig,
+    orig_cwd: str,
+    run_dir: Path,
+    state: SearchState,
+    api_key: str,
+    island: int | None = None,
+    channel: MigrationChannel | None = None,
+) -> tuple[SearchState, LLMClient, EvalCache | None, pd.DataFrame]:
+    """Load the data and run one search in ``run_dir``; with ``island``, as that island."""
+    data_path = Path(orig_cwd) / cfg.eval.data_path
+    plot_dir = run_dir / "plots"
+    state_save_path = run_dir / "search_state.json"
+
+    log.info("Run directory: %s", run_dir)
+    log.info("Budget: %d, Initial samples: %d", cfg.mcts.budget, cfg.mcts.initial_samples)
+
+    client = LLMClient(cfg, api_key)
+
+    df = load_dataset(str(data_path))
+    log.info("Loaded %d compounds from %s", len(df), data_path)
+
+    generalization = None
+    if cfg.eval.generalization_path:
+        generalization_path = Path(orig_cwd) / cfg.eval.generalization_path
+        generalization = load_double_perovskites(str(generalization_path))
+        log.info(
+            "Generalization set: %d compounds from %s", len(generalization), generalization_path
+        )
+
+    regression = None
+    if cfg.eval.regression_path:
+        regression_path = Path(orig_cwd) / cfg.eval.regression_path
+        regression = load_decomposition_enthalpies(str(regression_path))
+        log.info("Regression set: %d compounds from %s", len(regression), regression_path)
+
+    cache = None
+    if cfg.eval.cache_path:
+        cache = EvalCache(Path(orig_cwd) / cfg.eval.cache_path, cfg.eval.cache_max_entries)
+        log.info("Evaluation cache: %s (%d entries)", cache.path, len(cache))
+
+    renderer = PlotRenderer(cfg.eval.plot_mode, cfg.eval.plot_workers)
+    state.values = ValueStore(run_dir / "values", cfg.eval.value_dtype)
+
+    if cfg.search.resume and cfg.search.rescore:
+        rescore_state(
+            state,
+            df,
+            plot_dir,
+            cfg,
+            renderer=renderer,
+            generalization=generalization,
+            regression=regression,
+        )
+
+    kwargs = dict(
+        state_save_path=state_save_path,
+        cache=cache,
+        renderer=renderer,
+        generalization=generalization,
+        regression=regression,
+    )
+    if island is None:
+        state = run_mcts(client, state, df, plot_dir, cfg, **kwargs)
+    else:
+        state = run_island(
+            client, state, df, plot_dir, cfg, island=island, channel=channel, **kwargs
+        )
+    for node in state.top_k(10):
+        ensure_plot(node.plot_path, renderer)
+    renderer.close()
+    return state, client, cache, df
+
+
+def _island_main(island: int, config: dict, orig_cwd: str, run_dir: str, api_key: str) -> None:
+    """Process entry point of one island: its own seed, prompt variant and run directory."""
+    logging.basicConfig(
+        level=logging.INFO, format=f"[island {island}] %(asctime)s %(name)s: %(message)s"
+    )
+    cfg = OmegaConf.create(config)
+    if cfg.llm.seed is not None:
+        cfg.llm.seed += island
+    variants = cfg.islands.prompt_variants
+    if variants:
+        cfg.llm.system_suffix = variants[island % len(variants)]
+
+    island_dir = Path(run_dir) / f"island_{island}"
+    island_dir.mkdir(parents=True, exist_ok=True)
+    channel = MigrationChannel(Path(run_dir) / "migration.sqlite")
+    # try-catch approved: the channel connection must be closed however the search ends
+    try:
+        state, client, _, _ = _search(
+            cfg, orig_cwd, island_dir, SearchState(), api_key, island, channel
+        )
+    finally:
+        channel.close()
+    log.info(
+        "Island %d done: budget %d, best %.1f%%, LLM usage: %s",
+        island,
+        state.budget_used,
+        100 * state.top_k(1)[0].accuracy if state.nodes else 0.0,
+        client.usage_summary(),
+    )
+
+
+def _run_islands(cfg: DictConfig, orig_cwd: str, run_dir: Path, api_key: str) -> None:
+    """Run ``islands.count`` searches in separate processes and report them merged."""
+    count = cfg.islands.count
+    if cfg.eval.workers is None:
+        # Share the cores between the islands' sandbox pools.
+        cfg.eval.workers = max(1, (os.cpu_count() or 1) // count)
+    config = OmegaConf.to_container(cfg, resolve=True)
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(
+            target=_island_main,
+            args=(i, config, orig_cwd, str(run_dir), api_key),
+            name=f"island-{i}",
+        )
+        for i in range(count)
+    ]
+    log.info("Starting %d islands in %s", count, run_dir)
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    failed = [p.name for p in processes if p.exitcode != 0]
+    if failed:
+        log.warning("Islands failed: %s", ", ".join(failed))
+
+    states = []
+    for i in range(count):
+        island_dir = run_dir / f"island_{i}"
+        state_file = island_dir / "search_state.json"
+        if not state_file.exists():
+            states.append(SearchState())
+            continue
+        state = SearchState.load(state_file)
+        state.values = ValueStore(island_dir / "values", cfg.eval.value_dtype)
+        states.append(state)
+    merged = merge_islands(states, ValueStore(run_dir / "values", cfg.eval.value_dtype))
+    merged_path = run_dir / "merged_state.json"
+    merged.save(merged_path)
+
+    _print_top_formulas(merged)
+    if cfg.eval.pair_top_k:
+        df = load_dataset(str(Path(orig_cwd) / cfg.eval.data_path))
+        _print_top_pairs(merged, df, cfg)
+
+    print(f"\nIsland search complete. {len(merged.nodes)} nodes from {count} islands")
+    for i, state in enumerate(states):
+        print(
+            f"  Island {i}: budget {state.budget_used}/{cfg.mcts.budget}, "
+            f"LLM calls {state.total_llm_calls} (debug: {state.debug_calls})"
+        )
+    print(f"Merged state saved to: {merged_path}")
+
+
 @hydra.main(config_path="conf", config_name="config", version_base=None)
 def main(cfg: DictConfig) -> None:
     load_dotenv()
@@ -50,10 +253,11 @@ def main(cfg: DictConfig) -> None:
         raise SystemExit("Set OPENAI_API_KEY in your .env file")
 
     orig_cwd = hydra.utils.get_original_cwd()
-    data_path = Path(orig_cwd) / cfg.eval.data_path
 
     run_dir = Path(orig_cwd) / cfg.search.state_path
     if cfg.search.resume:
+        if cfg.islands.count > 1:
+            raise SystemExit("search.resume does not support islands.count > 1")
         state_file = Path(orig_cwd) / cfg.search.resume
         state = SearchState.load(state_file)
         run_dir = state_file.parent
@@ -62,25 +266,24 @@ def main(cfg: DictConfig) -> None:
         run_dir.mkdir(parents=True, exist_ok=True)
         state = SearchState()
 
-    plot_dir = run_dir / "plots"
-    state_save_path = run_dir / "search_state.json"
-
-    log.info("Run directory: %s", run_dir)
-    log.info("Budget: %d, Initial samples: %d", cfg.mcts.budget, cfg.mcts.initial_samples)
-
-    client = LLMClient(cfg, api_key)
-
-    df = load_dataset(str(data_path))
-    log.info("Loaded %d compounds from %s", len(df), data_path)
+    if cfg.islands.count > 1:
+        _run_islands(cfg, orig_cwd, run_dir, api_key)
+        return
 
-    state = run_mcts(client, state, df, plot_dir, cfg, state_save_path=state_save_path)
+    state, client, cache, df = _search(cfg, orig_cwd, run_dir, state, api_key)
 
     _print_top_formulas(state)
+    if cfg.eval.pair_top_k:
+        _print_top_pairs(state, df, cfg)
 
     print(f"\nSearch complete. Budget used: {state.budget_used}/{cfg.mcts.budget}")
     print(f"Total LLM calls: {state.total_llm_calls} (debug: {state.debug_calls})")
     print(f"LLM usage: {client.usage_summary()}")
-    print(f"State saved to: {state_save_path}")
+    if state.utilization:
+        print(f"Pipeline utilization: {state.utilization}")
+    if cache is not None:
+        print(f"Eval cache: {cache.stats()}")
+    print(f"State saved to: {run_dir / 'search_state.json'}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,221 @@
+"""Pre-forked worker processes for running untrusted descriptor code.
+
+The dataset columns are copied once into a shared-memory block that every worker
+attaches to, so starting or replacing a worker never re-sends the data. A worker
+that misses its deadline is killed and replaced instead of being left running.
+"""
+
+import atexit
+import contextlib
+import logging
+import multiprocessing as mp
+import pickle
+import queue
+import signal
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+_ALIGN = 64
+
+
+@dataclass(frozen=True)
+class _ColumnSpec:
+    name: str
+    dtype: str
+    length: int
+    offset: int
+
+
+def _share_columns(
+    columns: dict[str, np.ndarray],
+) -> tuple[shared_memory.SharedMemory, list[_ColumnSpec]]:
+    specs = []
+    offset = 0
+    for name, arr in columns.items():
+        arr = np.ascontiguousarray(arr)
+        specs.append(_ColumnSpec(name, arr.dtype.str, len(arr), offset))
+        offset += -(-arr.nbytes // _ALIGN) * _ALIGN
+    shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for spec, arr in zip(specs, columns.values(), strict=True):
+        view = np.ndarray(spec.length, dtype=spec.dtype, buffer=shm.buf, offset=spec.offset)
+        view[:] = arr
+    return shm, specs
+
+
+def _attach_columns(
+    shm_name: str, specs: list[_ColumnSpec]
+) -> tuple[shared_memory.SharedMemory, dict[str, np.ndarray]]:
+    shm = shared_memory.SharedMemory(name=shm_name)
+    columns = {}
+    for spec in specs:
+        view = np.ndarray(spec.length, dtype=spec.dtype, buffer=shm.buf, offset=spec.offset)
+        view.flags.writeable = False
+        columns[spec.name] = view
+    return shm, columns
+
+
+def _picklable_error(e: BaseException) -> BaseException:
+    # try-catch approved: exceptions raised by exec'd code may not survive pickling
+    try:
+        pickle.loads(pickle.dumps(e))
+        return e
+    except Exception:
+        return RuntimeError(f"{type(e).__name__}: {e}")
+
+
+def _worker_main(conn, shm_name: str, specs: list[_ColumnSpec], setup, task) -> None:
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _shm, columns = _attach_columns(shm_name, specs)
+    context = setup(columns) if setup is not None else columns
+    while True:
+        # try-catch approved: the driver closing its end of the pipe shuts the worker down
+        try:
+            payload = conn.recv()
+        except EOFError:
+            break
+        if payload is None:
+            break
+        # try-catch approved: task runs untrusted code, errors go back to the driver
+        try:
+            reply = (True, task(context, payload))
+        except Exception as e:
+            reply = (False, _picklable_error(e))
+        conn.send(reply)
+
+
+class _Worker:
+    def __init__(self, ctx, shm_name: str, specs: list[_ColumnSpec], setup, task):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, shm_name, specs, setup, task),
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self) -> None:
+        # the worker may already be gone
+        with contextlib.suppress(BrokenPipeError, OSError):
+            self.conn.send(None)
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class DescriptorSandbox:
+    """A fixed pool of worker processes sharing one read-only copy of the dataset.
+
+    ``setup(columns)`` runs once in every worker to build per-worker state from the
+    shared columns; ``task(state, payload)`` runs for each submitted payload. Both
+    must be module-level functions. ``run`` may be called from several threads.
+    """
+
+    def __init__(
+        self,
+        columns: dict[str, np.ndarray],
+        task: Callable,
+        *,
+        setup: Callable | None = None,
+        workers: int = 1,
+    ):
+        methods = mp.get_all_start_methods()
+        self._ctx = mp.get_context("fork" if "fork" in methods else "spawn")
+        self._shm, self._specs = _share_columns(columns)
+        self._setup = setup
+        self._task = task
+        self._idle: queue.SimpleQueue[_Worker] = queue.SimpleQueue()
+        self._workers: list[_Worker] = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self.replaced = 0
+        for _ in range(workers):
+            self._idle.put(self._spawn())
+        atexit.register(self.close)
+
+    @property
+    def size(self) -> int:
+        return len(self._workers)
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self._ctx, self._shm.name, self._specs, self._setup, self._task)
+        with self._lock:
+            self._workers.append(worker)
+        return worker
+
+    def _replace(self, worker: _Worker) -> _Worker:
+        worker.kill()
+        with self._lock:
+            self._workers.remove(worker)
+            self.replaced += 1
+        return self._spawn()
+
+    def grow(self, workers: int) -> None:
+        """Add workers until the pool has at least ``workers`` processes."""
+        for _ in range(workers - self.size):
+            self._idle.put(self._spawn())
+
+    def run(self, payload, timeout: float):
+        """Run ``task`` on one idle worker; raise TimeoutError if it misses the deadline."""
+        worker = self._idle.get()
+        # try-catch approved: the worker, or its replacement, must go back to the idle queue
+        try:
+            # try-catch approved: a dead worker is replaced and reported as a RuntimeError
+            try:
+                worker.conn.send(payload)
+                finished = worker.conn.poll(timeout)
+                reply = worker.conn.recv() if finished else None
+            except (EOFError, OSError) as e:
+                worker = self._replace(worker)
+                raise RuntimeError("descriptor worker exited unexpectedly") from e
+            if not finished:
+                log.warning("Sandbox worker %d timed out, replacing it", worker.process.pid)
+                worker = self._replace(worker)
+                raise TimeoutError(f"descriptor timed out after {timeout}s")
+        finally:
+            self._idle.put(worker)
+        ok, value = reply
+        if not ok:
+            raise value
+        return value
+
+    def map(self, payloads: list, timeout: float) -> list:
+        """Run ``task`` on every payload across the pool, returning results in input order.
+
+        A payload that raises or times out yields its exception instead of a result,
+        so one bad payload never affects the others.
+        """
+
+        def _run_one(payload):
+            # try-catch approved: per-payload failures are returned, not raised
+            try:
+                return self.run(payload, timeout)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=max(self.size, 1)) as pool:
+            return list(pool.map(_run_one, payloads))
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        for worker in self._workers:
+            worker.stop()
+        self._workers.clear()
+        self._shm.close()
+        self._shm.unlink()
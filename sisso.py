@@ -0,0 +1,268 @@
+"""Brute-force enumeration of descriptor formulas, in the spirit of SISSO.
+
+Formulas are operator trees over the input features, built level by level: a formula
+of complexity k applies a unary operator to one of complexity k - 1, or a binary
+operator to two whose complexities sum to k - 1. Levels below the target complexity
+are kept in memory, each screened down to its ``subspace_size`` most accurate
+features (SISSO's SIS step). The last level is never held whole: it is streamed in
+blocks of at most ``chunk_elements`` values, each block scored by the batched
+threshold search of ``splits`` and reduced to its best ``top_n``. Blocks are spread
+over ``DescriptorSandbox`` worker processes that share the stored levels.
+"""
+
+import hashlib
+import logging
+import re
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+
+import numpy as np
+
+from evaluator import rank_fingerprint
+from sandbox import DescriptorSandbox
+from splits import fit_splits
+
+log = logging.getLogger(__name__)
+
+# name: (expression template, function); composite expressions keep outer parentheses.
+UNARY = {
+    "inv": ("(1 / {})", np.reciprocal),
+    "sq": ("({} ** 2)", np.square),
+    "sqrt": ("np.sqrt({})", np.sqrt),
+    "log": ("np.log({})", np.log),
+    "exp": ("np.exp({})", np.exp),
+}
+# name: (expression template, function, symmetric). ``b - a`` only reverses the order
+# of ``a - b``, which a threshold classifier does not see, so both count as symmetric.
+BINARY = {
+    "+": ("({} + {})", np.add, True),
+    "-": ("({} - {})", np.subtract, True),
+    "*": ("({} * {})", np.multiply, True),
+    "/": ("({} / {})", np.divide, False),
+}
+OPERATORS = (*UNARY, *BINARY)
+
+# Larger magnitudes overflow the float32 threshold search.
+MAX_MAGNITUDE = 1e30
+
+
+@dataclass
+class EnumeratedFormula:
+    formula: str
+    complexity: int
+    train_accuracy: float
+    inputs: tuple[str, ...]
+
+
+def _bare(expression: str) -> str:
+    return expression[1:-1] if expression.startswith("(") else expression
+
+
+def _expression(op: str, left: str, right: str | None = None) -> str:
+    if op in UNARY:
+        template = UNARY[op][0]
+        return template.format(_bare(left) if template.startswith("np.") else left)
+    return BINARY[op][0].format(left, right)
+
+
+def _apply(op: str, left: np.ndarray, right: np.ndarray | None = None) -> np.ndarray:
+    with np.errstate(all="ignore"):
+        if op in UNARY:
+            return UNARY[op][1](left)
+        return BINARY[op][1](left, right)
+
+
+def _value_key(values: np.ndarray) -> str:
+    return hashlib.blake2b(values.astype(np.float32).tobytes(), digest_size=16).hexdigest()
+
+
+def _enumerate_setup(columns: dict[str, np.ndarray]) -> dict:
+    n = len(columns["labels"])
+    sizes = columns["sizes"]
+    return {
+        "levels": [columns[f"level{k}"].reshape(sizes[k], n) for k in range(len(sizes))],
+        "labels": columns["labels"],
+        "train": columns["train"],
+    }
+
+
+def _enumerate_task(context: dict, payload: tuple) -> list[tuple]:
+    """Score one block of a level and return its best ``top_n`` candidates.
+
+    ``op`` None scores the level's own features. Returns (train accuracy, left index,
+    right index, key) tuples; ``key`` is the rank fingerprint with ``by_rank``, else a
+    hash of the values.
+    """
+    op, left_level, right_level, start, stop, top_n, max_depth, by_rank = payload
+    levels = context["levels"]
+    left = levels[left_level][start:stop]
+    if op is None or op in UNARY:
+        values = left if op is None else _apply(op, left)
+        lefts = np.arange(start, stop)
+        rights = np.full(len(lefts), -1)
+    else:
+        right = levels[right_level]
+        values = _apply(op, left[:, None, :], right[None, :, :]).reshape(-1, left.shape[1])
+        lefts, rights = np.divmod(np.arange(len(values)), len(right))
+        lefts += start
+        if left_level == right_level:
+            keep = rights > lefts if BINARY[op][2] else rights != lefts
+            values, lefts, rights = values[keep], lefts[keep], rights[keep]
+
+    train = context["train"]
+    usable = (np.abs(values) < MAX_MAGNITUDE).all(axis=1)
+    usable &= values[:, train].max(axis=1, initial=-np.inf) > values[:, train].min(axis=1)
+    values, lefts, rights = values[usable], lefts[usable], rights[usable]
+    if not len(values):
+        return []
+    _, accuracies = fit_splits(values[:, train], context["labels"][train], max_depth)
+
+    best = []
+    seen = set()
+    for i in np.argsort(-accuracies, kind="stable"):
+        key = rank_fingerprint(values[i], fold_reversed=True) if by_rank else _value_key(values[i])
+        if key not in seen:
+            seen.add(key)
+            best.append((float(accuracies[i]), int(lefts[i]), int(rights[i]), key))
+            if len(best) == top_n:
+                break
+    return best
+
+
+def _level_payloads(
+    level: int, sizes: list[int], n: int, chunk_elements: int, operators: Sequence[str]
+) -> list[tuple]:
+    """(op, left level, right level, start, stop) blocks covering one level."""
+    blocks = []
+    for op in operators:
+        if op in UNARY:
+            pairs = [(level - 1, None)]
+        else:
+            pairs = [(i, level - 1 - i) for i in range(level)]
+            if BINARY[op][2]:
+                pairs = [(i, j) for i, j in pairs if i <= j]
+        for left, right in pairs:
+            width = sizes[right] if right is not None else 1
+            rows = max(1, chunk_elements // max(width * n, 1))
+            for start in range(0, sizes[left], rows):
+                blocks.append((op, left, right, start, min(start + rows, sizes[left])))
+    return blocks
+
+
+class _Runner:
+    """Runs level blocks in-process or on a pool sharing the stored levels."""
+
+    def __init__(self, levels, labels, train, workers: int):
+        columns = {
+            "labels": labels,
+            "train": train,
+            "sizes": np.array([len(level) for level in levels], dtype=np.int64),
+            **{f"level{k}": level.ravel() for k, level in enumerate(levels)},
+        }
+        self._sandbox = None
+        if workers > 1:
+            self._sandbox = DescriptorSandbox(
+                columns, _enumerate_task, setup=_enumerate_setup, workers=workers
+            )
+        else:
+            self._context = _enumerate_setup(columns)
+
+    def map(self, payloads: list[tuple]) -> list[list[tuple]]:
+        if self._sandbox is None:
+            return [_enumerate_task(self._context, p) for p in payloads]
+        results = self._sandbox.map(payloads, timeout=None)
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return results
+
+    def close(self) -> None:
+        if self._sandbox is not None:
+            self._sandbox.close()
+
+
+def enumerate_formulas(
+    inputs: Mapping[str, np.ndarray],
+    labels: np.ndarray,
+    train_mask: np.ndarray,
+    *,
+    complexity: int = 3,
+    top_n: int = 20,
+    subspace_size: int = 2000,
+    chunk_elements: int = 1 << 22,
+    max_depth: int = 2,
+    operators: Sequence[str] = OPERATORS,
+    workers: int = 1,
+) -> list[EnumeratedFormula]:
+    """The ``top_n`` formulas of up to ``complexity`` operators by training accuracy.
+
+    ``inputs`` maps feature names (the descriptor inputs, or any feature bank entry)
+    to their values on every compound; formulas undefined on any compound are skipped.
+    Formulas are ranked by the training accuracy of the depth-``max_depth`` tree, and
+    rank-equivalent formulas (e.g. ``x`` and ``np.log(x)``) are reported once.
+    """
+    names = list(inputs)
+    base = np.stack([np.asarray(inputs[name], dtype=np.float64) for name in names])
+    labels = np.asarray(labels)
+    train = np.asarray(train_mask, dtype=bool)
+    n = base.shape[1]
+    levels = [base]
+    expressions = [names]
+
+    context = {"levels": levels, "labels": labels, "train": train}
+    own = _enumerate_task(context, (None, 0, None, 0, len(base), len(base), max_depth, True))
+    # (train accuracy, complexity, expression, rank fingerprint)
+    scored = [(accuracy, 0, names[i], key) for accuracy, i, _, key in own]
+
+    for level in range(1, complexity + 1):
+        last = level == complexity
+        keep = top_n if last else subspace_size
+        blocks = _level_payloads(level, [len(v) for v in levels], n, chunk_elements, operators)
+        runner = _Runner(levels, labels, train, workers)
+        # try-catch approved: worker processes must be stopped even if a block fails
+        try:
+            results = runner.map([(*block, keep, max_depth, last) for block in blocks])
+        finally:
+            runner.close()
+        log.info("Complexity %d: scored %d blocks", level, len(blocks))
+
+        found = [
+            (accuracy, block[:3], left, right, key)
+            for block, block_found in zip(blocks, results, strict=True)
+            for accuracy, left, right, key in block_found
+        ]
+        found.sort(key=lambda f: -f[0])
+        kept_values = []
+        kept_expressions = []
+        seen = set()
+        for accuracy, (op, left_level, right_level), left, right, key in found:
+            if key in seen:
+                continue
+            seen.add(key)
+            right_expression = expressions[right_level][right] if right_level is not None else None
+            expression = _expression(op, expressions[left_level][left], right_expression)
+            if not last:
+                right_values = levels[right_level][right] if right_level is not None else None
+                values = _apply(op, levels[left_level][left], right_values)
+                kept_values.append(values)
+                kept_expressions.append(expression)
+                key = rank_fingerprint(values, fold_reversed=True)
+            scored.append((accuracy, level, expression, key))
+            if len(seen) == keep:
+                break
+        if not last:
+            levels.append(np.stack(kept_values) if kept_values else np.empty((0, n)))
+            expressions.append(kept_expressions)
+
+    formulas = []
+    seen = set()
+    # Stable sort: at equal accuracy the simpler formula wins.
+    for accuracy, level, expression, key in sorted(scored, key=lambda s: -s[0]):
+        if key in seen:
+            continue
+        seen.add(key)
+        used = tuple(name for name in names if re.search(rf"\b{re.escape(name)}\b", expression))
+        formulas.append(EnumeratedFormula(_bare(expression), level, accuracy, used))
+        if len(formulas) == top_n:
+            break
+    return formulas
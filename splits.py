@@ -0,0 +1,198 @@
+"""Threshold search for one-dimensional descriptors.
+
+A depth-limited decision tree on a single feature is a search over cut positions in
+the sorted values. Sorting once and taking prefix sums of the class counts makes
+every candidate cut O(1), and the search is batched over the rows of a 2-D matrix
+so many descriptors are fitted at once.
+
+``fit_splits`` reproduces sklearn's ``DecisionTreeClassifier`` (Gini, best splitter)
+exactly: values are cast to float32, cuts between values closer than
+``FEATURE_THRESHOLD`` are skipped, thresholds are midpoints and ties go to the first
+cut and to the lowest class. ``fit_intervals`` instead finds the accuracy-optimal
+one-threshold or interval rule.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+FEATURE_THRESHOLD = 1e-7
+
+# Bound on the (rows, segments, positions, classes) work array per chunk.
+_MAX_CHUNK_ELEMENTS = 1 << 22
+
+
+@dataclass
+class SplitRule:
+    """Piecewise-constant classifier on one feature.
+
+    ``leaf_labels[i]`` is the class predicted for values in the i-th interval cut by
+    the sorted ``thresholds``; a value equal to a threshold falls in the lower interval.
+    """
+
+    thresholds: np.ndarray
+    leaf_labels: np.ndarray
+
+    def predict(self, values: np.ndarray) -> np.ndarray:
+        values = np.asarray(values, dtype=np.float32)
+        return self.leaf_labels[np.searchsorted(self.thresholds, values, side="left")]
+
+
+def _as_float32(X: np.ndarray) -> np.ndarray:
+    X32 = np.asarray(X, dtype=np.float64).astype(np.float32)
+    if not np.isfinite(X32).all():
+        raise ValueError("Input contains NaN, infinity or a value too large for dtype('float32').")
+    return X32
+
+
+def _sorted_prefix(X32: np.ndarray, y_enc: np.ndarray, n_classes: int):
+    """Sort each row and return sorted values, class prefix counts and valid cuts."""
+    m, n = X32.shape
+    order = np.argsort(X32, axis=1, kind="stable")
+    xs = np.take_along_axis(X32, order, axis=1).astype(np.float64)
+    onehot = np.eye(n_classes)[y_enc]
+    counts = np.zeros((m, n + 1, n_classes))
+    np.cumsum(onehot[order], axis=1, out=counts[:, 1:])
+
+    valid = np.zeros((m, n + 1), dtype=bool)
+    valid[:, 1:n] = xs[:, 1:] > xs[:, :-1] + FEATURE_THRESHOLD
+
+    thresholds = np.zeros((m, n + 1))
+    mid = xs[:, :-1] / 2.0 + xs[:, 1:] / 2.0
+    thresholds[:, 1:n] = np.where(mid == xs[:, 1:], xs[:, :-1], mid)
+    return counts, valid, thresholds
+
+
+def _fit_chunk(X32: np.ndarray, y_enc: np.ndarray, n_classes: int, max_depth: int):
+    m, n = X32.shape
+    counts, valid, cut_thresholds = _sorted_prefix(X32, y_enc, n_classes)
+    rows = np.arange(m)[:, None]
+    positions = np.arange(1, n)
+
+    lo = np.zeros((m, 1), dtype=np.int64)
+    hi = np.full((m, 1), n, dtype=np.int64)
+    alive = np.ones((m, 1), dtype=bool)
+    split_thresholds = []
+
+    for _depth in range(max_depth):
+        node = counts[rows, hi] - counts[rows, lo]
+        impure = (node > 0).sum(axis=-1) > 1
+        candidate = valid[:, None, 1:n] & (positions > lo[..., None]) & (positions < hi[..., None])
+        left = counts[:, None, 1:n] - counts[rows, lo][:, :, None]
+        right = counts[rows, hi][:, :, None] - counts[:, None, 1:n]
+        w_left = left.sum(axis=-1)
+        w_right = right.sum(axis=-1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            impurity_left = 1.0 - (left**2).sum(axis=-1) / (w_left * w_left)
+            impurity_right = 1.0 - (right**2).sum(axis=-1) / (w_right * w_right)
+            proxy = -w_right * impurity_right - w_left * impurity_left
+        proxy = np.where(candidate, proxy, -np.inf)
+
+        best = positions[np.argmax(proxy, axis=-1)]
+        split = alive & impure & candidate.any(axis=-1)
+        split_thresholds.append(np.where(split, cut_thresholds[rows, best], np.nan))
+
+        cut = np.where(split, best, hi)
+        lo = np.stack([lo, cut], axis=-1).reshape(m, -1)
+        hi = np.stack([cut, hi], axis=-1).reshape(m, -1)
+        alive = np.stack([split, split], axis=-1).reshape(m, -1)
+
+    leaf_counts = counts[rows, hi] - counts[rows, lo]
+    nonempty = hi > lo
+    leaf_classes = np.argmax(leaf_counts, axis=-1)
+    train_correct = np.where(nonempty, leaf_counts.max(axis=-1), 0).sum(axis=-1)
+
+    all_thresholds = np.concatenate(split_thresholds, axis=1) if split_thresholds else None
+    fitted = []
+    for r in range(m):
+        thresholds = np.empty(0)
+        if all_thresholds is not None:
+            row = all_thresholds[r]
+            thresholds = np.sort(row[~np.isnan(row)])
+        fitted.append((thresholds, leaf_classes[r][nonempty[r]]))
+    return fitted, train_correct / n
+
+
+def fit_splits(X: np.ndarray, y: np.ndarray, max_depth: int) -> tuple[list[SplitRule], np.ndarray]:
+    """Fit a Gini decision tree of depth ``max_depth`` to every row of ``X``.
+
+    ``X`` has shape (n_descriptors, n_samples) and ``y`` holds the n_samples labels.
+    Returns one rule per row and the training accuracy of each rule.
+    """
+    X32 = _as_float32(np.atleast_2d(X))
+    classes, y_enc = np.unique(y, return_inverse=True)
+    m, n = X32.shape
+    segments = 1 << max(max_depth - 1, 0)
+    chunk = max(1, _MAX_CHUNK_ELEMENTS // max(n * len(classes) * segments, 1))
+
+    rules = []
+    accuracies = np.empty(m)
+    for start in range(0, m, chunk):
+        fitted, acc = _fit_chunk(X32[start : start + chunk], y_enc, len(classes), max_depth)
+        rules.extend(SplitRule(t, classes[leaves]) for t, leaves in fitted)
+        accuracies[start : start + chunk] = acc
+    return rules, accuracies
+
+
+def fit_split(values: np.ndarray, labels: np.ndarray, max_depth: int) -> SplitRule:
+    """Fit a single descriptor; see ``fit_splits``."""
+    rules, _ = fit_splits(np.asarray(values).reshape(1, -1), labels, max_depth)
+    return rules[0]
+
+
+def fit_intervals(
+    X: np.ndarray, y: np.ndarray, positive=1, negative=-1
+) -> tuple[list[SplitRule], np.ndarray]:
+    """Find the training-accuracy-optimal interval rule for every row of ``X``.
+
+    The rule predicts one class inside an interval of the sorted values and the other
+    class outside it; single-threshold and constant rules are the special cases where
+    the interval touches an end. With D the prefix sum of (+1 for ``positive``, -1
+    otherwise) over the sorted labels, positives-inside scores ``N + D[j] - D[i]`` for
+    cuts i <= j, so a running minimum gives the optimum in O(n) per row.
+    """
+    X32 = _as_float32(np.atleast_2d(X))
+    y_enc = (np.asarray(y) == positive).astype(np.int64)
+    m, n = X32.shape
+
+    counts, valid, cut_thresholds = _sorted_prefix(X32, y_enc, 2)
+    valid[:, 0] = valid[:, n] = True
+    d = counts[..., 1] - counts[..., 0]
+    n_pos = counts[:, n, 1]
+    n_neg = counts[:, n, 0]
+    rows = np.arange(m)
+
+    # Cuts that split equal values are unusable: give them neutral running extremes.
+    d_min = np.where(valid, d, np.inf)
+    d_max = np.where(valid, d, -np.inf)
+    run_min = np.minimum.accumulate(d_min, axis=1)
+    run_max = np.maximum.accumulate(d_max, axis=1)
+    arg_min = np.maximum.accumulate(np.where(d_min == run_min, np.arange(n + 1), 0), axis=1)
+    arg_max = np.maximum.accumulate(np.where(d_max == run_max, np.arange(n + 1), 0), axis=1)
+
+    inside_pos = np.where(valid, n_neg[:, None] + d - run_min, -np.inf)
+    inside_neg = np.where(valid, n_pos[:, None] - d + run_max, -np.inf)
+    j_pos = np.argmax(inside_pos, axis=1)
+    j_neg = np.argmax(inside_neg, axis=1)
+    best_pos = inside_pos[rows, j_pos]
+    best_neg = inside_neg[rows, j_neg]
+
+    use_pos = best_pos >= best_neg
+    j = np.where(use_pos, j_pos, j_neg)
+    i = np.where(use_pos, arg_min[rows, j_pos], arg_max[rows, j_neg])
+    correct = np.where(use_pos, best_pos, best_neg)
+
+    rules = []
+    for r in range(m):
+        inside, outside = (positive, negative) if use_pos[r] else (negative, positive)
+        cuts = [c for c in (i[r], j[r]) if 0 < c < n]
+        labels = [outside] * (len(cuts) + 1)
+        if i[r] > 0:
+            labels[1] = inside
+        else:
+            labels[0] = inside
+        if i[r] == j[r] or (i[r] == 0 and j[r] == n):
+            cuts, labels = [], [inside if i[r] == 0 and j[r] == n else outside]
+        thresholds = cut_thresholds[r, cuts] if cuts else np.empty(0)
+        rules.append(SplitRule(np.asarray(thresholds, dtype=np.float64), np.asarray(labels)))
+    return rules, correct / n
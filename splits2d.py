@@ -0,0 +1,275 @@
+"""Classifiers on a pair of descriptors: a depth-2 axis-aligned tree and a line.
+
+Both maximise training accuracy with sorted sweeps, batched over many pairs. For the
+tree, a 2-D prefix sum of the signed labels (+1 positive, -1 otherwise) over the
+ranks in both descriptors gives the label balance below any cut in either axis on
+either side of any root cut, so the best child stump for every root cut is one
+min/max over a (cuts x cuts) matrix. The line is searched over ``n_angles``
+directions of the standardized plane, each direction a one-threshold sweep.
+
+Conventions follow ``splits``: values are cast to float32, cuts between values
+closer than ``FEATURE_THRESHOLD`` are skipped and a value equal to a threshold goes
+to the lower side.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from splits import SplitRule, _as_float32, _sorted_prefix
+
+DEFAULT_ANGLES = 90
+
+# Bound on the (pairs, cuts, cuts) work arrays per chunk.
+_MAX_CHUNK_ELEMENTS = 1 << 20
+
+
+@dataclass
+class TreeRule2D:
+    """A cut on one descriptor, then one stump on either side.
+
+    Axis 0 is the first descriptor of the pair and axis 1 the second; values equal to
+    ``root_threshold`` go left.
+    """
+
+    root_axis: int
+    root_threshold: float
+    left_axis: int
+    left: SplitRule
+    right_axis: int
+    right: SplitRule
+
+    def predict(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        values = (np.asarray(a, dtype=np.float32), np.asarray(b, dtype=np.float32))
+        go_left = values[self.root_axis] <= self.root_threshold
+        left = self.left.predict(values[self.left_axis])
+        right = self.right.predict(values[self.right_axis])
+        return np.where(go_left, left, right)
+
+
+@dataclass
+class LinearRule2D:
+    """A threshold on ``weights[0] * a + weights[1] * b``."""
+
+    weights: np.ndarray
+    rule: SplitRule
+
+    def project(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        return self.weights[0] * np.asarray(a, dtype=np.float64) + self.weights[1] * np.asarray(
+            b, dtype=np.float64
+        )
+
+    def predict(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        return self.rule.predict(self.project(a, b))
+
+
+def _pick_stump(low, at_low, high, at_high, n_pos, n_neg):
+    """Best one-cut rule from the extremes of the signed label sum ``d`` below a cut.
+
+    Predicting positive above a cut gets ``n_pos - d`` right, below it ``n_neg + d``.
+    Returns the number right, the cut and whether positives are predicted above it.
+    """
+    above = n_pos - low
+    below = n_neg + high
+    pos_above = above >= below
+    return np.where(pos_above, above, below), np.where(pos_above, at_low, at_high), pos_above
+
+
+def _best_stump(d: np.ndarray, valid: np.ndarray, n_pos: np.ndarray, n_neg: np.ndarray):
+    """``_pick_stump`` over the cuts on the last axis of ``d``."""
+    # |d| <= n, so n + 1 never wins a min or max.
+    bound = d.shape[-1]
+    at_low = np.where(valid, d, bound).argmin(axis=-1)
+    at_high = np.where(valid, d, -bound).argmax(axis=-1)
+    low = np.take_along_axis(d, at_low[..., None], axis=-1)[..., 0]
+    high = np.take_along_axis(d, at_high[..., None], axis=-1)[..., 0]
+    return _pick_stump(low, at_low, high, at_high, n_pos, n_neg)
+
+
+def _running_extremes(d: np.ndarray, valid: np.ndarray, reverse: bool = False):
+    """Min and max of ``d`` over the valid cuts up to (or from) each cut, with positions."""
+    if reverse:
+        low, at_low, high, at_high = _running_extremes(d[:, ::-1], valid[:, ::-1])
+        last = d.shape[1] - 1
+        return low[:, ::-1], last - at_low[:, ::-1], high[:, ::-1], last - at_high[:, ::-1]
+    bound = d.shape[1]
+    positions = np.arange(bound)
+    masked_low = np.where(valid, d, bound)
+    masked_high = np.where(valid, d, -bound)
+    low = np.minimum.accumulate(masked_low, axis=1)
+    high = np.maximum.accumulate(masked_high, axis=1)
+    at_low = np.maximum.accumulate(np.where(masked_low == low, positions, 0), axis=1)
+    at_high = np.maximum.accumulate(np.where(masked_high == high, positions, 0), axis=1)
+    return low, at_low, high, at_high
+
+
+def _stump_rule(thresholds: np.ndarray, cut: int, pos_above: bool, positive, negative) -> SplitRule:
+    n = len(thresholds) - 1
+    if 0 < cut < n:
+        labels = [negative, positive] if pos_above else [positive, negative]
+        return SplitRule(thresholds[[cut]], np.asarray(labels))
+    constant = positive if pos_above == (cut == 0) else negative
+    return SplitRule(np.empty(0), np.asarray([constant]))
+
+
+def _cuts(X32: np.ndarray, y_enc: np.ndarray):
+    """Rank of every value, valid cuts (ends included) and cut thresholds per row."""
+    m, n = X32.shape
+    order = np.argsort(X32, axis=1, kind="stable")
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(n), axis=1)
+    _counts, valid, thresholds = _sorted_prefix(X32, y_enc, 2)
+    valid[:, 0] = valid[:, n] = True
+    return ranks, valid, thresholds
+
+
+def _root_sweep(joint: np.ndarray, valid_root: np.ndarray, valid_other: np.ndarray):
+    """Best tree with the root cut on the first cut axis of ``joint``.
+
+    ``joint[:, i, r]`` is the signed label sum of the samples below cut i of the root
+    descriptor and below cut r of the other one. A child on the root descriptor itself
+    only needs the running extremes of ``joint[:, :, n]`` before or after the root cut.
+    """
+    m, cuts, _ = joint.shape
+    n = cuts - 1
+    size = np.arange(cuts)
+    root_d = joint[:, :, n]
+    left_pos = (size + root_d) // 2
+    left_neg = size - left_pos
+    right_pos = left_pos[:, n : n + 1] - left_pos
+    right_neg = (n - size) - right_pos
+
+    low, at_low, high, at_high = _running_extremes(root_d, valid_root, reverse=True)
+    own = (
+        _pick_stump(*_running_extremes(root_d, valid_root), left_pos, left_neg),
+        _pick_stump(low - root_d, at_low, high - root_d, at_high, right_pos, right_neg),
+    )
+    cross = (
+        _best_stump(joint, valid_other[:, None, :], left_pos, left_neg),
+        _best_stump(joint[:, n : n + 1, :] - joint, valid_other[:, None, :], right_pos, right_neg),
+    )
+    sides = []
+    for own_best, cross_best in zip(own, cross, strict=True):
+        use_cross = cross_best[0] > own_best[0]
+        sides.append(
+            tuple(np.where(use_cross, c, o) for o, c in zip(own_best, cross_best, strict=True))
+            + (use_cross,)
+        )
+
+    # Degenerate root cuts only when the root descriptor is constant.
+    usable = valid_root.copy()
+    usable[:, n] = False
+    usable[:, 0] = ~usable[:, 1:n].any(axis=1)
+    total = np.where(usable, sides[0][0] + sides[1][0], -1)
+    root = total.argmax(axis=1)
+    rows = np.arange(m)
+    picked = [tuple(part[rows, root] for part in side[1:]) for side in sides]
+    return total[rows, root], root, picked
+
+
+def _fit_tree_chunk(A32, B32, y_enc, positive, negative):
+    m, n = A32.shape
+    signs = np.where(y_enc == 1, 1, -1).astype(np.int32)
+    rank_a, valid_a, thr_a = _cuts(A32, y_enc)
+    rank_b, valid_b, thr_b = _cuts(B32, y_enc)
+    rows = np.arange(m)[:, None]
+
+    joint = np.zeros((m, n + 1, n + 1), dtype=np.int32)
+    joint[rows, rank_a + 1, rank_b + 1] = signs
+    joint = joint.cumsum(axis=1, dtype=np.int32).cumsum(axis=2, dtype=np.int32)
+
+    on_a = _root_sweep(joint, valid_a, valid_b)
+    on_b = _root_sweep(joint.transpose(0, 2, 1), valid_b, valid_a)
+    use_b = on_b[0] > on_a[0]
+
+    fitted = []
+    for r in range(m):
+        root_axis = int(use_b[r])
+        correct, root, sides = on_b if root_axis else on_a
+        thresholds = (thr_a[r], thr_b[r])
+        root_cut = root[r]
+        root_threshold = float(thresholds[root_axis][root_cut]) if 0 < root_cut < n else -np.inf
+        children = []
+        for cut, pos_above, use_cross in sides:
+            axis = 1 - root_axis if use_cross[r] else root_axis
+            rule = _stump_rule(thresholds[axis], cut[r], pos_above[r], positive, negative)
+            children.extend([axis, rule])
+        fitted.append((TreeRule2D(root_axis, root_threshold, *children), correct[r] / n))
+    return fitted
+
+
+def fit_pair_trees(
+    A: np.ndarray, B: np.ndarray, y: np.ndarray, positive=1, negative=-1
+) -> tuple[list[TreeRule2D], np.ndarray]:
+    """Training-accuracy-optimal depth-2 axis-aligned tree for every pair of rows.
+
+    ``A`` and ``B`` have shape (n_pairs, n_samples): row i of each holds the two
+    descriptors of pair i. Returns one rule per pair and its training accuracy.
+    """
+    A32 = _as_float32(np.atleast_2d(A))
+    B32 = _as_float32(np.atleast_2d(B))
+    y_enc = (np.asarray(y) == positive).astype(np.int64)
+    m, n = A32.shape
+    chunk = max(1, _MAX_CHUNK_ELEMENTS // ((n + 1) * (n + 1)))
+
+    rules = []
+    accuracies = np.empty(m)
+    for start in range(0, m, chunk):
+        fitted = _fit_tree_chunk(
+            A32[start : start + chunk], B32[start : start + chunk], y_enc, positive, negative
+        )
+        rules.extend(rule for rule, _ in fitted)
+        accuracies[start : start + len(fitted)] = [acc for _, acc in fitted]
+    return rules, accuracies
+
+
+def fit_pair_lines(
+    A: np.ndarray,
+    B: np.ndarray,
+    y: np.ndarray,
+    n_angles: int = DEFAULT_ANGLES,
+    positive=1,
+    negative=-1,
+) -> tuple[list[LinearRule2D], np.ndarray]:
+    """Most accurate linear separator for every pair of rows, over ``n_angles`` directions.
+
+    Directions are evenly spaced over a half turn of the plane with both descriptors
+    scaled to unit standard deviation; the other half turn is the same lines with the
+    labels swapped, which the threshold sweep already covers.
+    """
+    A = np.atleast_2d(np.asarray(A, dtype=np.float64))
+    B = np.atleast_2d(np.asarray(B, dtype=np.float64))
+    y_enc = (np.asarray(y) == positive).astype(np.int64)
+    m, n = A.shape
+    n_pos = float(y_enc.sum())
+    angles = np.pi * np.arange(n_angles) / n_angles
+    scale_a = np.where(A.std(axis=1) > 0, A.std(axis=1), 1.0)
+    scale_b = np.where(B.std(axis=1) > 0, B.std(axis=1), 1.0)
+    weights = np.stack(
+        [np.cos(angles) / scale_a[:, None], np.sin(angles) / scale_b[:, None]], axis=-1
+    )
+    chunk = max(1, _MAX_CHUNK_ELEMENTS // (n_angles * (n + 1)))
+
+    rules = []
+    accuracies = np.empty(m)
+    for start in range(0, m, chunk):
+        w = weights[start : start + chunk]
+        k = len(w)
+        proj = (
+            w[..., 0, None] * A[start : start + k, None]
+            + w[..., 1, None] * B[start : start + k, None]
+        )
+        X32 = _as_float32(proj.reshape(k * n_angles, n))
+        counts, valid, thresholds = _sorted_prefix(X32, y_enc, 2)
+        valid[:, 0] = valid[:, n] = True
+        d = counts[..., 1] - counts[..., 0]
+        pos_rows = np.full(len(d), n_pos)
+        correct, cut, pos_above = _best_stump(d, valid, pos_rows, n - pos_rows)
+        correct = correct.reshape(k, n_angles)
+        best = correct.argmax(axis=1)
+        for r in range(k):
+            flat = r * n_angles + best[r]
+            rule = _stump_rule(thresholds[flat], cut[flat], pos_above[flat], positive, negative)
+            rules.append(LinearRule2D(w[r, best[r]], rule))
+        accuracies[start : start + k] = correct[np.arange(k), best] / n
+    return rules, accuracies
@@ -0,0 +1,83 @@
+"""Test the columnar dataset cache against plain CSV parsing."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dataset_cache import load_table
+
+CSV = """compound,X,rA (Ang),n,label,note
+CaTiO3,O,1.34,2,1,a
+KCl3,Cl,1.64,1,-1,
+CsPbI3,I,1.88,,1,b
+"""
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "table.csv"
+    path.write_text(CSV)
+    return path
+
+
+def test_matches_read_csv(csv_path, tmp_path):
+    rename = {"rA (Ang)": "rA"}
+    cached = load_table(csv_path, rename=rename, cache_dir=tmp_path / "cache")
+    expected = pd.read_csv(csv_path).rename(columns=rename)
+    pd.testing.assert_frame_equal(
+        cached.astype({"compound": str, "X": str}),
+        expected.astype({"compound": str, "X": str}),
+        check_dtype=False,
+        check_categorical=False,
+    )
+
+
+def test_column_types(csv_path, tmp_path):
+    df = load_table(csv_path, cache_dir=tmp_path / "cache")
+    assert df["rA (Ang)"].dtype == np.float64
+    assert df["n"].dtype == np.float64
+    assert df["label"].dtype == np.int8
+    assert isinstance(df["X"].dtype, pd.CategoricalDtype)
+    assert (df["X"] == "O").tolist() == [True, False, False]
+    assert df["note"].isna().tolist() == [False, True, False]
+
+
+def test_numeric_columns_are_memory_mapped(csv_path, tmp_path):
+    df = load_table(csv_path, cache_dir=tmp_path / "cache")
+    values = df["rA (Ang)"].to_numpy()
+    assert not values.flags.writeable
+    base = values
+    while getattr(base, "base", None) is not None and not isinstance(base, np.memmap):
+        base = base.base
+    assert isinstance(base, np.memmap)
+
+
+def test_converts_once_and_invalidates_on_change(csv_path, tmp_path):
+    cache_dir = tmp_path / "cache"
+    load_table(csv_path, cache_dir=cache_dir)
+    (first,) = cache_dir.iterdir()
+    load_table(csv_path, cache_dir=cache_dir)
+    assert list(cache_dir.iterdir()) == [first]
+
+    csv_path.write_text(CSV.replace("1.34", "1.35"))
+    df = load_table(csv_path, cache_dir=cache_dir)
+    assert df["rA (Ang)"].iloc[0] == 1.35
+    (second,) = cache_dir.iterdir()
+    assert second != first
+
+
+def test_renames_keep_separate_caches(csv_path, tmp_path):
+    cache_dir = tmp_path / "cache"
+    rename = {"rA (Ang)": "rA"}
+    assert "rA" in load_table(csv_path, rename=rename, cache_dir=cache_dir)
+    load_table(csv_path, cache_dir=cache_dir)
+    first = sorted(cache_dir.iterdir())
+    assert len(first) == 2
+    assert "rA" in load_table(csv_path, rename=rename, cache_dir=cache_dir)
+    assert sorted(cache_dir.iterdir()) == first
+
+    csv_path.write_text(CSV.replace("1.34", "1.35"))
+    load_table(csv_path, rename=rename, cache_dir=cache_dir)
+    assert len(list(cache_dir.iterdir())) == 2
+    assert load_table(csv_path, cache_dir=cache_dir)["rA (Ang)"].iloc[0] == 1.35
+    assert not set(first) & set(cache_dir.iterdir())
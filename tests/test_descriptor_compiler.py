@@ -0,0 +1,91 @@
+"""Test the translation of scalar descriptors into NumPy array code."""
+
+import math
+
+import numpy as np
+import pytest
+
+from descriptor_compiler import CompileError, compile_descriptor, translate
+
+ARGS = "rA, rB, rX, nA, nB, nX"
+
+
+@pytest.fixture(scope="module")
+def arrays():
+    rng = np.random.default_rng(0)
+    n = 200
+    return {
+        "rA": rng.uniform(1.0, 2.0, n),
+        "rB": rng.uniform(0.5, 1.0, n),
+        "rX": rng.uniform(1.0, 2.0, n),
+        "nA": rng.integers(1, 4, n).astype(float),
+        "nB": rng.integers(2, 6, n).astype(float),
+        "nX": np.full(n, -1.0),
+    }
+
+
+def _rowwise(code, arrays):
+    namespace = {"np": np, "math": math}
+    exec(code, namespace)  # noqa: S102
+    fn = namespace["descriptor"]
+    n = len(arrays["rA"])
+    return np.array([float(fn(**{k: v[i].item() for k, v in arrays.items()})) for i in range(n)])
+
+
+def _assert_compiles_to_same(code, arrays):
+    with np.errstate(all="ignore"):
+        values = compile_descriptor(code)(**arrays)
+    assert values.shape == arrays["rA"].shape
+    assert values == pytest.approx(_rowwise(code, arrays), rel=1e-12)
+
+
+COMPILABLE = {
+    "math_calls": "    import math\n    return math.sqrt(rA) * math.log(rB, 2) + math.pi",
+    "if_return": "    if rA / rB > 1.6:\n        return rA\n    else:\n        return -rB",
+    "if_assign": (
+        "    t = rA / rB\n"
+        "    if nA == 1 and nB > 3:\n"
+        "        t += 1\n"
+        "    elif nA == 2 or t < 1.5:\n"
+        "        t = t * 2\n"
+        "    return t"
+    ),
+    "max_min": "    return max(rA, rB, rX) - min(nA, nB) * abs(rX - 1.5)",
+    "ifexp_boolop": "    return (rA if rA > rX else rX) + (rA > 1.5 and rB or 7) + (not nA == 2)",
+    "from_import": "    from math import exp as e, tau\n    return e(-rA) * tau + int(rX * 3)",
+    "tuple_assign": "    a, b = rA + rX, rB + rX\n    a, b = b, a\n    return a / b",
+    "constant": '    """Docstring."""\n    return 2',
+}
+
+
+class TestCompile:
+    @pytest.mark.parametrize("name", COMPILABLE)
+    def test_matches_interpreter(self, name, arrays):
+        _assert_compiles_to_same(f"def descriptor({ARGS}):\n{COMPILABLE[name]}\n", arrays)
+
+    def test_if_without_return_is_not_duplicated(self):
+        body = "".join(f"    if rA > {i}:\n        rB = rB + {i}\n" for i in range(30))
+        source = translate(f"def descriptor({ARGS}):\n{body}    return rB\n")
+        assert source.count("\n") < 100
+
+    @pytest.mark.parametrize(
+        "body",
+        [
+            "    s = 0\n    for r in (rA, rB):\n        s += r\n    return s",
+            "    while rA > 0:\n        rA -= 1\n    return rA",
+            "    return [rA, rB][0]",
+            "    import os\n    return rA",
+            "    return math.factorial(nA)",
+            "    return sum([rA, rB])",
+            "    if rA > 1:\n        return rA",
+            "    if rA > 1:\n        y = rA\n    return y",
+        ],
+    )
+    def test_rejects_unsupported(self, body):
+        with pytest.raises(CompileError):
+            translate(f"def descriptor({ARGS}):\n{body}\n")
+
+    def test_rejects_helper_functions(self):
+        code = f"def helper(x):\n    return x\n\ndef descriptor({ARGS}):\n    return helper(rA)\n"
+        with pytest.raises(CompileError):
+            translate(code)
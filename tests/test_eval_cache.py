@@ -0,0 +1,114 @@
+"""Test the persistent evaluation cache and its AST normalization."""
+
+import numpy as np
+import pytest
+
+from eval_cache import EvalCache, normalize_code
+
+BASE = """\
+def descriptor(rA, rB, rX, nA, nB, nX):
+    ratio = rA / rB
+    return ratio * rX
+"""
+
+REFORMATTED = """\
+def descriptor(rA, rB, rX, nA, nB, nX):
+    \"\"\"Same formula, different surface.\"\"\"
+    # size ratio
+    q   =   rA/rB
+    return q*rX
+"""
+
+DIFFERENT = """\
+def descriptor(rA, rB, rX, nA, nB, nX):
+    ratio = rA / rB
+    return ratio * rB
+"""
+
+
+class TestNormalizeCode:
+    def test_whitespace_comments_and_local_names_ignored(self):
+        assert normalize_code(BASE) == normalize_code(REFORMATTED)
+
+    def test_different_formula_differs(self):
+        assert normalize_code(BASE) != normalize_code(DIFFERENT)
+
+    @pytest.mark.parametrize(
+        "first, second",
+        [
+            # The lambda returns its argument in one and the outer local in the other.
+            (
+                "    t = rA\n    f = lambda t: t * 2\n    return f(rB)",
+                "    u = rA\n    f = lambda t: u * 2\n    return f(rB)",
+            ),
+            # A name spelled like a placeholder is not one.
+            ("    a = rA\n    return a + _v0", "    a = rA\n    return a + a"),
+        ],
+    )
+    def test_renaming_keeps_bindings_apart(self, first, second):
+        header = "def descriptor(rA, rB, rX, nA, nB, nX):\n"
+        assert normalize_code(header + first) != normalize_code(header + second)
+
+    def test_nested_parameters_renamed(self):
+        header = "def descriptor(rA, rB, rX, nA, nB, nX):\n"
+        first = "    def g(x, *rest):\n        return x * rA\n    return g(rB)"
+        second = "    def h(y, *more):\n        return y * rA\n    return h(rB)"
+        assert normalize_code(header + first) == normalize_code(header + second)
+
+    def test_missing_descriptor_raises(self):
+        with pytest.raises(ValueError):
+            normalize_code("def f(rA):\n    return rA")
+
+
+class TestEvalCache:
+    @pytest.fixture
+    def cache(self, tmp_path):
+        c = EvalCache(tmp_path / "cache.sqlite", max_entries=2)
+        yield c
+        c.close()
+
+    def test_key_depends_on_settings(self):
+        k = EvalCache.key(BASE, "data", 2, 1)
+        assert k == EvalCache.key(REFORMATTED, "data", 2, 1)
+        assert k != EvalCache.key(BASE, "data", 1, 1)
+        assert k != EvalCache.key(BASE, "other", 2, 1)
+
+    def test_round_trip_and_counters(self, cache):
+        assert cache.get("a") is None
+        cache.put("a", {"accuracy": 0.9}, np.array([1.0, 2.0]))
+        record, values = cache.get("a")
+        assert record == {"accuracy": 0.9}
+        assert values.tolist() == [1.0, 2.0]
+        assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1}
+
+    def test_lru_eviction(self, cache):
+        cache.put("a", {}, np.zeros(1))
+        cache.put("b", {}, np.zeros(1))
+        cache.get("a")
+        cache.put("c", {}, np.zeros(1))
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.get("c") is not None
+
+    def test_count_follows_replacements_and_evictions(self, cache):
+        for key in "aab":
+            cache.put(key, {}, np.zeros(1))
+        assert cache._count == len(cache) == 2
+        cache.put("c", {}, np.zeros(1))
+        assert cache._count == len(cache) == 2
+
+    def test_shared_file_in_wal_mode(self, tmp_path):
+        path = tmp_path / "shared.sqlite"
+        first, second = EvalCache(path), EvalCache(path)
+        first.put("a", {"x": 1}, np.ones(3))
+        second.put("b", {"x": 2}, np.ones(3))
+        assert first.get("b")[0] == {"x": 2}
+        assert second.get("a")[0] == {"x": 1}
+        assert first._conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        first.close()
+        second.close()
+
+    def test_persists_across_instances(self, tmp_path):
+        path = tmp_path / "persist.sqlite"
+        EvalCache(path).put("a", {"x": 1}, np.ones(3))
+        assert EvalCache(path).get("a")[0] == {"x": 1}
@@ -6,11 +6,32 @@ which uses the paper's pre-computed predictions on 576 ABX3 compounds:
   - New τ:         91.7% overall, FPR=10.6%, test=94%
 """
 
+import pickle
 from pathlib import Path
 
+import numpy as np
+import pandas as pd
 import pytest
 
-from evaluator import evaluate_candidate, load_dataset
+import evaluator
+from eval_cache import EvalCache
+from evaluator import (
+    DescriptorError,
+    _exec_descriptor,
+    evaluate_candidate,
+    evaluate_many,
+    feature_bank,
+    load_dataset,
+    load_decomposition_enthalpies,
+    load_double_perovskites,
+    probe_rows,
+    rank_fingerprint,
+    refine_constants,
+    score_matrix,
+    score_pairs,
+)
+from plotting import PlotRenderer, ensure_plot
+from value_store import ValueStore
 
 DATA_PATH = Path(__file__).parent.parent / "perovskite-stability" / "TableS1.csv"
 
@@ -87,6 +108,12 @@ class TestBartelTau:
     def test_per_anion_chloride(self, result_tau):
         assert result_tau.per_anion_accuracy["Cl"] == pytest.approx(0.90, abs=0.03)
 
+    def test_group_metrics_cover_every_compound(self, df, result_tau):
+        for name in ("anion", "nA", "nB", "nA_nB"):
+            groups = result_tau.group_metrics[name].values()
+            assert sum(g["n"] for g in groups) == len(df)
+            assert sum(g["tp"] + g["tn"] for g in groups) == round(result_tau.accuracy * len(df))
+
     def test_plot_generated(self, result_tau):
         assert Path(result_tau.plot_path).exists()
 
@@ -97,6 +124,58 @@ class TestBartelTau:
         assert result_tau.accuracy - result_t.accuracy > 0.15
 
 
+SCALAR_ONLY = """\
+def descriptor(rA, rB, rX, nA, nB, nX):
+    import math
+    if rA / rB > 1.5:
+        return math.log(rA / rB) * nA
+    return max(rX, rB) - min(nA, nB) * 0.1
+"""
+
+
+class TestExecPath:
+    def test_array_safe_is_vectorized(self, result_tau):
+        assert result_tau.exec_path == "vectorized"
+
+    def test_scalar_only_is_compiled(self, df):
+        values, path = _exec_descriptor(SCALAR_ONLY, df)
+        assert path == "compiled"
+        ratio = (df["rA"] / df["rB"]).values
+        expected = np.where(
+            ratio > 1.5,
+            np.log(ratio) * df["nA"].values,
+            np.maximum(df["rX"], df["rB"]) - np.minimum(df["nA"], df["nB"]) * 0.1,
+        )
+        assert values == pytest.approx(expected)
+
+    def test_uncompilable_falls_back_to_rowwise(self, df):
+        code = (
+            "def descriptor(rA, rB, rX, nA, nB, nX):\n"
+            "    total = 0\n"
+            "    for r in (rA, rB, rX):\n"
+            "        total += max(r, 1.0)\n"
+            "    return total"
+        )
+        _, path = _exec_descriptor(code, df)
+        assert path == "rowwise"
+
+    def test_reducing_numpy_call_falls_back_to_rowwise(self, df):
+        code = "def descriptor(rA, rB, rX, nA, nB, nX):\n    return np.mean([rA, rB]) / rX"
+        values, path = _exec_descriptor(code, df)
+        assert path == "rowwise"
+        assert values == pytest.approx(((df["rA"] + df["rB"]) / 2 / df["rX"]).values)
+
+    def test_feature_bank_parameters(self, df):
+        code = (
+            "def descriptor(rA, rB, rX, nA, nB, nX, t, octahedral_factor):\n"
+            "    return t * octahedral_factor"
+        )
+        values, path = _exec_descriptor(code, df)
+        assert path == "vectorized"
+        bank = feature_bank(df)
+        assert values == pytest.approx(bank["t"] * bank["rB"] / bank["rX"])
+
+
 class TestBrokenFunction:
     def test_syntax_error(self, df, plot_dir):
         code = "def descriptor(rA, rB, rX, nA, nB, nX):\n    return asdf("
@@ -115,3 +194,310 @@ class TestBrokenFunction:
         result = evaluate_candidate(code, df, plot_dir, "nan_result")
         assert result.error
         assert result.accuracy == 0.0
+
+    def test_infinite_loop_rejected_statically(self, df, plot_dir):
+        code = "def descriptor(rA, rB, rX, nA, nB, nX):\n    while True:\n        pass"
+        result = evaluate_candidate(code, df, plot_dir, "while_true")
+        assert "Static check failed" in result.error
+        assert "never exits" in result.error
+
+    def test_infinite_loop_times_out(self, df, plot_dir, monkeypatch):
+        monkeypatch.setattr(evaluator, "TIMEOUT_SECONDS", 1)
+        # Not provably infinite, so it passes the static check and hits the timeout.
+        code = "def descriptor(rA, rB, rX, nA, nB, nX):\n    while rA > 0:\n        rA += 1"
+        result = evaluate_candidate(code, df, plot_dir, "runaway")
+        assert "timed out" in result.error
+        assert evaluate_candidate(GOLDSCHMIDT_T, df, plot_dir, "after_runaway").accuracy > 0
+
+
+class TestEvaluateMany:
+    @pytest.fixture(scope="class")
+    def results(self, df, plot_dir):
+        codes = [
+            GOLDSCHMIDT_T,
+            "def descriptor(rA, rB, rX, nA, nB, nX):\n    return 1 / 0",
+            BARTEL_TAU,
+        ]
+        return evaluate_many(codes, df, plot_dir, ["many_t", "many_broken", "many_tau"], workers=2)
+
+    def test_results_in_input_order(self, results, result_t, result_tau):
+        assert results[0].accuracy == result_t.accuracy
+        assert results[2].accuracy == result_tau.accuracy
+        assert results[2].thresholds == result_tau.thresholds
+
+    def test_error_is_isolated(self, results):
+        assert "division by zero" in results[1].error
+        assert not results[0].error and not results[2].error
+
+    def test_static_rejection_skips_sandbox(self, df, plot_dir):
+        code = "def descriptor(rA, rB, rX, nA, nB, nX):\n    import scipy\n    return rA"
+        rejected, ok = evaluate_many([code, GOLDSCHMIDT_T], df, plot_dir, ["scipy", "ok"])
+        assert "import of 'scipy' is not allowed" in rejected.error
+        assert not ok.error and ok.cost_class == "constant"
+
+    def test_plots_generated(self, results):
+        assert Path(results[0].plot_path).exists()
+        assert Path(results[2].plot_path).exists()
+
+
+class TestProbe:
+    @pytest.fixture(scope="class")
+    def probe(self, df):
+        arrays = {c: df[c].to_numpy(dtype=float) for c in evaluator.INPUT_COLUMNS}
+        return probe_rows(arrays, df["X"].to_numpy())
+
+    def test_covers_every_oxidation_state_and_anion_combination(self, df, probe):
+        combos = set(df[["nA", "nB", "X"]].itertuples(index=False))
+        assert set(df[["nA", "nB", "X"]].iloc[probe].itertuples(index=False)) == combos
+
+    def test_covers_ratio_near_one(self, df, probe):
+        log_ratio = np.abs(np.log(df["rA"] / df["rB"]))
+        assert log_ratio.idxmin() in probe
+
+    def test_failing_rows_attached(self, df, plot_dir):
+        code = (
+            "def descriptor(rA, rB, rX, nA, nB, nX):\n"
+            "    import math\n"
+            "    if math.log(rA / rB) < 0.1:\n"
+            "        raise ValueError('ratio too close to 1')\n"
+            "    return rA / rB"
+        )
+        result = evaluate_candidate(code, df, plot_dir, "probe_fail")
+        assert "probe compounds" in result.error
+        assert result.failing_rows
+        row = result.failing_rows[0]
+        assert row["error"] == "ValueError: ratio too close to 1"
+        assert row["compound"] in set(df["ABX3"])
+        assert set(evaluator.INPUT_COLUMNS) <= set(row)
+
+    def test_error_survives_pickling(self):
+        error = pickle.loads(pickle.dumps(DescriptorError("boom", [{"compound": "X"}])))
+        assert str(error) == "boom"
+        assert error.rows == [{"compound": "X"}]
+
+
+class TestDeferredPlot:
+    def test_lazy_plot_rendered_on_first_use(self, df, tmp_path):
+        result = evaluate_candidate(
+            GOLDSCHMIDT_T, df, tmp_path, "lazy_t", renderer=PlotRenderer("lazy")
+        )
+        assert not Path(result.plot_path).exists()
+        assert ensure_plot(result.plot_path).exists()
+
+
+class TestEvalCacheIntegration:
+    def test_hit_skips_evaluation(self, df, plot_dir, tmp_path, monkeypatch):
+        cache = EvalCache(tmp_path / "cache.sqlite")
+        first = evaluate_candidate(BARTEL_TAU, df, plot_dir, "cached_1", cache=cache)
+        monkeypatch.setattr(evaluator, "_get_sandbox", None)
+        renamed = BARTEL_TAU.replace("    import numpy as np\n", "    import numpy as np  # tau\n")
+        second = evaluate_candidate(renamed, df, plot_dir, "cached_2", cache=cache)
+        assert cache.stats()["hits"] == 1
+        assert second.accuracy == first.accuracy
+        assert second.thresholds == pytest.approx(first.thresholds)
+        assert np.array_equal(second.descriptor_values, first.descriptor_values)
+        assert Path(second.plot_path).exists()
+
+
+INVERSE_T = """\
+def descriptor(rA, rB, rX, nA, nB, nX):
+    import math
+    return 3.0 - math.sqrt(2) * (rB + rX) / (rA + rX)
+"""
+
+
+class TestValueStore:
+    def test_batch_keeps_rows_in_store(self, df, plot_dir):
+        store = ValueStore()
+        results = evaluate_many(
+            [GOLDSCHMIDT_T, BARTEL_TAU], df, plot_dir, ["s_t", "s_tau"], store=store
+        )
+        assert [r.values_row for r in results] == [store.index["s_t"], store.index["s_tau"]]
+        assert np.array_equal(store.matrix()[1], results[1].descriptor_values)
+
+    def test_score_matrix_matches_single_evaluations(self, df, result_t, result_tau):
+        values = np.stack([result_t.descriptor_values, result_tau.descriptor_values])
+        for scored, result in zip(score_matrix(values, df), (result_t, result_tau), strict=True):
+            assert scored["accuracy"] == pytest.approx(result.accuracy)
+            assert scored["thresholds"] == pytest.approx(result.thresholds)
+            assert scored["metrics"]["group_metrics"] == result.group_metrics
+
+    def test_score_pairs(self, df, result_t, result_tau):
+        values = np.stack([result_t.descriptor_values, result_tau.descriptor_values])
+        (scored,) = score_pairs(values, df)
+        assert scored["pair"] == (0, 1)
+        for kind in ("tree", "linear"):
+            fit = scored[kind]
+            preds = fit["rule"].predict(*values)
+            assert fit["accuracy"] == pytest.approx((preds == df["exp_label"]).mean())
+            assert fit["metrics"]["tp"] + fit["metrics"]["tn"] == round(fit["accuracy"] * len(df))
+        # The tree maximises training accuracy, so it is never below tau's own rule there.
+        assert scored["tree"]["metrics"]["train_accuracy"] >= result_tau.train_accuracy
+
+
+@pytest.fixture(scope="module")
+def double_perovskites(df, tmp_path_factory):
+    """Each ABX3 written as A2BB'X6 with B = B' in radius and mean charge nB, plus an
+    unlabeled compound and one with a half-integer B-site charge."""
+    table = pd.DataFrame(
+        {
+            "rA (Ang)": df["rA"],
+            "rB1 (Ang)": df["rB"],
+            "rB2 (Ang)": df["rB"],
+            "rX (Ang)": df["rX"],
+            "nA": df["nA"],
+            "nB1": df["nB"] - 1,
+            "nB2": df["nB"] + 1,
+            "nX": df["nX"],
+            "X": df["X"].astype(str),
+            "icsd_label": df["exp_label"].astype(float),
+        }
+    )
+    extra = table.iloc[:2].copy()
+    extra["icsd_label"] = [np.nan, 1.0]
+    extra["nB1"], extra["nB2"] = 1, 2
+    path = tmp_path_factory.mktemp("icsd") / "icsd_A2BBX6.csv"
+    pd.concat([table, extra]).to_csv(path, index=False)
+    return load_double_perovskites(str(path))
+
+
+class TestGeneralization:
+    def test_loader_averages_b_site(self, df, double_perovskites):
+        assert len(double_perovskites) == len(df) + 1
+        assert double_perovskites["nB"].iloc[-1] == 1.5
+        assert np.array_equal(double_perovskites["rB"].iloc[:-1], df["rB"])
+
+    def test_scored_with_dataset_thresholds(self, df, plot_dir, result_tau, double_perovskites):
+        result = evaluate_candidate(
+            BARTEL_TAU, df, plot_dir, "gen_tau", generalization=double_perovskites
+        )
+        gen = result.generalization
+        assert result.accuracy == result_tau.accuracy
+        assert len(result.descriptor_values) == len(df)
+        assert gen["n"] == len(df) + 1
+        correct = round(result_tau.accuracy * len(df))
+        # The copies of the ABX3 compounds score exactly as they do; the extra one may not.
+        assert gen["tp"] + gen["tn"] in (correct, correct + 1)
+        assert "A2BB'X6 generalization" in result.metrics_summary
+
+    def test_undefined_compound_counts_as_wrong(self, df, plot_dir, double_perovskites):
+        code = "def descriptor(rA, rB, rX, nA, nB, nX):\n    return rA / rB + 1 / (nB - 1.5)"
+        (result,) = evaluate_many(
+            [code], df, plot_dir, ["gen_undefined"], generalization=double_perovskites
+        )
+        assert result.error == ""
+        assert result.generalization["invalid"] == 1
+
+
+@pytest.fixture(scope="module")
+def decomposition_enthalpies(df, tmp_path_factory):
+    """A TableS2 from the ABX3 compounds, with dHdec following the label and an empty B'."""
+    table = pd.DataFrame(
+        {
+            "compound": df["ABX3"].astype(str),
+            "rA (Ang)": df["rA"],
+            "rB1 (Ang)": df["rB"],
+            "rB2 (Ang)": np.nan,
+            "rX (Ang)": df["rX"],
+            "nA": df["nA"],
+            "nB1": df["nB"],
+            "nB2": np.nan,
+            "nX": df["nX"],
+            "X": df["X"].astype(str),
+            "dHdec (meV/atom)": 50.0 * df["exp_label"],
+        }
+    )
+    path = tmp_path_factory.mktemp("dft") / "TableS2.csv"
+    table.to_csv(path, index=False)
+    return load_decomposition_enthalpies(str(path))
+
+
+class TestRegression:
+    def test_loader_keeps_single_b_site(self, df, decomposition_enthalpies):
+        assert np.array_equal(decomposition_enthalpies["rB"], df["rB"])
+        assert np.array_equal(decomposition_enthalpies["nB"], df["nB"])
+
+    def test_sign_agreement_is_accuracy(self, df, plot_dir, result_tau, decomposition_enthalpies):
+        result = evaluate_candidate(
+            BARTEL_TAU, df, plot_dir, "reg_tau", regression=decomposition_enthalpies
+        )
+        reg = result.regression
+        assert result.accuracy == result_tau.accuracy
+        assert reg["n"] == len(df)
+        assert np.isclose(reg["sign_agreement"], result_tau.accuracy)
+        assert set(reg["r2"]) == {"halides", "chalcogenides"}
+        assert "DFT decomposition enthalpy" in result.metrics_summary
+
+    def test_batch_matches_single(self, df, plot_dir, decomposition_enthalpies):
+        single = evaluate_candidate(
+            GOLDSCHMIDT_T, df, plot_dir, "reg_t", regression=decomposition_enthalpies
+        )
+        (batched,) = evaluate_many(
+            [GOLDSCHMIDT_T], df, plot_dir, ["reg_t_batch"], regression=decomposition_enthalpies
+        )
+        assert batched.regression == single.regression
+
+
+class TestRefineConstants:
+    def test_tunes_perturbed_constants(self, df, plot_dir):
+        detuned = BARTEL_TAU.replace("return rX / rB", "return 0.2 * rX / rB")
+        refined = refine_constants(detuned, df)
+        assert refined["train_accuracy"] > refined["start_train_accuracy"]
+        assert refined["constants"][0][0] == 0.2
+        result = evaluate_candidate(refined["code"], df, plot_dir, "refined")
+        assert result.train_accuracy == pytest.approx(refined["train_accuracy"])
+
+    def test_reuses_the_evaluation_sandbox(self, df, plot_dir, double_perovskites):
+        codes = [GOLDSCHMIDT_T, BARTEL_TAU]
+        evaluate_many(
+            codes,
+            df,
+            plot_dir,
+            ["pool_t", "pool_tau"],
+            workers=2,
+            generalization=double_perovskites,
+        )
+        sandbox = evaluator._sandbox
+        detuned = BARTEL_TAU.replace("return rX / rB", "return 0.2 * rX / rB")
+        assert refine_constants(detuned, df, generalization=double_perovskites) is not None
+        evaluate_candidate(
+            BARTEL_TAU, df, plot_dir, "pool_again", generalization=double_perovskites
+        )
+        assert evaluator._sandbox is sandbox
+        assert sandbox.size == 2
+
+    def test_no_constants_or_no_gain(self, df):
+        assert refine_constants(GOLDSCHMIDT_T.replace("np.sqrt(2)", "np.sqrt(rX / rX)"), df) is None
+        assert (
+            refine_constants("def descriptor(rA, rB, rX, nA, nB, nX):\n    return rA", df) is None
+        )
+
+
+class TestRankEquivalence:
+    def test_monotone_transforms_share_fingerprint(self):
+        x = np.array([0.3, 1.2, 0.7, 2.5, 0.7])
+        fp = rank_fingerprint(x)
+        assert rank_fingerprint(np.log(x)) == fp
+        assert rank_fingerprint(2 * x + 1) == fp
+        assert rank_fingerprint(1 / x) != fp
+        assert rank_fingerprint(1 / x, fold_reversed=True) == rank_fingerprint(
+            x, fold_reversed=True
+        )
+        assert rank_fingerprint(x[::-1]) != fp
+
+    def test_equivalent_candidate_is_flagged(self, df, plot_dir, result_t):
+        known = {result_t.rank_fingerprint: "node_t"}
+        result = evaluate_candidate(INVERSE_T, df, plot_dir, "inv_t", known_fingerprints=known)
+        assert result.equivalent_to == "node_t"
+        assert not result.plot_path
+
+    def test_unrelated_candidate_is_scored(self, df, plot_dir, result_t):
+        known = {result_t.rank_fingerprint: "node_t"}
+        result = evaluate_candidate(BARTEL_TAU, df, plot_dir, "tau_2", known_fingerprints=known)
+        assert not result.equivalent_to
+        assert result.accuracy > 0
+
+    def test_batch_flags_duplicates(self, df, plot_dir):
+        results = evaluate_many([GOLDSCHMIDT_T, INVERSE_T], df, plot_dir, ["dup_a", "dup_b"])
+        assert not results[0].equivalent_to
+        assert results[1].equivalent_to == "dup_a"
@@ -0,0 +1,54 @@
+"""Test the lazily built, memoized feature bank."""
+
+import math
+
+import numpy as np
+import pytest
+
+from features import FeatureBank
+
+BASE = {
+    "rA": np.array([1.6, 1.3]),
+    "rB": np.array([0.6, 0.8]),
+    "rX": np.array([1.4, 1.8]),
+}
+
+
+def test_default_features():
+    bank = FeatureBank(BASE)
+    rA, rB, rX = BASE["rA"], BASE["rB"], BASE["rX"]
+    assert bank["rA_rB"] == pytest.approx(rA / rB)
+    assert bank["log_rA_rB"] == pytest.approx(np.log(rA / rB))
+    assert bank["t"] == pytest.approx((rA + rX) / (math.sqrt(2) * (rB + rX)))
+    assert bank["octahedral_factor"] == pytest.approx(rB / rX)
+
+
+def test_features_are_built_lazily_once():
+    bank = FeatureBank(BASE)
+    calls = []
+    bank.register("double_rA", lambda f: calls.append(1) or 2 * f["rA"])
+    assert "double_rA" in bank
+    assert "double_rA" not in bank.built()
+    first = bank["double_rA"]
+    assert bank["double_rA"] is first
+    assert calls == [1]
+
+
+def test_arrays_are_read_only_and_base_is_not_locked():
+    rA = BASE["rA"].copy()
+    bank = FeatureBank({**BASE, "rA": rA})
+    with pytest.raises(ValueError, match="read-only"):
+        bank["rA"][0] = 0.0
+    with pytest.raises(ValueError, match="read-only"):
+        bank["t"][0] = 0.0
+    rA[0] = 2.0
+    assert rA.flags.writeable
+
+
+def test_self_dependency_is_rejected():
+    bank = FeatureBank(BASE)
+    bank.register("loop", lambda f: f["loop"])
+    with pytest.raises(ValueError, match="depends on itself"):
+        bank["loop"]
+    with pytest.raises(KeyError):
+        bank["unknown"]
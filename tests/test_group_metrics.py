@@ -0,0 +1,58 @@
+"""Test the bincount group metrics against per-group boolean masks."""
+
+import numpy as np
+import pytest
+
+from group_metrics import GroupMetrics, dataset_groupings, factorize
+
+ANIONS = np.array(["Cl", "O", "I", "O", "F", "Cl", "O", "Br"])
+N_A = np.array([1, 2, 1, 3, 1, 1, 2, 1])
+N_B = np.array([2, 4, 2, 3, 2, 2, 4, 2])
+SPLIT = np.array([1, 1, 0, 1, 0, 1, 1, 0])
+LABELS = np.array([1, -1, 1, 1, -1, -1, 1, 1])
+
+
+@pytest.fixture
+def engine():
+    return GroupMetrics(LABELS, dataset_groupings(ANIONS, N_A, N_B, SPLIT))
+
+
+def _masked_counts(preds, mask):
+    labels, preds = LABELS[mask], preds[mask]
+    return {
+        "tp": int(((labels == 1) & (preds == 1)).sum()),
+        "fp": int(((labels == -1) & (preds == 1)).sum()),
+        "tn": int(((labels == -1) & (preds == -1)).sum()),
+        "fn": int(((labels == 1) & (preds == -1)).sum()),
+        "accuracy": float((labels == preds).mean()),
+    }
+
+
+def test_factorize_puts_known_order_first():
+    grouping = factorize(ANIONS, ("O", "F", "Cl", "Br", "I", "S"))
+    assert grouping.keys == ("O", "F", "Cl", "Br", "I")
+    assert [grouping.keys[c] for c in grouping.codes] == ANIONS.tolist()
+
+
+def test_matches_boolean_masks(engine):
+    preds = np.array([1, 1, -1, 1, -1, 1, -1, 1])
+    counts = engine.counts(preds)
+    anion = engine.summarize("anion", counts["anion"])
+    assert list(anion) == ["O", "F", "Cl", "Br", "I"]
+    for key, group in anion.items():
+        expected = _masked_counts(preds, np.isin(ANIONS, [key]))
+        assert {k: group[k] for k in expected} == pytest.approx(expected)
+    pairs = engine.summarize("nA_nB", counts["nA_nB"])
+    assert set(pairs) == {"(1, 2)", "(2, 4)", "(3, 3)"}
+    assert pairs["(1, 2)"]["n"] == 5
+    expected = _masked_counts(preds, (N_A == 2) & (N_B == 4))
+    assert {k: pairs["(2, 4)"][k] for k in expected} == pytest.approx(expected)
+
+
+def test_batch_matches_single_candidates(engine):
+    rng = np.random.default_rng(0)
+    preds = np.where(rng.random((5, len(LABELS))) < 0.5, 1, -1)
+    batched = engine.counts(preds)
+    for i, row in enumerate(preds):
+        for name, counts in engine.counts(row).items():
+            assert np.array_equal(batched[name][i], counts)
@@ -0,0 +1,92 @@
+"""Test node migration between islands and the merged report state."""
+
+import numpy as np
+from omegaconf import OmegaConf
+
+import islands
+from islands import MIGRANT_KEY, MigrationChannel, merge_islands, migrate, run_island
+from mcts import backpropagate
+from state import FormulaNode, SearchState
+from value_store import ValueStore
+
+
+def _island(prefix, accuracies):
+    state = SearchState(values=ValueStore())
+    for i, accuracy in enumerate(accuracies):
+        nid = f"{prefix}{i}"
+        node = FormulaNode(
+            nid, None, f"code {nid}", "", accuracy=accuracy, visit_count=1, rank_fingerprint=nid
+        )
+        node.values_row = state.values.add(nid, np.full(3, accuracy))
+        state.add_node(node)
+        backpropagate(state, node)
+    return state
+
+
+def test_migrate_exchanges_top_nodes(tmp_path):
+    channel = MigrationChannel(tmp_path / "migration.sqlite")
+    first = _island("a", [0.9, 0.8, 0.5])
+    second = _island("b", [0.7, 0.6])
+    # A node rank-equivalent to one of the first island's nodes is not adopted.
+    second.nodes["b1"].rank_fingerprint = "a0"
+    second.fingerprint_index["a0"] = "b1"
+
+    assert migrate(first, channel, 0, top_k=2) == 0
+    assert migrate(second, channel, 1, top_k=2) == 1
+    assert migrate(first, channel, 0, top_k=2) == 1
+    channel.close()
+
+    migrant = second.nodes["a1"]
+    assert migrant.parent_id is None and migrant.id in second.root_children
+    assert migrant.metrics[MIGRANT_KEY] == 0
+    np.testing.assert_array_equal(second.values.row(migrant.values_row), np.full(3, 0.8))
+    assert second.budget_used == 0
+    # Migrants are not published again; b1 is equivalent to the first island's a0.
+    assert {nid for nid, n in first.nodes.items() if MIGRANT_KEY in n.metrics} == {"b0"}
+
+
+def test_run_island_migrates_every_interval(monkeypatch, tmp_path):
+    cfg = OmegaConf.create(
+        {
+            "mcts": {"budget": 7, "regression_weight": 0.0},
+            "islands": {"migration_interval": 3, "migrate_top_k": 1},
+        }
+    )
+    segments, migrations = [], []
+
+    def run_mcts(client, state, df, plot_dir, segment, **kwargs):
+        segments.append(segment.mcts.budget)
+        state.budget_used = segment.mcts.budget
+        return state
+
+    monkeypatch.setattr(islands, "run_mcts", run_mcts)
+    monkeypatch.setattr(islands, "migrate", lambda state, *args: migrations.append(args))
+    state = SearchState()
+    run_island(
+        None,
+        state,
+        None,
+        tmp_path,
+        cfg,
+        island=0,
+        channel=None,
+        state_save_path=tmp_path / "state.json",
+    )
+    assert segments == [3, 6, 7]
+    assert len(migrations) == 3
+    assert cfg.mcts.budget == 7
+
+
+def test_merge_islands_ranks_all_own_nodes(tmp_path):
+    channel = MigrationChannel(tmp_path / "migration.sqlite")
+    states = [_island("a", [0.6, 0.5]), _island("b", [0.9])]
+    migrate(states[1], channel, 1, top_k=1)
+    migrate(states[0], channel, 0, top_k=1)
+    channel.close()
+
+    merged = merge_islands(states)
+    assert [n.id for n in merged.top_k(3)] == ["i1-b0", "i0-a0", "i0-a1"]
+    assert len(merged.nodes) == 3
+    best = merged.nodes["i1-b0"]
+    assert best.metrics["island"] == 1
+    np.testing.assert_array_equal(merged.values.row(best.values_row), np.full(3, 0.9))
@@ -0,0 +1,226 @@
+"""Test UCB selection with virtual loss, the pipelined loop and batched expansion."""
+
+import itertools
+import math
+import random
+import threading
+from pathlib import Path
+
+import pytest
+from omegaconf import OmegaConf
+
+import mcts
+from evaluator import EvalResult, evaluate_candidate, load_dataset
+from mcts import (
+    EvalContext,
+    _add_children,
+    _result_to_node,
+    _run_pipelined,
+    _ucb1,
+    backpropagate,
+    select_node,
+)
+from proposer import Proposal, propose_improvements
+from state import FormulaNode, SearchState
+from value_store import ValueStore
+
+DATA_PATH = Path(__file__).parent.parent / "perovskite-stability" / "TableS1.csv"
+
+
+def _cfg(parallel=1, budget=10, max_depth=5, k=1, m=1, child_selection="accuracy"):
+    return OmegaConf.create(
+        {
+            "mcts": {
+                "budget": budget,
+                "ucb_constant": 1.41,
+                "max_depth": max_depth,
+                "regression_weight": 0.0,
+                "parallel": parallel,
+                "reuse_equivalent": True,
+                "proposals_per_call": k,
+                "children_per_call": m,
+                "child_selection": child_selection,
+            },
+            "refine": {"enabled": False},
+            "eval": {"decision_tree_max_depth": 2, "train_split_label": 1, "workers": 2},
+        }
+    )
+
+
+def _state():
+    state = SearchState()
+    for nid, accuracy in (("a", 0.9), ("b", 0.6)):
+        state.add_node(
+            FormulaNode(nid, None, "", nid, accuracy=accuracy, visit_count=1, total_reward=accuracy)
+        )
+    return state
+
+
+def test_virtual_loss_spreads_selection():
+    state = _state()
+    cfg = _cfg()
+    assert select_node(state, cfg).id == "a"
+    assert select_node(state, cfg, {}).id == "a"
+    assert select_node(state, cfg, {"a": 2}).id == "b"
+
+
+@pytest.mark.parametrize(("parallel", "k", "m"), [(1, 1, 1), (3, 1, 1), (2, 3, 2)])
+def test_pipeline_spends_budget_exactly(monkeypatch, tmp_path, parallel, k, m):
+    state = _state()
+    cfg = _cfg(parallel=parallel, budget=11, max_depth=3, k=k, m=m)
+    calls = itertools.count()
+    threads = set()
+
+    def proposal():
+        threads.add(threading.get_ident())
+        # Every third proposal fails to evaluate.
+        return Proposal("bad" if next(calls) % 3 == 0 else "ok", "", "")
+
+    def evaluate(proposals, state, *args, **kwargs):
+        node_ids = [f"n{next(calls)}" for _ in proposals]
+        ok = [
+            (p, nid, EvalResult(accuracy=0.5), p.function)
+            for p, nid in zip(proposals, node_ids, strict=True)
+            if p.function == "ok"
+        ]
+        return (ok, None) if ok else ([], (proposals[0], node_ids[0], EvalResult(error="boom")))
+
+    def debug(client, code, error, failing_rows):
+        threads.add(threading.get_ident())
+        return "fixed" if next(calls) % 2 else "bad"
+
+    def evaluate_fix(fixed_code, code, *args, **kwargs):
+        if fixed_code == "fixed":
+            return EvalResult(accuracy=0.4), fixed_code
+        return EvalResult(error="still broken"), code
+
+    monkeypatch.setattr(mcts, "propose_improvement", lambda client, *request: proposal())
+    monkeypatch.setattr(
+        mcts, "propose_improvements", lambda client, *request: [proposal() for _ in range(k)]
+    )
+    monkeypatch.setattr(mcts, "_evaluate_proposals", evaluate)
+    monkeypatch.setattr(mcts, "debug_function", debug)
+    monkeypatch.setattr(mcts, "_evaluate_fix", evaluate_fix)
+    monkeypatch.setattr(mcts, "ensure_plot", lambda path, renderer: path)
+    for node in state.nodes.values():
+        node.metrics = {"metrics_summary": ""}
+
+    report = _run_pipelined(
+        None, state, None, tmp_path, cfg, state_save_path=tmp_path / "state.json", ctx=EvalContext()
+    )
+
+    assert state.budget_used == cfg.mcts.budget
+    assert threading.get_ident() not in threads
+    # With k > 1 a debug call needs the whole batch to fail.
+    assert state.debug_calls > 0 or k > 1
+    assert report["llm_calls"] == state.total_llm_calls + state.debug_calls
+    assert 0 < report["llm_busy"] <= 1
+    assert SearchState.load(tmp_path / "state.json").budget_used == cfg.mcts.budget
+
+
+def _eager_backpropagate(nodes, node_id, weight):
+    """The reward update before rewards were reset lazily: re-rank and rewrite every node."""
+
+    def score(node):
+        return node.accuracy + weight * node.metrics.get("regression", {}).get("reward", 0.0)
+
+    ranked = sorted(nodes.values(), key=score, reverse=True)
+    rewards = {n.id: 1.0 - rank / len(ranked) for rank, n in enumerate(ranked)}
+    for node in nodes.values():
+        node.total_reward = rewards[node.id] * node.visit_count
+    current = nodes[node_id].parent_id
+    while current is not None:
+        nodes[current].visit_count += 1
+        nodes[current].total_reward += rewards[node_id]
+        current = nodes[current].parent_id
+
+
+@pytest.mark.parametrize("weight", [0.0, 0.5])
+def test_lazy_rewards_match_eager_update(weight):
+    rng = random.Random(0)
+    state = SearchState()
+    eager = {}
+    for step in range(300):
+        if eager and rng.random() < 0.2:
+            # A failed expansion: one more visit, no reward.
+            nid = rng.choice(list(eager))
+            eager[nid].visit_count += 1
+            state.add_visit(state.nodes[nid])
+        else:
+            parent = rng.choice([None, *eager]) if eager else None
+            fields = dict(
+                accuracy=rng.choice([0.5, 0.6, 0.7, 0.8]),
+                metrics={"regression": {"reward": rng.random()}},
+                visit_count=1,
+                depth=0 if parent is None else eager[parent].depth + 1,
+            )
+            nid = f"n{step}"
+            eager[nid] = FormulaNode(nid, parent, "", "", **fields)
+            state.add_node(FormulaNode(nid, parent, "", "", **fields))
+            _eager_backpropagate(eager, nid, weight)
+            backpropagate(state, state.nodes[nid], weight)
+        for nid, node in eager.items():
+            assert state.nodes[nid].visit_count == node.visit_count
+            assert math.isclose(state.total_reward(state.nodes[nid]), node.total_reward)
+            assert _ucb1(state, state.nodes[nid], 7, 1.41) == pytest.approx(
+                _ucb1(SearchState(), node, 7, 1.41)
+            )
+
+
+def _descriptor(expression):
+    return f"def descriptor(rA, rB, rX, nA, nB, nX):\n    return {expression}\n"
+
+
+class _FakeClient:
+    def __init__(self, response):
+        self.response = response
+
+    def query_json(self, messages, images=None):
+        self.prompt = messages[-1]["content"]
+        return self.response
+
+
+def test_propose_improvements_drops_malformed_entries(tmp_path):
+    entries = [{"function": _descriptor(e), "explanation": e, "formula": e} for e in "ab"]
+    client = _FakeClient({"proposals": [entries[0], {"function": "x"}, entries[1]]})
+    proposals = propose_improvements(client, "code", "f", "e", "summary", tmp_path / "x.png", 3)
+    assert [p.explanation for p in proposals] == ["a", "b"]
+    assert "Propose 3 IMPROVED descriptors" in client.prompt
+
+
+@pytest.mark.parametrize("child_selection", ["accuracy", "novelty"])
+def test_add_children_inserts_best_of_batch(tmp_path, child_selection):
+    df = load_dataset(str(DATA_PATH))
+    cfg = _cfg(k=4, m=2, child_selection=child_selection)
+    state = SearchState(values=ValueStore())
+    parent_code = _descriptor("(rA + rX) / (1.41421356 * (rB + rX))")
+    result = evaluate_candidate(parent_code, df, tmp_path, "parent", store=state.values)
+    parent = _result_to_node(
+        "parent", None, parent_code, Proposal(parent_code, "t", "t"), result, 0
+    )
+    state.add_node(parent)
+    expressions = [
+        "(rA + rX) / (rB + rX)",  # rank-equivalent to the parent
+        "rX / rB - nA * (nA - (rA / rB) / np.log(rA / rB))",
+        "2 * (rX / rB - nA * (nA - (rA / rB) / np.log(rA / rB)))",  # duplicate in the batch
+        "1 / 0",
+        "rA / rB",
+    ]
+    proposals = [Proposal(_descriptor(e), e, e) for e in expressions]
+    children = _add_children(
+        parent, proposals, 2, None, state, df, tmp_path, cfg, ctx=EvalContext()
+    )
+
+    assert len(children) == 2
+    assert state.budget_used == 2
+    assert [c.id for c in children] == parent.children_ids
+    assert "nA" in children[0].code
+    if child_selection == "accuracy":
+        ratio = evaluate_candidate(proposals[-1].function, df, tmp_path, "ratio")
+        assert children[1].accuracy == pytest.approx(max(parent.accuracy, ratio.accuracy))
+    else:
+        # The candidate equivalent to the parent is the least novel one.
+        assert "rA / rB" in children[1].code
+    assert len(state.values) == 3
+    for child in children:
+        assert child.values_row >= 0
@@ -0,0 +1,59 @@
+"""Test that deferred plot rendering produces the same PNG as eager rendering."""
+
+import numpy as np
+import pytest
+
+from plotting import PlotRenderer, copy_plot, ensure_plot, render_plot, spec_path
+from splits import fit_split
+
+
+@pytest.fixture(scope="module")
+def plot_args():
+    rng = np.random.default_rng(0)
+    values = rng.normal(size=200)
+    labels = np.where(values + rng.normal(size=200) > 0, 1, -1)
+    rule = fit_split(values, labels, 2)
+    return values, labels, rule.thresholds.tolist(), rule
+
+
+@pytest.fixture(scope="module")
+def eager_png(plot_args, tmp_path_factory):
+    path = tmp_path_factory.mktemp("eager") / "node.png"
+    render_plot(*plot_args, path)
+    return path.read_bytes()
+
+
+class TestPlotRenderer:
+    def test_lazy_defers_until_ensure(self, plot_args, eager_png, tmp_path):
+        path = tmp_path / "node.png"
+        PlotRenderer("lazy").submit(path, *plot_args)
+        assert not path.exists()
+        assert spec_path(path).exists()
+
+        # A fresh renderer, as after resuming a run, still finds the deferred plot.
+        assert ensure_plot(str(path), PlotRenderer("lazy")) == path
+        assert path.read_bytes() == eager_png
+        assert not spec_path(path).exists()
+
+    def test_background_matches_eager(self, plot_args, eager_png, tmp_path):
+        renderer = PlotRenderer("background", workers=2)
+        paths = [tmp_path / f"node{i}.png" for i in range(4)]
+        for path in paths:
+            renderer.submit(path, *plot_args)
+        assert ensure_plot(paths[0], renderer).read_bytes() == eager_png
+        renderer.close()
+        assert all(p.read_bytes() == eager_png for p in paths)
+
+    def test_copy_plot_copies_deferred_spec(self, plot_args, eager_png, tmp_path):
+        src, dst = tmp_path / "a.png", tmp_path / "b.png"
+        PlotRenderer("lazy").submit(src, *plot_args)
+        copy_plot(src, dst)
+        assert ensure_plot(dst).read_bytes() == eager_png
+
+    def test_missing_plot_is_returned_unchanged(self, tmp_path):
+        assert ensure_plot(tmp_path / "gone.png") == tmp_path / "gone.png"
+        assert not ensure_plot("").name
+
+    def test_unknown_mode(self):
+        with pytest.raises(ValueError, match="plot mode"):
+            PlotRenderer("sometimes")
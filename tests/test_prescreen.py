@@ -0,0 +1,84 @@
+"""Test the static checks run on descriptor code before execution."""
+
+import pytest
+
+from prescreen import prescreen
+
+HEADER = "def descriptor(rA, rB, rX, nA, nB, nX):\n"
+
+
+def _screen(body: str, prefix: str = ""):
+    return prescreen(prefix + HEADER + body)
+
+
+class TestRejected:
+    @pytest.mark.parametrize(
+        ("body", "message"),
+        [
+            ("    while True:\n        pass", "never exits"),
+            ("    x = 0\n    while rA > 0:\n        x += 1\n    return x", "never changes"),
+            ("    import pandas\n    return rA", "import of 'pandas' is not allowed"),
+            ("    return descriptor(rA, rB, rX, nA, nB, nX)", "recurses unconditionally"),
+            ("    import numpy as np\n    a = np.zeros((10**5, 10**5))\n    return rA", "zeros()"),
+            ("    a = [0.0] * 10**9\n    return rA", "sequence repetition"),
+            (
+                "    s = 0\n    for i in range(2000):\n        for j in range(2000):\n"
+                "            s += i * j\n    return s",
+                "iterations per compound",
+            ),
+            (
+                "    for i in range(10 ** 400):\n        pass\n    return rA",
+                "iterations per compound",
+            ),
+            ("    return eval('rA')", "call to eval()"),
+            ("    return rA.__class__", "'__class__'"),
+            ("    return (rA", "SyntaxError"),
+        ],
+    )
+    def test_doomed_code_has_precise_error(self, body, message):
+        report = _screen(body)
+        assert not report.ok
+        assert message in report.message()
+        assert report.message().startswith("Static check failed: line ")
+
+    def test_module_level_import(self):
+        assert "import of 'os'" in _screen("    return rA", prefix="import os\n").message()
+
+    def test_mutual_recursion(self):
+        helpers = "def f(x):\n    return g(x)\n\ndef g(x):\n    return f(x)\n\n"
+        assert not _screen("    return f(rA)", prefix=helpers).ok
+
+    def test_missing_descriptor(self):
+        assert "no 'descriptor'" in prescreen("def f(x):\n    return x").message()
+
+
+class TestAccepted:
+    @pytest.mark.parametrize(
+        ("body", "cost_class"),
+        [
+            ("    import numpy as np\n    return np.log(rA / rB)", "constant"),
+            ("    s = 0\n    for x in (rA, rB, rX):\n        s += x\n    return s", "bounded"),
+            ("    return sum(i * rA for i in range(20000))", "heavy"),
+            # Constant expressions that fail or overflow are left to the run time.
+            ("    return rA + (0 ** -1) ** 2", "constant"),
+            ("    return rA * (0.5 ** -2000) ** 2", "constant"),
+            ("    a = [0.0] * (2 ** 1024 * 2)\n    return rA", "constant"),
+            ("    return sum(i * rA for i in range(10 ** 400, 10 ** 400))", "data-dependent"),
+            ("    return sum(rA for i in range(10 ** 400) for j in [])", "data-dependent"),
+            ("    while rA > 1:\n        rA = rA / 2\n    return rA", "data-dependent"),
+            (
+                "    if nA <= 0:\n        return rA\n"
+                "    return descriptor(rA, rB, rX, nA - 1, nB, nX)",
+                "data-dependent",
+            ),
+            (
+                "    x = rA\n    while True:\n        x *= 2\n        if x > 10:\n            break\n"
+                "    return x",
+                "data-dependent",
+            ),
+        ],
+    )
+    def test_cost_class(self, body, cost_class):
+        report = _screen(body)
+        assert report.ok, report.errors
+        assert report.cost_class == cost_class
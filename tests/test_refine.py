@@ -0,0 +1,58 @@
+"""Test constant discovery, substitution and the compass search."""
+
+import ast
+
+from refine import find_constants, pattern_search, substitute
+
+CODE = """\
+def descriptor(rA, rB, rX, nA, nB, nX):
+    w = [1.5, 2.5][0]
+    total = sum(rA for _ in range(3))
+    flag = True
+    if nA == 2 or nX != -2 or nB in (3, 4) or 0 < rX < 0.9:
+        total = total * 2
+    return 0.5 * rA ** 2 - round(rB, 2) + w * total / 3 + 1e-3 - (-4)
+"""
+
+
+def test_finds_tunable_literals():
+    values = [c.value for c in find_constants(CODE)]
+    assert values == [1.5, 2.5, 0.0, 0.9, 2.0, 0.5, 2.0, 3.0, 1e-3, 4.0]
+
+
+def test_substitute_keeps_the_rest_of_the_source():
+    constants = find_constants(CODE)
+    values = [1.5, 2.75, 0.0, 0.9, 2.0, 0.25, 2.0, 3.0, 1e-3, -4.5]
+    code = substitute(CODE, constants, values)
+    assert "if nA == 2 or nX != -2 or nB in (3, 4) or 0 < rX < 0.9:" in code
+    assert "return 0.25 * rA ** 2 - round(rB, 2) + w * total / 3 + 1e-3 - (--4.5)" in code
+    assert "w = [1.5, 2.75][0]" in code
+    ast.parse(code)
+
+
+def test_pattern_search_climbs_to_optimum():
+    def score(values):
+        x, y = values
+        return None if x < 0 else -round(abs(x - 3.0) + abs(y + 1.0), 2)
+
+    result = pattern_search(score, [1.0, 0.0], max_trials=500)
+    assert result.start_score == -3.0
+    assert result.score > -0.05
+    assert result.trials <= 500
+
+
+def test_pattern_search_stops_at_trial_budget():
+    calls = []
+
+    def score(values):
+        calls.append(values)
+        return float(len(calls))
+
+    result = pattern_search(score, [1.0], max_trials=7)
+    assert result.trials == len(calls) == 7
+
+
+def test_substitute_after_non_ascii_text():
+    code = 'def descriptor(rA):\n    return len("÷÷") + 2.5 * rA\n'
+    (constant,) = find_constants(code)
+    assert substitute(code, [constant], [3.5]).endswith('len("÷÷") + 3.5 * rA\n')
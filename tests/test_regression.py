@@ -0,0 +1,47 @@
+"""Test the batched least-squares fits and dHdec scores against direct computation."""
+
+import numpy as np
+from scipy.stats import linregress
+
+from regression import family_masks, fit_lines, regression_scores
+
+
+def test_fit_matches_linregress():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(4, 30))
+    y = rng.normal(size=30)
+    weights = rng.random((4, 30)) > 0.3
+    fits = fit_lines(X, y, weights)
+    for i in range(4):
+        ref = linregress(X[i, weights[i]], y[weights[i]])
+        assert np.isclose(fits["slope"][i], ref.slope)
+        assert np.isclose(fits["intercept"][i], ref.intercept)
+        assert np.isclose(fits["r2"][i], ref.rvalue**2)
+        assert fits["n"][i] == weights[i].sum()
+
+
+def test_too_few_points_or_constant_values_give_nan():
+    X = np.array([[1.0, 2.0, 3.0, 4.0], [5.0, 5.0, 5.0, 5.0]])
+    y = np.array([1.0, 3.0, 2.0, 5.0])
+    weights = np.array([[True, True, False, False], [True] * 4])
+    assert np.isnan(fit_lines(X, y, weights)["r2"]).all()
+
+
+def test_family_masks_skip_excluded_compounds():
+    masks = family_masks(["O", "Cl", "O", "S"], ["CaZrO3", "KCaCl3", "SrTiO3", "BaZrS3"])
+    assert masks["chalcogenides"].tolist() == [False, False, True, True]
+    assert masks["halides"].tolist() == [False, True, False, False]
+
+
+def test_scores():
+    dhd = np.array([10.0, -5.0, 20.0, 30.0, -1.0])
+    values = np.array([[1.0, 3.0, 1.5, np.nan, 2.5]])
+    preds = np.array([[1, -1, 1, 1, 1]])
+    masks = {"all": np.ones(5, dtype=bool)}
+    (score,) = regression_scores(values, preds, dhd, masks)
+    # The last compound disagrees in sign; the undefined one counts as a disagreement.
+    assert score["agree"] == 3
+    assert score["sign_agreement"] == 0.6
+    ref = linregress([1.0, 3.0, 1.5, 2.5], [10.0, -5.0, 20.0, -1.0])
+    assert np.isclose(score["r2"]["all"], ref.rvalue**2)
+    assert np.isclose(score["reward"], (0.6 + ref.rvalue**2) / 2)
@@ -0,0 +1,65 @@
+"""Test the process-pool sandbox used to run untrusted descriptor code."""
+
+import os
+import time
+
+import numpy as np
+import pytest
+
+from sandbox import DescriptorSandbox
+
+
+def _task(columns, payload):
+    if payload == "spin":
+        while True:
+            pass
+    if payload == "crash":
+        os._exit(3)
+    if payload == "raise":
+        raise ValueError("bad descriptor")
+    if payload == "write":
+        columns["x"][0] = 1.0
+    if payload == "pid":
+        return os.getpid()
+    return float(columns["x"].sum() * payload)
+
+
+@pytest.fixture
+def sandbox():
+    sb = DescriptorSandbox({"x": np.arange(5, dtype=np.float64)}, _task, workers=2)
+    yield sb
+    sb.close()
+
+
+class TestDescriptorSandbox:
+    def test_runs_task_on_shared_columns(self, sandbox):
+        assert sandbox.run(2, timeout=5) == 20.0
+
+    def test_task_error_is_reraised(self, sandbox):
+        with pytest.raises(ValueError, match="bad descriptor"):
+            sandbox.run("raise", timeout=5)
+
+    def test_columns_are_read_only(self, sandbox):
+        with pytest.raises(ValueError):
+            sandbox.run("write", timeout=5)
+
+    def test_timeout_kills_and_replaces_worker(self, sandbox):
+        start = time.monotonic()
+        with pytest.raises(TimeoutError):
+            sandbox.run("spin", timeout=0.5)
+        assert time.monotonic() - start < 5
+        assert sandbox.replaced == 1
+        assert sandbox.size == 2
+        assert sandbox.run(1, timeout=5) == 10.0
+
+    def test_crashed_worker_is_replaced(self, sandbox):
+        with pytest.raises(RuntimeError, match="exited unexpectedly"):
+            sandbox.run("crash", timeout=5)
+        assert sandbox.size == 2
+        assert sandbox.run(1, timeout=5) == 10.0
+
+    def test_grow_adds_workers(self, sandbox):
+        sandbox.grow(4)
+        assert sandbox.size == 4
+        pids = {sandbox.run("pid", timeout=5) for _ in range(8)}
+        assert os.getpid() not in pids
@@ -0,0 +1,61 @@
+"""Test the brute-force formula enumerator and the proposals built from it."""
+
+import inspect
+
+import numpy as np
+import pytest
+
+from proposer import propose_enumerated
+from sisso import enumerate_formulas
+
+
+@pytest.fixture(scope="module")
+def problem():
+    rng = np.random.default_rng(0)
+    inputs = {
+        "a": rng.uniform(0.5, 2, 120),
+        "b": rng.uniform(0.5, 2, 120),
+        "c": rng.normal(size=120),
+    }
+    labels = np.where(inputs["a"] / inputs["b"] > 1.1, 1, -1)
+    train = rng.random(120) < 0.7
+    return inputs, labels, train
+
+
+def test_finds_exact_formula(problem):
+    best = enumerate_formulas(*problem, complexity=1, top_n=3)[0]
+    assert best.train_accuracy == 1.0
+    assert best.formula in ("a / b", "b / a", "a - b")
+    assert best.complexity == 1
+
+
+def test_blocks_and_workers_do_not_change_result(problem):
+    expected = enumerate_formulas(*problem, complexity=2, top_n=10)
+    assert enumerate_formulas(*problem, complexity=2, top_n=10, chunk_elements=1) == expected
+    assert enumerate_formulas(*problem, complexity=2, top_n=10, workers=2) == expected
+
+
+def test_formulas_are_defined_and_rank_distinct(problem):
+    inputs, labels, train = problem
+    formulas = enumerate_formulas(inputs, labels, train, complexity=2, top_n=30)
+    accuracies = [f.train_accuracy for f in formulas]
+    assert accuracies == sorted(accuracies, reverse=True)
+    orders = set()
+    for f in formulas:
+        values = eval(f.formula, {"np": np}, dict(inputs))
+        assert np.isfinite(values).all()
+        ranks = np.unique(values, return_inverse=True)[1]
+        orders.add(min(tuple(ranks), tuple(ranks.max() - ranks)))
+    assert len(orders) == len(formulas)
+
+
+def test_proposals_are_descriptors(problem):
+    inputs, labels, train = problem
+    inputs = {"rA": inputs["a"], "rB": inputs["b"], "t": inputs["c"]}
+    for proposal in propose_enumerated(inputs, labels, train, 5, complexity=1):
+        namespace = {}
+        exec(proposal.function, namespace)
+        params = inspect.signature(namespace["descriptor"]).parameters
+        assert list(params)[:6] == ["rA", "rB", "rX", "nA", "nB", "nX"]
+        values = namespace["descriptor"](**{p: inputs.get(p, np.ones(120)) for p in params})
+        assert np.isfinite(values).all()
@@ -0,0 +1,76 @@
+"""Test the sorted-sweep threshold search against sklearn's decision tree."""
+
+import numpy as np
+import pytest
+from sklearn.tree import DecisionTreeClassifier
+
+from splits import fit_intervals, fit_split, fit_splits
+
+
+def _sklearn_fit(values, labels, max_depth):
+    clf = DecisionTreeClassifier(max_depth=max_depth)
+    clf.fit(values.reshape(-1, 1), labels)
+    tree = clf.tree_
+    thresholds = sorted(t for t in tree.threshold[: tree.node_count] if t != -2.0)
+    return thresholds, clf.predict(values.reshape(-1, 1))
+
+
+def _random_problem(rng):
+    n = int(rng.integers(2, 60))
+    tied = rng.random() < 0.5
+    values = rng.integers(0, 8, n).astype(float) if tied else rng.normal(size=n)
+    labels = np.where(rng.random(n) < rng.uniform(0.2, 0.8), 1, -1)
+    return values, labels
+
+
+class TestFitSplit:
+    @pytest.mark.parametrize("max_depth", [1, 2, 3])
+    def test_matches_sklearn(self, max_depth):
+        rng = np.random.default_rng(max_depth)
+        for _ in range(100):
+            values, labels = _random_problem(rng)
+            expected_thresholds, expected_preds = _sklearn_fit(values, labels, max_depth)
+            rule = fit_split(values, labels, max_depth)
+            assert rule.thresholds.tolist() == expected_thresholds
+            assert np.array_equal(rule.predict(values), expected_preds)
+
+    def test_constant_descriptor_predicts_majority(self):
+        rule = fit_split(np.ones(5), np.array([1, 1, -1, 1, -1]), 2)
+        assert rule.thresholds.size == 0
+        assert (rule.predict(np.arange(3.0)) == 1).all()
+
+    def test_rejects_non_finite_values(self):
+        with pytest.raises(ValueError, match="NaN"):
+            fit_split(np.array([1.0, np.nan]), np.array([1, -1]), 2)
+
+
+class TestFitSplits:
+    def test_batched_rows_match_single_fits(self):
+        rng = np.random.default_rng(0)
+        labels = np.where(rng.random(50) < 0.6, 1, -1)
+        X = rng.normal(size=(20, 50))
+        rules, accuracies = fit_splits(X, labels, 2)
+        for row, rule, acc in zip(X, rules, accuracies, strict=True):
+            single = fit_split(row, labels, 2)
+            assert np.array_equal(rule.thresholds, single.thresholds)
+            assert acc == pytest.approx((rule.predict(row) == labels).mean())
+
+
+class TestFitIntervals:
+    def test_finds_best_interval(self):
+        rng = np.random.default_rng(0)
+        for _ in range(50):
+            values = rng.integers(0, 10, 25).astype(float)
+            labels = np.where(rng.random(25) < 0.5, 1, -1)
+            (rule,), (acc,) = fit_intervals(values, labels)
+
+            u = np.unique(values)
+            cuts = [-np.inf, *((u[:-1] + u[1:]) / 2), np.inf]
+            best = max(
+                (np.where((values > a) & (values <= b), inside, -inside) == labels).mean()
+                for i, a in enumerate(cuts)
+                for b in cuts[i:]
+                for inside in (1, -1)
+            )
+            assert acc == pytest.approx(best)
+            assert (rule.predict(values) == labels).mean() == pytest.approx(best)
@@ -0,0 +1,64 @@
+"""Test the 2-D tree and linear sweeps against brute force."""
+
+import numpy as np
+import pytest
+
+from splits2d import fit_pair_lines, fit_pair_trees
+
+
+def _cuts(values):
+    unique = np.unique(values)
+    return [-np.inf, *((unique[:-1] + unique[1:]) / 2), np.inf]
+
+
+def _brute_force_tree(a, b, labels):
+    """Most training samples any depth-2 axis-aligned tree gets right."""
+    axes = (a.astype(np.float32), b.astype(np.float32))
+    best = 0
+    for root_axis in (0, 1):
+        for root in _cuts(axes[root_axis]):
+            go_left = axes[root_axis] <= root
+            correct = 0
+            for side in (go_left, ~go_left):
+                correct += max(
+                    (((np.where(axes[axis] <= cut, label, -label)) == labels) & side).sum()
+                    for axis in (0, 1)
+                    for cut in _cuts(axes[axis])
+                    for label in (1, -1)
+                )
+            best = max(best, correct)
+    return best
+
+
+def test_tree_matches_brute_force():
+    rng = np.random.default_rng(0)
+    for trial in range(60):
+        n = int(rng.integers(1, 14))
+        a = rng.integers(0, 5, n).astype(float) if trial % 2 else rng.normal(size=n)
+        b = rng.integers(0, 3, n).astype(float) if trial % 3 == 0 else rng.normal(size=n)
+        labels = np.where(rng.random(n) < 0.5, 1, -1)
+        (rule,), accuracy = fit_pair_trees(a[None], b[None], labels)
+        assert accuracy[0] * n == pytest.approx(_brute_force_tree(a, b, labels))
+        assert (rule.predict(a, b) == labels).mean() == pytest.approx(accuracy[0])
+
+
+def test_batched_pairs_match_single_fits():
+    rng = np.random.default_rng(1)
+    labels = np.where(rng.random(40) < 0.6, 1, -1)
+    A, B = rng.normal(size=(2, 8, 40))
+    _, tree_acc = fit_pair_trees(A, B, labels)
+    _, line_acc = fit_pair_lines(A, B, labels)
+    for i in range(8):
+        assert fit_pair_trees(A[i], B[i], labels)[1][0] == tree_acc[i]
+        assert fit_pair_lines(A[i], B[i], labels)[1][0] == line_acc[i]
+
+
+def test_line_separates_separable_pair():
+    rng = np.random.default_rng(2)
+    a, b = rng.normal(size=(2, 200))
+    labels = np.where(a - b > 0, 1, -1)
+    (rule,), accuracy = fit_pair_lines(a, b, labels)
+    assert accuracy[0] == 1.0
+    assert (rule.predict(a, b) == labels).all()
+    # Neither descriptor alone nor an axis-aligned tree separates it.
+    assert fit_pair_trees(a, b, labels)[1][0] < 1.0
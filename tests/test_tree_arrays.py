@@ -0,0 +1,64 @@
+"""Test that vectorized selection on the array tree walks like the dataclass tree."""
+
+import random
+
+import numpy as np
+from omegaconf import OmegaConf
+
+from mcts import backpropagate, select_node
+from state import FormulaNode, SearchState
+
+CFG = OmegaConf.create({"mcts": {"ucb_constant": 1.41, "max_depth": 4}})
+
+
+def _grow(states, steps, seed=0):
+    """Apply the same random insertions and failed expansions to every state."""
+    rng = random.Random(seed)
+    ids = []
+    for step in range(steps):
+        if ids and rng.random() < 0.3:
+            nid = rng.choice(ids)
+            for state in states:
+                state.add_visit(state.nodes[nid])
+            continue
+        parent = rng.choice([None, *ids]) if ids and rng.random() < 0.8 else None
+        depth = 0 if parent is None else states[0].nodes[parent].depth + 1
+        if depth > CFG.mcts.max_depth:
+            parent, depth = None, 0
+        accuracy = rng.choice([0.5, 0.6, 0.7, 0.8])
+        nid = f"n{step}"
+        ids.append(nid)
+        for state in states:
+            node = FormulaNode(nid, parent, "", "", accuracy=accuracy, visit_count=1, depth=depth)
+            state.add_node(node)
+            backpropagate(state, node)
+        yield ids
+
+
+def test_array_selection_matches_dataclass_walk():
+    plain, arrays = SearchState(), SearchState()
+    arrays.use_arrays()
+    rng = random.Random(1)
+    for ids in _grow([plain, arrays], 200):
+        pending = {nid: rng.randint(1, 3) for nid in rng.sample(ids, min(3, len(ids)))}
+        assert select_node(arrays, CFG).id == select_node(plain, CFG).id
+        assert select_node(arrays, CFG, pending).id == select_node(plain, CFG, pending).id
+    tree = arrays.arrays
+    visits = [plain.nodes[nid].visit_count for nid in tree.ids]
+    np.testing.assert_array_equal(tree.visits[: len(tree)], visits)
+
+
+def test_arrays_built_from_saved_state(tmp_path):
+    state = SearchState()
+    for _ in _grow([state], 80, seed=2):
+        pass
+    state.use_arrays()
+    state.save(tmp_path / "state.json")
+
+    loaded = SearchState.load(tmp_path / "state.json")
+    assert {nid: n.total_reward for nid, n in loaded.nodes.items()} == {
+        nid: state.total_reward(n) for nid, n in state.nodes.items()
+    }
+    expected = select_node(loaded, CFG).id
+    loaded.use_arrays()
+    assert select_node(loaded, CFG).id == expected
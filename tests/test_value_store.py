@@ -0,0 +1,50 @@
+"""Test the run-level descriptor value store."""
+
+import numpy as np
+import pytest
+
+from value_store import ValueStore
+
+
+def test_rows_grow_and_overwrite():
+    store = ValueStore()
+    for i in range(10):
+        assert store.add(f"n{i}", np.arange(3.0) + i) == i
+    assert store.add("n4", np.zeros(3)) == 4
+    assert len(store) == 10
+    assert store.matrix()[4].tolist() == [0.0, 0.0, 0.0]
+    assert store.rows([9, 0]).tolist() == [[9.0, 10.0, 11.0], [0.0, 1.0, 2.0]]
+    with pytest.raises(ValueError, match="Expected 3 values"):
+        store.add("bad", np.zeros(4))
+
+
+def test_views_are_read_only():
+    store = ValueStore()
+    store.add("a", np.ones(2))
+    with pytest.raises(ValueError, match="read-only"):
+        store.row(0)[0] = 2.0
+
+
+def test_persists_across_reopen(tmp_path):
+    store = ValueStore(tmp_path / "values", dtype="float32")
+    for i in range(100):
+        store.add(f"n{i}", np.full(5, i))
+    store.flush()
+
+    reopened = ValueStore(tmp_path / "values")
+    assert reopened.dtype == np.float32
+    assert reopened.index == store.index
+    assert np.array_equal(reopened.matrix(), store.matrix())
+    assert reopened.add("new", np.zeros(5)) == 100
+
+
+def test_rank_correlation():
+    store = ValueStore()
+    base = np.array([0.5, 1.0, 2.0, 3.0])
+    store.add("t", base)
+    store.add("t_cubed", base**3)
+    store.add("reversed", -base)
+    corr = store.correlation()
+    assert corr[0, 1] == pytest.approx(1.0)
+    assert corr[0, 2] == pytest.approx(-1.0)
+    assert store.correlation(method="pearson")[0, 1] < 1.0
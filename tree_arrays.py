@@ -0,0 +1,122 @@
+"""Structure-of-arrays copy of the search tree for vectorized UCB selection.
+
+``SearchState`` keeps the ``FormulaNode`` dataclasses as the record that is saved and
+loaded; with ``mcts.array_tree`` it also mirrors the selection statistics here: parent,
+depth, visits, total reward, reward epoch and rank of every node in NumPy arrays,
+indexed in insertion order. Child lists are CSR arrays, rebuilt from the parent array
+after insertions, so each level of a selection is one vectorized UCB and ``argmax``.
+Rewards follow the lazy resets of ``SearchState``: a node not touched in the current
+epoch has total reward ``(1 - rank / n) * visits``.
+"""
+
+import math
+from collections.abc import Mapping
+
+import numpy as np
+
+_GROWTH = 2
+
+
+class TreeArrays:
+    """Selection statistics of every node, indexed by insertion order."""
+
+    def __init__(self, capacity: int = 1024):
+        self.ids: list[str] = []
+        self.index: dict[str, int] = {}
+        self.parent = np.empty(capacity, dtype=np.int64)
+        self.depth = np.empty(capacity, dtype=np.int64)
+        self.visits = np.empty(capacity, dtype=np.int64)
+        self.total = np.empty(capacity, dtype=np.float64)
+        self.touched = np.empty(capacity, dtype=np.int64)
+        self.rank = np.empty(capacity, dtype=np.int64)
+        self._offsets: np.ndarray | None = None
+        self._children = np.empty(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _grow(self) -> None:
+        for name in ("parent", "depth", "visits", "total", "touched", "rank"):
+            old = getattr(self, name)
+            new = np.empty(max(1, len(old) * _GROWTH), dtype=old.dtype)
+            new[: len(old)] = old
+            setattr(self, name, new)
+
+    def append(
+        self,
+        node_id: str,
+        parent_id: str | None,
+        depth: int,
+        visits: int,
+        total: float,
+        touched: int,
+        rank: int,
+    ) -> None:
+        """Add a node whose rank among all nodes (itself included) is ``rank``."""
+        n = len(self.ids)
+        if n == len(self.parent):
+            self._grow()
+        ranks = self.rank[:n]
+        ranks[ranks >= rank] += 1
+        self.parent[n] = self.index[parent_id] if parent_id is not None else -1
+        self.depth[n] = depth
+        self.visits[n] = visits
+        self.total[n] = total
+        self.touched[n] = touched
+        self.rank[n] = rank
+        self.index[node_id] = n
+        self.ids.append(node_id)
+        self._offsets = None
+
+    def set(self, node_id: str, visits: int, total: float, touched: int) -> None:
+        i = self.index[node_id]
+        self.visits[i] = visits
+        self.total[i] = total
+        self.touched[i] = touched
+
+    def set_ranks(self, ranks: Mapping[str, int]) -> None:
+        self.rank[: len(self.ids)] = [ranks[nid] for nid in self.ids]
+
+    def _csr(self) -> tuple[np.ndarray, np.ndarray]:
+        """Children of every node in insertion order; slot 0 holds the roots."""
+        if self._offsets is None:
+            slots = self.parent[: len(self.ids)] + 1
+            self._children = np.argsort(slots, kind="stable")
+            counts = np.bincount(slots, minlength=len(self.ids) + 1)
+            self._offsets = np.concatenate([[0], np.cumsum(counts)])
+        return self._offsets, self._children
+
+    def _best(
+        self, children: np.ndarray, parent_visits: int, c: float, epoch: int, pending: np.ndarray
+    ) -> int:
+        visits = self.visits[children] + pending[children]
+        total = self.total[children]
+        if epoch:
+            lazy = (1.0 - self.rank[children] / len(self.ids)) * self.visits[children]
+            total = np.where(self.touched[children] == epoch, total, lazy)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ucb = total / visits + c * np.sqrt(math.log(parent_visits) / visits)
+        ucb = np.where(visits == 0, np.inf, ucb)
+        return int(children[np.argmax(ucb)])
+
+    def select(
+        self, c: float, max_depth: int, epoch: int, pending: Mapping[str, int] | None = None
+    ) -> str | None:
+        """Id of the node UCB1 selection reaches, as ``mcts.select_node`` walks it."""
+        offsets, order = self._csr()
+        roots = order[offsets[0] : offsets[1]]
+        if not len(roots):
+            return None
+        extra = np.zeros(len(self.ids), dtype=np.int64)
+        for nid, count in (pending or {}).items():
+            extra[self.index[nid]] = count
+
+        root_visits = int(self.visits[roots].sum() + extra[roots].sum()) or 1
+        current = self._best(roots, root_visits, c, epoch, extra)
+        while self.depth[current] < max_depth:
+            children = order[offsets[current + 1] : offsets[current + 2]]
+            if not len(children):
+                break
+            parent_visits = int(self.visits[current] + extra[current]) or 1
+            current = self._best(children, parent_visits, c, epoch, extra)
+        return self.ids[current]
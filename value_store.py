@@ -0,0 +1,112 @@
+"""Run-level store of descriptor values: one matrix row per node id.
+
+Values live in a float64 (or float32) matrix that is memory-mapped from
+``<dir>/values.bin`` and grows by doubling; ``<dir>/index.json`` maps node ids to
+rows. Results and nodes keep only their row number, so a large tree never holds the
+values as Python floats, and the whole tree can be re-scored or correlated as one
+array. Without a directory the matrix is kept in memory.
+"""
+
+import json
+import logging
+import os
+from pathlib import Path
+
+import numpy as np
+from scipy.stats import rankdata
+
+log = logging.getLogger(__name__)
+
+INITIAL_ROWS = 64
+
+
+class ValueStore:
+    def __init__(self, path: str | Path | None = None, dtype: str = "float64"):
+        self.path = Path(path) if path is not None else None
+        self.dtype = np.dtype(dtype)
+        self.index: dict[str, int] = {}
+        self.width = 0
+        self._data = np.empty((0, 0), dtype=self.dtype)
+        if self.path is not None and (self.path / "index.json").exists():
+            meta = json.loads((self.path / "index.json").read_text())
+            self.dtype = np.dtype(meta["dtype"])
+            self.width = meta["width"]
+            self.index = meta["index"]
+            self._data = self._map(meta["capacity"])
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self.index
+
+    def _map(self, capacity: int) -> np.ndarray:
+        if self.path is None:
+            grown = np.empty((capacity, self.width), dtype=self.dtype)
+            grown[: len(self._data)] = self._data.reshape(-1, self.width)
+            return grown
+        self.path.mkdir(parents=True, exist_ok=True)
+        data_file = self.path / "values.bin"
+        with open(data_file, "ab") as f:
+            f.truncate(capacity * self.width * self.dtype.itemsize)
+        return np.memmap(data_file, dtype=self.dtype, mode="r+", shape=(capacity, self.width))
+
+    def add(self, node_id: str, values: np.ndarray) -> int:
+        """Store ``values`` under ``node_id`` (replacing earlier values) and return the row."""
+        values = np.asarray(values, dtype=self.dtype)
+        if not self.width:
+            self.width = len(values)
+        if values.shape != (self.width,):
+            raise ValueError(f"Expected {self.width} values, got shape {values.shape}")
+        row = self.index.get(node_id, len(self.index))
+        if row >= len(self._data):
+            # A memory-only store often holds a single result, so it starts at one row.
+            initial = INITIAL_ROWS if self.path is not None else 1
+            self._data = self._map(max(initial, 2 * len(self._data)))
+        self._data[row] = values
+        self.index[node_id] = row
+        return row
+
+    def row(self, row: int) -> np.ndarray:
+        """Read-only view of one row."""
+        view = np.asarray(self._data[row])
+        view.flags.writeable = False
+        return view
+
+    def matrix(self) -> np.ndarray:
+        """Read-only view of all stored rows."""
+        view = np.asarray(self._data[: len(self.index)])
+        view.flags.writeable = False
+        return view
+
+    def rows(self, rows) -> np.ndarray:
+        """The given rows as a new matrix."""
+        return np.asarray(self._data[np.asarray(rows, dtype=np.int64)])
+
+    def correlation(self, rows=None, method: str = "spearman") -> np.ndarray:
+        """Pairwise correlation between rows; Spearman by default, since only the order
+        of a descriptor's values matters to the threshold classifier."""
+        values = self.matrix() if rows is None else self.rows(rows)
+        if method == "spearman":
+            values = rankdata(values, axis=1)
+        elif method != "pearson":
+            raise ValueError(f"Unknown correlation method {method!r}")
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.corrcoef(values)
+
+    def flush(self) -> None:
+        """Write the values and the index to disk."""
+        if self.path is None:
+            return
+        if isinstance(self._data, np.memmap):
+            self._data.flush()
+        meta = {
+            "dtype": self.dtype.str,
+            "width": self.width,
+            "capacity": len(self._data),
+            "index": self.index,
+        }
+        tmp = self.path / "index.json.tmp"
+        tmp.write_text(json.dumps(meta))
+        os.replace(tmp, self.path / "index.json")
+        log.debug("Value store flushed to %s (%d rows)", self.path, len(self))